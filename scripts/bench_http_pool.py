@@ -0,0 +1,76 @@
+"""Compara o overhead por requisição: cliente novo vs. cliente do pool.
+
+Uso: python scripts/bench_http_pool.py [requisicoes]
+
+Sobe um servidor HTTP stub local (keep-alive) que responde como o Ollama e
+mede a latência média de ``POST /api/generate`` nos dois modos.
+"""
+from __future__ import annotations
+
+import asyncio
+import json
+import sys
+import time
+
+import httpx
+
+from bobot.ai.http_client import close_clients, post_json
+
+BODY = json.dumps({"response": "ok", "done": True}).encode()
+
+
+async def _handle(reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+    try:
+        while True:
+            head = await reader.readuntil(b"\r\n\r\n")
+            length = 0
+            for line in head.split(b"\r\n"):
+                if line.lower().startswith(b"content-length:"):
+                    length = int(line.split(b":", 1)[1])
+            if length:
+                await reader.readexactly(length)
+            writer.write(
+                b"HTTP/1.1 200 OK\r\nContent-Type: application/json\r\n"
+                + f"Content-Length: {len(BODY)}\r\n\r\n".encode()
+                + BODY
+            )
+            await writer.drain()
+    except (asyncio.IncompleteReadError, ConnectionError):
+        pass
+    finally:
+        writer.close()
+
+
+async def _fresh_client(url: str, payload: dict) -> None:
+    async with httpx.AsyncClient(timeout=5) as client:
+        response = await client.post(url, json=payload)
+        response.raise_for_status()
+        response.json()
+
+
+async def _measure(label: str, func, url: str, total: int) -> None:
+    payload = {"model": "stub", "prompt": "ping", "stream": False}
+    await func(url, payload)
+    start = time.perf_counter()
+    for _ in range(total):
+        await func(url, payload)
+    elapsed = time.perf_counter() - start
+    print(f"{label:<12} {total} req  {elapsed * 1000 / total:.3f} ms/req")
+
+
+async def main(total: int) -> None:
+    server = await asyncio.start_server(_handle, "127.0.0.1", 0)
+    port = server.sockets[0].getsockname()[1]
+    url = f"http://127.0.0.1:{port}/api/generate"
+
+    async def pooled(target: str, payload: dict) -> None:
+        await post_json(target, payload, timeout=5, retries=0)
+
+    async with server:
+        await _measure("novo cliente", _fresh_client, url, total)
+        await _measure("pool", pooled, url, total)
+        await close_clients()
+
+
+if __name__ == "__main__":
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else 500))
@@ -0,0 +1,51 @@
+"""Mede a carga em lote e a restauração do placar do quiz no SQLite.
+
+Uso: python scripts/bench_quiz_store.py [usuários]
+"""
+from __future__ import annotations
+
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+from bobot.services.quiz import QuizQuestion, QuizService
+from bobot.storage.sqlite import SQLiteQuizStore
+
+
+async def _run(path: str, users: int) -> None:
+    store = SQLiteQuizStore(path, batch_size=users + 1)
+    service = QuizService(store=store)
+    quiz = QuizQuestion("Bench?", ["a", "b", "c", "d"], 0)
+
+    start = time.perf_counter()
+    for index in range(users):
+        service.submit_answer(f"u{index}", quiz, index % 4, f"g{index % 100}")
+    hot = time.perf_counter() - start
+    print(f"submit_answer: {hot / users * 1e6:6.1f} µs por resposta (sem esperar o disco)")
+
+    start = time.perf_counter()
+    await store.flush()
+    print(f"flush em lote: {time.perf_counter() - start:6.2f} s para {users:,} respostas")
+    await store.aclose()
+
+    restored = QuizService(store=SQLiteQuizStore(path))
+    start = time.perf_counter()
+    count = await restored.restore()
+    print(f"restore:       {time.perf_counter() - start:6.2f} s para {count:,} usuários")
+    start = time.perf_counter()
+    for index in range(0, users, max(1, users // 1000)):
+        restored.get_rank(f"u{index}")
+    top = restored.get_ranking(limit=10)
+    print(f"ranking:       top 10 {top[:3]}..., posição em {(time.perf_counter() - start) * 1e3:.1f} ms/1000")
+    await restored.store.aclose()
+
+
+def main(users: int) -> None:
+    with tempfile.TemporaryDirectory() as directory:
+        asyncio.run(_run(os.path.join(directory, "quiz.db"), users))
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100_000)
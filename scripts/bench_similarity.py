@@ -0,0 +1,45 @@
+"""Mede o tempo de busca do índice de perguntas parecidas.
+
+Uso: python scripts/bench_similarity.py [entradas]
+"""
+from __future__ import annotations
+
+import random
+import sys
+import time
+
+from bobot.services.similarity import SimilarPromptIndex
+
+LETTERS = "abcdefghijklmnopqrstuvwxyz"
+
+
+def _vocabulary(rng: random.Random, size: int = 5000) -> list[str]:
+    return ["".join(rng.choice(LETTERS) for _ in range(rng.randint(3, 10))) for _ in range(size)]
+
+
+def _question(rng: random.Random, words: list[str]) -> str:
+    return "como " + " ".join(rng.choice(words) for _ in range(rng.randint(4, 9)))
+
+
+def main(total: int) -> None:
+    rng = random.Random(1)
+    words = _vocabulary(rng)
+    index = SimilarPromptIndex(max_entries=total)
+    questions = [_question(rng, words) for _ in range(total)]
+
+    start = time.perf_counter()
+    for position, question in enumerate(questions):
+        index.add("ask", question, f"k{position}")
+    build = time.perf_counter() - start
+
+    probes = [rng.choice(questions) + "?" for _ in range(2000)]
+    start = time.perf_counter()
+    hits = sum(1 for probe in probes if index.find("ask", probe))
+    lookup = (time.perf_counter() - start) / len(probes)
+
+    print(f"entradas: {total}  construção: {build:.1f}s")
+    print(f"busca: {lookup * 1e6:.0f} µs/consulta  acertos: {hits}/{len(probes)}")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100_000)
@@ -0,0 +1,74 @@
+"""Compara o custo por chamada dos backends de estado (memória x SQLite).
+
+Uso: python scripts/bench_state_backends.py [operações] [processos]
+"""
+from __future__ import annotations
+
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+
+from bobot.services.cache import SharedCache
+from bobot.services.rate_limit import RateLimit, RateLimiter
+from bobot.services.state import InProcessBackend, SQLiteStateBackend
+
+
+def _per_call(func, total: int) -> float:
+    start = time.perf_counter()
+    for index in range(total):
+        func(index)
+    return (time.perf_counter() - start) / total * 1e6
+
+
+def _single(name: str, backend, total: int) -> None:
+    limiter = RateLimiter(
+        RateLimit(10**9, 60), RateLimit(10**9, 60, scope="global"), backend=backend, clock=time.time
+    )
+    cache = SharedCache(backend, namespace="bench")
+    rate = _per_call(lambda i: limiter.acquire(f"u{i % 500}"), total)
+    write = _per_call(lambda i: cache.set(f"k{i % 2000}", "x" * 500), total)
+    read = _per_call(lambda i: cache.get(f"k{i % 2000}"), total)
+    print(f"{name:>8}: rate {rate:6.1f} µs  cache.set {write:6.1f} µs  cache.get {read:6.1f} µs")
+
+
+def _worker(path: str, total: int) -> None:
+    limiter = RateLimiter(
+        RateLimit(10**9, 60), backend=SQLiteStateBackend(path), clock=time.time
+    )
+    for index in range(total):
+        limiter.acquire(f"u{index % 50}")
+
+
+def _contended(path: str, total: int, processes: int) -> None:
+    context = multiprocessing.get_context("fork")
+    workers = [context.Process(target=_worker, args=(path, total)) for _ in range(processes)]
+    start = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    elapsed = time.perf_counter() - start
+    calls = total * processes
+    print(
+        f"  sqlite x{processes} processos: {calls / elapsed:,.0f} checagens/s"
+        f" ({elapsed / total * 1e6:.1f} µs por chamada em cada processo)"
+    )
+
+
+def main(total: int, processes: int) -> None:
+    _single("memória", InProcessBackend(), total)
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "state.db")
+        backend = SQLiteStateBackend(path)
+        _single("sqlite", backend, total)
+        backend.close()
+        _contended(path, total, processes)
+
+
+if __name__ == "__main__":
+    main(
+        int(sys.argv[1]) if len(sys.argv) > 1 else 20_000,
+        int(sys.argv[2]) if len(sys.argv) > 2 else 4,
+    )
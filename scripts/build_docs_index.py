@@ -0,0 +1,56 @@
+"""Monta o índice BM25 offline usado pelo ``!docs`` e pelo ``!pergunta``.
+
+O dump fica em pastas por tecnologia (python, javascript, html, css,
+mongodb, csharp, c), com arquivos .md, .txt, .rst ou .html, por exemplo
+a documentação do Python em texto e as páginas do MDN baixadas.
+
+Uso: python scripts/build_docs_index.py <pasta_do_dump> [saida] [palavras_por_passagem]
+"""
+from __future__ import annotations
+
+import os
+import sys
+import time
+from collections import Counter
+
+from bobot.services.docs_index import DocsIndex, iter_dump, write_index
+
+
+def main(root: str, output: str, max_words: int) -> None:
+    start = time.perf_counter()
+    per_tech: Counter = Counter()
+
+    def passages():
+        for passage in iter_dump(root, max_words):
+            per_tech[passage.tech] += 1
+            yield passage
+
+    size = write_index(output, passages())
+    build = time.perf_counter() - start
+
+    start = time.perf_counter()
+    index = DocsIndex.open(output)
+    opened = time.perf_counter() - start
+    probes = ["list comprehension", "array map", "flexbox", "find_one", "async await"]
+    start = time.perf_counter()
+    for probe in probes:
+        index.search(probe)
+    lookup = (time.perf_counter() - start) / len(probes)
+    index.close()
+
+    print(f"passagens: {sum(per_tech.values())}  " + "  ".join(
+        f"{tech}: {count}" for tech, count in sorted(per_tech.items())
+    ))
+    print(f"arquivo: {output} ({size / 1024 / 1024:.1f} MiB)  construção: {build:.1f}s")
+    print(f"abertura (mmap): {opened * 1000:.2f} ms  busca: {lookup * 1000:.2f} ms")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print(__doc__)
+        sys.exit(1)
+    main(
+        sys.argv[1],
+        sys.argv[2] if len(sys.argv) > 2 else os.getenv("DOCS_INDEX_PATH", "docs_index.bin"),
+        int(sys.argv[3]) if len(sys.argv) > 3 else 120,
+    )
@@ -0,0 +1,171 @@
+from __future__ import annotations
+
+import asyncio
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional
+
+import discord
+
+from bobot.services.metrics import metrics
+from bobot.services.rate_limit import RateLimit, RateLimiter
+
+SendFunc = Callable[..., Awaitable[Any]]
+
+
+@dataclass
+class _Outgoing:
+    func: SendFunc
+    content: Optional[str]
+    kwargs: Dict[str, Any]
+    merge: bool
+    future: asyncio.Future
+    enqueued_at: float = field(default=0.0)
+
+
+def _retry_after(exc: discord.HTTPException) -> float:
+    retry_after = getattr(exc, "retry_after", None)
+    if retry_after is None:
+        headers = getattr(getattr(exc, "response", None), "headers", None) or {}
+        try:
+            retry_after = float(headers.get("Retry-After", 1.0))
+        except (TypeError, ValueError):
+            retry_after = 1.0
+    return max(0.0, float(retry_after))
+
+
+class OutboundDispatcher:
+    """Fila de saída por canal para as mensagens do bot.
+
+    Cada canal tem a sua fila, esvaziada em ordem por uma task própria que
+    respeita o balde de rate limit do canal (``limiter``, por padrão 5
+    mensagens a cada 5 s por canal e 50/s no total) antes de chamar o
+    Discord. Assim respostas que terminam juntas no mesmo canal saem
+    espaçadas, sem 429 nem as esperas internas do discord.py.
+
+    Mensagens só de texto enviadas com ``merge=True`` e ainda na fila são
+    juntadas numa só enquanto couberem em ``merge_limit`` caracteres; todos
+    recebem a mesma ``Message``. Um 429 é repetido até ``max_retries`` vezes
+    após o ``retry_after`` informado.
+    """
+
+    def __init__(
+        self,
+        limiter: Optional[RateLimiter] = None,
+        merge_limit: int = 2000,
+        max_retries: int = 3,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        if limiter is None:
+            limiter = RateLimiter(
+                RateLimit(5, 5), RateLimit(50, 1, scope="global"), clock=clock
+            )
+        self._limiter = limiter
+        self._merge_limit = merge_limit
+        self._max_retries = max_retries
+        self._clock = clock
+        self._queues: Dict[str, Deque[_Outgoing]] = {}
+        self._workers: Dict[str, asyncio.Task] = {}
+
+    def pending(self, channel: str) -> int:
+        return len(self._queues.get(channel, ()))
+
+    async def send(
+        self,
+        channel: str,
+        func: SendFunc,
+        content: Optional[str] = None,
+        merge: bool = False,
+        **kwargs: Any,
+    ) -> Any:
+        future: asyncio.Future = asyncio.get_running_loop().create_future()
+        item = _Outgoing(
+            func,
+            content,
+            kwargs,
+            merge and content is not None and not kwargs,
+            future,
+            self._clock(),
+        )
+        self._queues.setdefault(channel, deque()).append(item)
+        if channel not in self._workers:
+            self._workers[channel] = asyncio.create_task(self._drain(channel))
+        return await future
+
+    async def drain(self) -> None:
+        """Espera todas as filas esvaziarem (usado ao desligar o bot)."""
+        while self._workers:
+            await asyncio.gather(*self._workers.values(), return_exceptions=True)
+
+    async def _drain(self, channel: str) -> None:
+        queue = self._queues[channel]
+        try:
+            while queue:
+                batch = self._take(queue)
+                if batch:
+                    await self._pace(channel)
+                    await self._deliver(batch)
+        finally:
+            del self._workers[channel]
+            del self._queues[channel]
+
+    def _take(self, queue: Deque[_Outgoing]) -> List[_Outgoing]:
+        batch: List[_Outgoing] = []
+        size = 0
+        while queue:
+            item = queue[0]
+            if item.future.done():
+                # Quem pediu desistiu antes da vez.
+                queue.popleft()
+                continue
+            if batch:
+                if not (batch[0].merge and item.merge):
+                    break
+                if size + 1 + len(item.content) > self._merge_limit:
+                    break
+                size += 1
+            batch.append(queue.popleft())
+            size += len(item.content or "")
+        return batch
+
+    async def _pace(self, channel: str) -> None:
+        while True:
+            decision = self._limiter.acquire(channel)
+            if decision.allowed:
+                return
+            metrics.incr("discord.throttled")
+            await asyncio.sleep(decision.retry_after)
+
+    async def _deliver(self, batch: List[_Outgoing]) -> None:
+        first = batch[0]
+        content = first.content
+        if len(batch) > 1:
+            content = "\n".join(item.content for item in batch)
+            metrics.incr("discord.merged", len(batch) - 1)
+        for attempt in range(self._max_retries + 1):
+            started = self._clock()
+            try:
+                message = await first.func(content, **first.kwargs)
+            except discord.HTTPException as exc:
+                if exc.status == 429 and attempt < self._max_retries:
+                    metrics.incr("discord.429")
+                    await asyncio.sleep(_retry_after(exc))
+                    continue
+                if exc.status == 429:
+                    metrics.incr("discord.429")
+                error: BaseException = exc
+            except Exception as exc:
+                error = exc
+            else:
+                finished = self._clock()
+                metrics.observe("discord.send_latency", finished - started)
+                for item in batch:
+                    metrics.observe("discord.send_wait", finished - item.enqueued_at)
+                    if not item.future.done():
+                        item.future.set_result(message)
+                return
+            for item in batch:
+                if not item.future.done():
+                    item.future.set_exception(error)
+            return
@@ -0,0 +1,147 @@
+from __future__ import annotations
+
+import io
+import time
+from typing import Any, Callable, List, Optional
+
+import discord
+
+from bobot.services.metrics import metrics
+from bobot.utils.text import chunk_text, take_chunk
+
+ATTACHMENT_NOTE = "\n\n📎 Resposta completa no anexo."
+
+
+def answer_file(text: str, filename: str = "resposta.md") -> discord.File:
+    return discord.File(io.BytesIO(text.encode("utf-8")), filename=filename)
+
+
+class ProgressiveReply:
+    """Publica uma resposta em streaming editando mensagens do Discord.
+
+    A primeira mensagem sai assim que chega o primeiro token; depois o texto é
+    atualizado por edições espaçadas por ``edit_interval`` segundos e, ao passar
+    de ``max_size`` caracteres, continua em uma nova mensagem (cortando em
+    parágrafos ou linhas e reabrindo blocos de código).
+
+    Com ``attach_after`` a resposta que passar desse tamanho para de abrir
+    mensagens novas e, no fim, vai inteira como arquivo anexo.
+    """
+
+    def __init__(
+        self,
+        ctx: Any,
+        header: str = "",
+        max_size: int = 1900,
+        edit_interval: float = 1.0,
+        attach_after: int = 0,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self._ctx = ctx
+        self._attach_after = attach_after
+        self._full = header
+        self._attaching = False
+        self._max_size = max_size
+        self._edit_interval = edit_interval
+        self._clock = clock
+        self._started = clock()
+        self._buffer = header
+        self._message: Optional[Any] = None
+        self._published = ""
+        self._last_edit = 0.0
+        self.messages: List[Any] = []
+
+    async def feed(self, piece: str) -> None:
+        self._full += piece
+        if self._attaching:
+            return
+        if self._attach_after and len(self._full) > self._attach_after:
+            await self._start_attachment()
+            return
+        self._buffer += piece
+        while len(self._buffer) > self._max_size:
+            head, self._buffer = take_chunk(self._buffer, self._max_size)
+            await self._publish(head)
+            self._message = None
+            self._published = ""
+        if self._message is None:
+            if self._buffer:
+                await self._publish(self._buffer)
+        elif self._clock() - self._last_edit >= self._edit_interval:
+            await self._publish(self._buffer)
+
+    async def _start_attachment(self) -> None:
+        self._attaching = True
+        head, _ = take_chunk(self._buffer, self._max_size - len(ATTACHMENT_NOTE))
+        self._buffer = ""
+        await self._publish(head + ATTACHMENT_NOTE)
+
+    async def finish(self) -> None:
+        if self._attaching:
+            await self._ctx.send(file=answer_file(self._full))
+            metrics.incr("discord.attachments")
+            self._attaching = False
+            return
+        if self._buffer and (self._message is None or self._buffer != self._published):
+            await self._publish(self._buffer)
+
+    async def _publish(self, content: str) -> None:
+        if self._message is None:
+            self._message = await self._ctx.send(content)
+            self.messages.append(self._message)
+            if len(self.messages) == 1:
+                metrics.observe("discord.time_to_first_token", self._clock() - self._started)
+        elif content != self._published:
+            await self._message.edit(content=content)
+        self._published = content
+        self._last_edit = self._clock()
+
+
+# Limites do Discord por mensagem.
+MESSAGE_LIMIT = 2000
+EMBED_DESCRIPTION_LIMIT = 4096
+EMBEDS_TOTAL_LIMIT = 6000
+EMBEDS_PER_MESSAGE = 10
+
+
+def pack_embeds(chunks: List[str]) -> List[List[str]]:
+    """Agrupa pedaços (até 4096 caracteres) no menor número de mensagens.
+
+    Cada mensagem leva até 10 embeds e 6000 caracteres somados.
+    """
+    messages: List[List[str]] = []
+    total = 0
+    for chunk in chunks:
+        if (
+            not messages
+            or total + len(chunk) > EMBEDS_TOTAL_LIMIT
+            or len(messages[-1]) >= EMBEDS_PER_MESSAGE
+        ):
+            messages.append([])
+            total = 0
+        messages[-1].append(chunk)
+        total += len(chunk)
+    return messages
+
+
+async def send_long(
+    ctx: Any, content: str, attach_after: int = 0, **options: Any
+) -> int:
+    """Envia um texto com o mínimo de chamadas ao Discord; devolve quantas fez.
+
+    Até 2000 caracteres vai como mensagem comum (com ``options`` repassadas
+    ao ``send``); acima de ``attach_after`` vai como arquivo; no meio, como
+    embeds de 4096 caracteres agrupados.
+    """
+    if len(content) <= MESSAGE_LIMIT:
+        await ctx.send(content, **options)
+        return 1
+    if attach_after and len(content) > attach_after:
+        head, _ = take_chunk(content, MESSAGE_LIMIT - len(ATTACHMENT_NOTE))
+        await ctx.send(head + ATTACHMENT_NOTE, file=answer_file(content))
+        metrics.incr("discord.attachments")
+        return 1
+    groups = pack_embeds(chunk_text(content, EMBED_DESCRIPTION_LIMIT))
+    for group in groups:
+        await ctx.send(embeds=[discord.Embed(description=chunk) for chunk in group])
+    return len(groups)
@@ -1,12 +1,16 @@
 from __future__ import annotations
 
-from typing import Protocol
+from typing import Any, AsyncIterator, Dict, Optional, Protocol
 
 
 class BaseLLM(Protocol):
     name: str
 
-    async def generate(self, prompt: str) -> str:
+    async def generate(self, prompt: str, schema: Optional[Dict[str, Any]] = None) -> str:
+        """Com ``schema`` (JSON Schema) o provider restringe a saída a esse formato."""
+        ...
+
+    def stream(self, prompt: str) -> AsyncIterator[str]:
         ...
 
     async def health(self) -> bool:
@@ -1,28 +1,68 @@
 from __future__ import annotations
 
+import time
 from dataclasses import dataclass
 from typing import List
 
 from bobot.ai.gpt4all_client import GPT4AllClient
+from bobot.ai.health import HealthProber
+from bobot.ai.http_client import PoolLimits, RetryPolicy, configure_pool, configure_retries
 from bobot.ai.lmstudio_client import LMStudioClient
 from bobot.ai.ollama_client import OllamaClient
+from bobot.ai.prompts import PROMPT_TEMPLATE_VERSION
+from bobot.ai.routing import HedgeBudget, ProviderRouter
 from bobot.ai.runtime import LLMService
 from bobot.config import (
+    BOT_STATE_BACKEND,
+    BOT_STATE_PATH,
+    LLM_ADAPTIVE_CONCURRENCY,
+    LLM_BREAKER_COOLDOWN,
+    LLM_BREAKER_FAILURES,
+    LLM_CACHE_MAX_BYTES,
+    LLM_CACHE_MAX_ENTRIES,
     LLM_CACHE_TTL,
+    LLM_CONCURRENCY_MAX,
+    LLM_CONCURRENCY_MIN,
+    LLM_DISK_CACHE_PATH,
+    LLM_DISK_CACHE_TTL,
     LLM_FALLBACKS,
     LLM_GPT4ALL_URL,
+    LLM_HEALTH_INTERVAL,
+    LLM_HEALTH_TIMEOUT,
+    LLM_HEDGE_BUDGET_PER_MINUTE,
+    LLM_HEDGE_QUANTILE,
+    LLM_HEDGING,
+    LLM_HTTP_KEEPALIVE_EXPIRY,
+    LLM_HTTP_MAX_CONNECTIONS,
+    LLM_HTTP_MAX_KEEPALIVE,
+    LLM_JOB_TIMEOUT,
     LLM_LMSTUDIO_URL,
     LLM_MAX_CONCURRENCY,
     LLM_MODEL,
     LLM_OLLAMA_URL,
     LLM_PROVIDER,
+    LLM_QUEUE_MAX_DEPTH,
+    LLM_QUEUE_MAX_WAIT,
+    LLM_RETRY_BASE_DELAY,
+    LLM_RETRY_BUDGET,
+    LLM_RETRY_BUDGET_REFILL,
+    LLM_RETRY_MAX_DELAY,
+    LLM_RATE_LIMIT_CHANNEL_MAX,
+    LLM_RATE_LIMIT_GLOBAL_MAX,
+    LLM_RATE_LIMIT_GUILD_MAX,
     LLM_RATE_LIMIT_MAX,
     LLM_RATE_LIMIT_WINDOW,
+    LLM_SIMILARITY_MAX_ENTRIES,
+    LLM_SIMILARITY_THRESHOLD,
     LLM_TIMEOUT,
 )
-from bobot.services.cache import InMemoryCache
+from bobot.services.cache import InMemoryCache, SharedCache
+from bobot.services.concurrency import AdaptiveLimit
+from bobot.services.disk_cache import PersistentCache
 from bobot.services.rate_limit import RateLimit, RateLimiter
 from bobot.services.queue import AsyncTaskQueue
+from bobot.services.similarity import SimilarPromptIndex
+from bobot.services.state import SQLiteStateBackend, StateBackend
 
 
 @dataclass
@@ -34,6 +74,8 @@ class LLMSettings:
     ollama_url: str
     lmstudio_url: str
     gpt4all_url: str
+    disk_cache_path: str = ""
+    disk_cache_ttl: int = 86400
 
 
 def build_settings() -> LLMSettings:
@@ -45,6 +87,8 @@ def build_settings() -> LLMSettings:
         ollama_url=LLM_OLLAMA_URL,
         lmstudio_url=LLM_LMSTUDIO_URL,
         gpt4all_url=LLM_GPT4ALL_URL,
+        disk_cache_path=LLM_DISK_CACHE_PATH,
+        disk_cache_ttl=LLM_DISK_CACHE_TTL,
     )
 
 
@@ -58,16 +102,117 @@ def build_providers(settings: LLMSettings):
     return [providers[name] for name in ordered if name in providers]
 
 
+def cache_namespace(settings: LLMSettings) -> str:
+    return f"{settings.provider}:{settings.model}:v{PROMPT_TEMPLATE_VERSION}"
+
+
+def build_persistent_cache(settings: LLMSettings) -> PersistentCache | None:
+    if not settings.disk_cache_path:
+        return None
+    return PersistentCache(
+        settings.disk_cache_path,
+        namespace=cache_namespace(settings),
+        ttl_seconds=settings.disk_cache_ttl,
+    )
+
+
+def build_state_backend() -> StateBackend | None:
+    """Backend compartilhado entre processos; ``None`` mantém o estado no processo."""
+    if BOT_STATE_BACKEND != "sqlite":
+        return None
+    return SQLiteStateBackend(BOT_STATE_PATH)
+
+
+def build_similarity_index() -> SimilarPromptIndex | None:
+    if LLM_SIMILARITY_THRESHOLD <= 0:
+        return None
+    return SimilarPromptIndex(
+        threshold=LLM_SIMILARITY_THRESHOLD, max_entries=LLM_SIMILARITY_MAX_ENTRIES
+    )
+
+
+def build_hedge_budget() -> HedgeBudget | None:
+    if not LLM_HEDGING:
+        return None
+    return HedgeBudget(per_minute=LLM_HEDGE_BUDGET_PER_MINUTE)
+
+
+def build_rate_limits() -> List[RateLimit]:
+    tiers = [
+        ("user", LLM_RATE_LIMIT_MAX),
+        ("channel", LLM_RATE_LIMIT_CHANNEL_MAX),
+        ("guild", LLM_RATE_LIMIT_GUILD_MAX),
+        ("global", LLM_RATE_LIMIT_GLOBAL_MAX),
+    ]
+    return [
+        RateLimit(max_requests, LLM_RATE_LIMIT_WINDOW, scope=scope)
+        for scope, max_requests in tiers
+        if max_requests > 0
+    ]
+
+
+def build_concurrency_limit() -> AdaptiveLimit | None:
+    if not LLM_ADAPTIVE_CONCURRENCY:
+        return None
+    return AdaptiveLimit(
+        initial=LLM_MAX_CONCURRENCY, min_limit=LLM_CONCURRENCY_MIN, max_limit=LLM_CONCURRENCY_MAX
+    )
+
+
 def create_llm_service() -> LLMService:
     settings = build_settings()
+    configure_pool(
+        PoolLimits(
+            max_connections=LLM_HTTP_MAX_CONNECTIONS,
+            max_keepalive=LLM_HTTP_MAX_KEEPALIVE,
+            keepalive_expiry=LLM_HTTP_KEEPALIVE_EXPIRY,
+        )
+    )
+    configure_retries(
+        RetryPolicy(
+            base_delay=LLM_RETRY_BASE_DELAY,
+            max_delay=LLM_RETRY_MAX_DELAY,
+            budget_capacity=LLM_RETRY_BUDGET,
+            budget_refill_per_second=LLM_RETRY_BUDGET_REFILL,
+        )
+    )
     providers = build_providers(settings)
-    cache = InMemoryCache()
-    limiter = RateLimiter(RateLimit(LLM_RATE_LIMIT_MAX, LLM_RATE_LIMIT_WINDOW))
-    queue = AsyncTaskQueue(concurrency=LLM_MAX_CONCURRENCY)
+    backend = build_state_backend()
+    if backend is None:
+        cache = InMemoryCache(max_entries=LLM_CACHE_MAX_ENTRIES, max_bytes=LLM_CACHE_MAX_BYTES)
+        limiter = RateLimiter(*build_rate_limits())
+    else:
+        cache = SharedCache(backend, namespace=cache_namespace(settings))
+        limiter = RateLimiter(*build_rate_limits(), backend=backend, clock=time.time)
+    queue = AsyncTaskQueue(
+        concurrency=LLM_MAX_CONCURRENCY,
+        max_depth=LLM_QUEUE_MAX_DEPTH,
+        max_wait=LLM_QUEUE_MAX_WAIT,
+        job_timeout=LLM_JOB_TIMEOUT,
+        limiter=build_concurrency_limit(),
+    )
     return LLMService(
         providers=providers,
         cache=cache,
         rate_limiter=limiter,
         queue=queue,
         cache_ttl=LLM_CACHE_TTL,
+        persistent_cache=build_persistent_cache(settings),
+        state_backend=backend,
+        similarity=build_similarity_index(),
+        router=ProviderRouter(
+            failure_threshold=LLM_BREAKER_FAILURES, cooldown=LLM_BREAKER_COOLDOWN
+        ),
+        hedge_budget=build_hedge_budget(),
+        hedge_quantile=LLM_HEDGE_QUANTILE,
+        health_timeout=LLM_HEALTH_TIMEOUT,
+    )
+
+
+def create_health_prober(service: LLMService) -> HealthProber:
+    return HealthProber(
+        service.providers,
+        router=service.router,
+        interval=LLM_HEALTH_INTERVAL,
+        timeout=service.health_timeout,
     )
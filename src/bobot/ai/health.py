@@ -0,0 +1,93 @@
+from __future__ import annotations
+
+import asyncio
+import time
+from dataclasses import dataclass
+from typing import Callable, Dict, Optional, Sequence
+
+from bobot.ai.base import BaseLLM
+from bobot.ai.routing import ProviderRouter
+from bobot.utils.logging import get_logger
+
+logger = get_logger(__name__)
+
+
+@dataclass(frozen=True)
+class ProbeResult:
+    ok: bool
+    latency: Optional[float]
+    checked_at: float
+    error: str = ""
+
+
+async def probe(
+    provider: BaseLLM, timeout: float, clock: Callable[[], float] = time.time
+) -> ProbeResult:
+    started = time.monotonic()
+    try:
+        await asyncio.wait_for(provider.health(), timeout=timeout)
+    except Exception as exc:
+        logger.warning("Health falhou para %s: %s", provider.name, exc)
+        error = "timeout" if isinstance(exc, asyncio.TimeoutError) else str(exc)
+        return ProbeResult(ok=False, latency=None, checked_at=clock(), error=error)
+    return ProbeResult(ok=True, latency=time.monotonic() - started, checked_at=clock())
+
+
+async def probe_all(
+    providers: Sequence[BaseLLM], timeout: float, clock: Callable[[], float] = time.time
+) -> Dict[str, ProbeResult]:
+    results = await asyncio.gather(*(probe(provider, timeout, clock) for provider in providers))
+    return {provider.name: result for provider, result in zip(providers, results)}
+
+
+class HealthProber:
+    """Sonda os providers em segundo plano e guarda o último resultado.
+
+    O ``!status`` e o roteamento leem ``snapshot()`` em vez de sondar na hora.
+    """
+
+    def __init__(
+        self,
+        providers: Sequence[BaseLLM],
+        router: Optional[ProviderRouter] = None,
+        interval: float = 30.0,
+        timeout: float = 3.0,
+        clock: Callable[[], float] = time.time,
+    ) -> None:
+        self._providers = providers
+        self._router = router
+        self._interval = interval
+        self._timeout = timeout
+        self._clock = clock
+        self._results: Dict[str, ProbeResult] = {}
+        self._task: Optional[asyncio.Task] = None
+
+    def snapshot(self) -> Dict[str, ProbeResult]:
+        return dict(self._results)
+
+    async def refresh(self) -> Dict[str, ProbeResult]:
+        results = await probe_all(self._providers, self._timeout, self._clock)
+        self._results.update(results)
+        if self._router is not None:
+            for name, result in results.items():
+                self._router.mark_health(name, result.ok)
+        return results
+
+    def start(self) -> None:
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def _run(self) -> None:
+        while True:
+            await self.refresh()
+            await asyncio.sleep(self._interval)
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
@@ -1,50 +1,258 @@
 from __future__ import annotations
 
 import asyncio
-from typing import Any, Dict
+import json
+import random
+import time
+from dataclasses import dataclass
+from email.utils import parsedate_to_datetime
+from typing import Any, AsyncIterator, Callable, Dict
+from urllib.parse import urlsplit
 
 import httpx
 
 from bobot.domain.exceptions import ExternalServiceError
+from bobot.services.metrics import metrics
 from bobot.utils.logging import get_logger
 
 logger = get_logger(__name__)
 
 
+@dataclass
+class PoolLimits:
+    max_connections: int = 10
+    max_keepalive: int = 5
+    keepalive_expiry: float = 30.0
+
+
+class HTTPClientPool:
+    """Keeps one long-lived ``httpx.AsyncClient`` per provider base URL."""
+
+    def __init__(self, limits: PoolLimits | None = None) -> None:
+        self._limits = limits or PoolLimits()
+        self._clients: Dict[str, httpx.AsyncClient] = {}
+
+    def configure(self, limits: PoolLimits) -> None:
+        self._limits = limits
+
+    def get(self, url: str) -> httpx.AsyncClient:
+        origin = _origin(url)
+        client = self._clients.get(origin)
+        if client is None or client.is_closed:
+            client = httpx.AsyncClient(
+                limits=httpx.Limits(
+                    max_connections=self._limits.max_connections,
+                    max_keepalive_connections=self._limits.max_keepalive,
+                    keepalive_expiry=self._limits.keepalive_expiry,
+                ),
+            )
+            self._clients[origin] = client
+        return client
+
+    async def aclose(self) -> None:
+        clients = list(self._clients.values())
+        self._clients.clear()
+        for client in clients:
+            await client.aclose()
+
+
+def _origin(url: str) -> str:
+    parts = urlsplit(url)
+    return f"{parts.scheme}://{parts.netloc}"
+
+
+_pool = HTTPClientPool()
+
+
+def configure_pool(limits: PoolLimits) -> None:
+    _pool.configure(limits)
+
+
+def get_client(url: str) -> httpx.AsyncClient:
+    return _pool.get(url)
+
+
+async def close_clients() -> None:
+    await _pool.aclose()
+
+
+@dataclass
+class RetryPolicy:
+    """Backoff exponencial com jitter e orçamento de retries por origem."""
+
+    base_delay: float = 0.2
+    max_delay: float = 5.0
+    multiplier: float = 2.0
+    budget_capacity: float = 10.0
+    budget_refill_per_second: float = 0.5
+
+    def backoff(self, attempt: int, retry_after: float | None = None) -> float:
+        if retry_after is not None:
+            return retry_after
+        ceiling = min(self.max_delay, self.base_delay * self.multiplier**attempt)
+        return random.uniform(ceiling / 2, ceiling)
+
+
+class RetryBudget:
+    """Token bucket que impede os retries de multiplicarem a carga numa queda."""
+
+    def __init__(
+        self, capacity: float, refill_per_second: float, clock: Callable[[], float] = time.monotonic
+    ) -> None:
+        self._capacity = max(0.0, capacity)
+        self._refill = refill_per_second
+        self._tokens = self._capacity
+        self._clock = clock
+        self._updated = clock()
+
+    def try_acquire(self) -> bool:
+        now = self._clock()
+        self._tokens = min(self._capacity, self._tokens + (now - self._updated) * self._refill)
+        self._updated = now
+        if self._tokens >= 1:
+            self._tokens -= 1
+            return True
+        return False
+
+
+_retry_policy = RetryPolicy()
+_retry_budgets: Dict[str, RetryBudget] = {}
+
+
+def configure_retries(policy: RetryPolicy) -> None:
+    global _retry_policy
+    _retry_policy = policy
+    _retry_budgets.clear()
+
+
+def _retry_budget(url: str) -> RetryBudget:
+    origin = _origin(url)
+    budget = _retry_budgets.get(origin)
+    if budget is None:
+        budget = _retry_budgets[origin] = RetryBudget(
+            _retry_policy.budget_capacity, _retry_policy.budget_refill_per_second
+        )
+    return budget
+
+
+def retry_cause(exc: Exception) -> str | None:
+    """Motivo do retry, ou ``None`` quando repetir a chamada não adianta."""
+    if isinstance(exc, httpx.TimeoutException):
+        return "timeout"
+    if isinstance(exc, httpx.TransportError):
+        return "connection"
+    if isinstance(exc, httpx.HTTPStatusError):
+        status = exc.response.status_code
+        if status == 429:
+            return "429"
+        if status >= 500:
+            return "5xx"
+    return None
+
+
+def _retry_after(exc: Exception) -> float | None:
+    if not isinstance(exc, httpx.HTTPStatusError):
+        return None
+    value = exc.response.headers.get("Retry-After")
+    if value is None:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        moment = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, moment.timestamp() - time.time())
+
+
+async def _request_json(
+    method: str,
+    url: str,
+    timeout: float,
+    retries: int,
+    failure_message: str,
+    payload: Dict[str, Any] | None = None,
+) -> Dict[str, Any]:
+    client = get_client(url)
+    attempt = 0
+    while True:
+        try:
+            if method == "POST":
+                response = await client.post(url, json=payload, timeout=timeout)
+            else:
+                response = await client.get(url, timeout=timeout)
+            response.raise_for_status()
+            return response.json()
+        except Exception as exc:
+            logger.warning("%s (%s/%s): %s", failure_message, attempt + 1, retries + 1, exc)
+            cause = retry_cause(exc)
+            if cause is None or attempt >= retries:
+                raise ExternalServiceError(failure_message) from exc
+            delay = _retry_policy.backoff(attempt, _retry_after(exc))
+            if delay > _retry_policy.max_delay:
+                metrics.incr("http.retries.retry_after_too_long")
+                raise ExternalServiceError(failure_message) from exc
+            if not _retry_budget(url).try_acquire():
+                metrics.incr("http.retries.budget_exhausted")
+                raise ExternalServiceError(failure_message) from exc
+            metrics.incr(f"http.retries.{cause}")
+            await asyncio.sleep(delay)
+            attempt += 1
+
+
 async def post_json(
     url: str,
     payload: Dict[str, Any],
     timeout: float,
     retries: int = 2,
 ) -> Dict[str, Any]:
-    last_error: Exception | None = None
+    return await _request_json(
+        "POST", url, timeout, retries, "Falha ao chamar o serviço de LLM.", payload
+    )
 
-    for attempt in range(retries + 1):
-        try:
-            async with httpx.AsyncClient(timeout=timeout) as client:
-                response = await client.post(url, json=payload)
-                response.raise_for_status()
-                return response.json()
-        except Exception as exc:
-            last_error = exc
-            logger.warning("Falha ao chamar LLM (%s/%s): %s", attempt + 1, retries + 1, exc)
-            await asyncio.sleep(0.2 * (attempt + 1))
 
-    raise ExternalServiceError("Falha ao chamar o serviço de LLM.") from last_error
+async def get_json(url: str, timeout: float, retries: int = 1) -> Dict[str, Any]:
+    return await _request_json("GET", url, timeout, retries, "Falha ao consultar health do LLM.")
 
 
-async def get_json(url: str, timeout: float, retries: int = 1) -> Dict[str, Any]:
-    last_error: Exception | None = None
+async def stream_lines(
+    url: str, payload: Dict[str, Any], timeout: float
+) -> AsyncIterator[str]:
+    try:
+        async with get_client(url).stream(
+            "POST", url, json=payload, timeout=timeout
+        ) as response:
+            response.raise_for_status()
+            async for line in response.aiter_lines():
+                if line.strip():
+                    yield line
+    except Exception as exc:
+        logger.warning("Falha no streaming do LLM: %s", exc)
+        raise ExternalServiceError("Falha no streaming do serviço de LLM.") from exc
+
 
-    for attempt in range(retries + 1):
+async def iter_ndjson(
+    url: str, payload: Dict[str, Any], timeout: float
+) -> AsyncIterator[Dict[str, Any]]:
+    async for line in stream_lines(url, payload, timeout):
         try:
-            async with httpx.AsyncClient(timeout=timeout) as client:
-                response = await client.get(url)
-                response.raise_for_status()
-                return response.json()
-        except Exception as exc:
-            last_error = exc
-            logger.warning("Falha ao consultar health (%s/%s): %s", attempt + 1, retries + 1, exc)
-            await asyncio.sleep(0.2 * (attempt + 1))
+            yield json.loads(line)
+        except json.JSONDecodeError as exc:
+            raise ExternalServiceError("Resposta de streaming inválida.") from exc
+
 
-    raise ExternalServiceError("Falha ao consultar health do LLM.") from last_error
+async def iter_sse(
+    url: str, payload: Dict[str, Any], timeout: float
+) -> AsyncIterator[Dict[str, Any]]:
+    async for line in stream_lines(url, payload, timeout):
+        if not line.startswith("data:"):
+            continue
+        data = line[len("data:"):].strip()
+        if data == "[DONE]":
+            return
+        try:
+            yield json.loads(data)
+        except json.JSONDecodeError as exc:
+            raise ExternalServiceError("Resposta de streaming inválida.") from exc
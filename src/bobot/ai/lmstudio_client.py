@@ -1,9 +1,10 @@
 from __future__ import annotations
 
 from dataclasses import dataclass
+from typing import Any, AsyncIterator, Dict, Optional
 
 from bobot.ai.base import BaseLLM
-from bobot.ai.http_client import get_json, post_json
+from bobot.ai.http_client import get_json, iter_sse, post_json
 from bobot.domain.exceptions import ExternalServiceError
 
 
@@ -14,15 +15,24 @@ class LMStudioClient(BaseLLM):
     timeout: int
     name: str = "lmstudio"
 
-    async def generate(self, prompt: str) -> str:
-        payload = {
+    def _payload(self, prompt: str, stream: bool) -> Dict[str, Any]:
+        return {
             "model": self.model,
             "messages": [
                 {"role": "system", "content": "Você é um assistente técnico de programação."},
                 {"role": "user", "content": prompt},
             ],
             "temperature": 0.2,
+            "stream": stream,
         }
+
+    async def generate(self, prompt: str, schema: Optional[Dict[str, Any]] = None) -> str:
+        payload = self._payload(prompt, stream=False)
+        if schema is not None:
+            payload["response_format"] = {
+                "type": "json_schema",
+                "json_schema": {"name": "resposta", "strict": True, "schema": schema},
+            }
         data = await post_json(
             url=f"{self.base_url}/v1/chat/completions",
             payload=payload,
@@ -33,6 +43,24 @@ class LMStudioClient(BaseLLM):
         except Exception as exc:
             raise ExternalServiceError("Resposta inválida do LM Studio.") from exc
 
+    async def stream(self, prompt: str) -> AsyncIterator[str]:
+        emitted = False
+        async for event in iter_sse(
+            url=f"{self.base_url}/v1/chat/completions",
+            payload=self._payload(prompt, stream=True),
+            timeout=self.timeout,
+        ):
+            try:
+                choices = event.get("choices") or []
+                piece = choices[0].get("delta", {}).get("content") if choices else None
+            except Exception as exc:
+                raise ExternalServiceError("Resposta inválida do LM Studio.") from exc
+            if piece:
+                emitted = True
+                yield piece
+        if not emitted:
+            raise ExternalServiceError("Resposta inválida do LM Studio.")
+
     async def health(self) -> bool:
-        await get_json(url=f"{self.base_url}/v1/models", timeout=self.timeout)
+        await get_json(url=f"{self.base_url}/v1/models", timeout=self.timeout, retries=0)
         return True
@@ -1,9 +1,10 @@
 from __future__ import annotations
 
 from dataclasses import dataclass
+from typing import Any, AsyncIterator, Dict, Optional
 
 from bobot.ai.base import BaseLLM
-from bobot.ai.http_client import get_json, post_json
+from bobot.ai.http_client import get_json, iter_ndjson, post_json
 from bobot.domain.exceptions import ExternalServiceError
 
 
@@ -14,8 +15,13 @@ class OllamaClient(BaseLLM):
     timeout: int
     name: str = "ollama"
 
-    async def generate(self, prompt: str) -> str:
-        payload = {"model": self.model, "prompt": prompt, "stream": False}
+    def _payload(self, prompt: str, stream: bool) -> Dict[str, Any]:
+        return {"model": self.model, "prompt": prompt, "stream": stream}
+
+    async def generate(self, prompt: str, schema: Optional[Dict[str, Any]] = None) -> str:
+        payload = self._payload(prompt, stream=False)
+        if schema is not None:
+            payload["format"] = schema
         data = await post_json(
             url=f"{self.base_url}/api/generate",
             payload=payload,
@@ -26,6 +32,20 @@ class OllamaClient(BaseLLM):
             raise ExternalServiceError("Resposta inválida do Ollama.")
         return response
 
+    async def stream(self, prompt: str) -> AsyncIterator[str]:
+        emitted = False
+        async for data in iter_ndjson(
+            url=f"{self.base_url}/api/generate",
+            payload=self._payload(prompt, stream=True),
+            timeout=self.timeout,
+        ):
+            piece = data.get("response")
+            if piece:
+                emitted = True
+                yield piece
+        if not emitted:
+            raise ExternalServiceError("Resposta inválida do Ollama.")
+
     async def health(self) -> bool:
-        await get_json(url=f"{self.base_url}/api/tags", timeout=self.timeout)
+        await get_json(url=f"{self.base_url}/api/tags", timeout=self.timeout, retries=0)
         return True
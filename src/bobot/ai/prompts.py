@@ -1,7 +1,12 @@
 from __future__ import annotations
 
+from typing import Sequence
+
 from bobot.utils.validation import sanitize_prompt
 
+# Incrementar ao mudar o texto dos templates: invalida o cache persistente.
+PROMPT_TEMPLATE_VERSION = "1"
+
 
 def _wants_detail(text: str) -> bool:
     keywords = [
@@ -16,7 +21,18 @@ def _wants_detail(text: str) -> bool:
     return any(keyword in lowered for keyword in keywords)
 
 
-def build_ask_prompt(question: str) -> str:
+def _context_block(passages: Sequence[str]) -> str:
+    if not passages:
+        return ""
+    numbered = "\n".join(f"[{idx}] {passage}" for idx, passage in enumerate(passages, 1))
+    return (
+        "\n\nTrechos da documentação local (baseie a resposta neles quando "
+        "forem relevantes e cite a fonte):\n"
+        f"{numbered}"
+    )
+
+
+def build_ask_prompt(question: str, context: Sequence[str] = ()) -> str:
     clean = sanitize_prompt(question)
     detail = _wants_detail(clean)
     style = (
@@ -28,6 +44,7 @@ def build_ask_prompt(question: str) -> str:
     return (
         f"Você é um assistente técnico de programação. {style}\n\n"
         f"Pergunta: {clean}"
+        f"{_context_block(context)}"
     )
 
 
@@ -61,7 +78,7 @@ def build_debug_prompt(error_text: str) -> str:
     )
 
 
-def build_docs_prompt(tech: str) -> str:
+def build_docs_prompt(tech: str, context: Sequence[str] = ()) -> str:
     clean = sanitize_prompt(tech)
     detail = _wants_detail(clean)
     style = (
@@ -72,4 +89,5 @@ def build_docs_prompt(tech: str) -> str:
     return (
         f"{style}\n\n"
         f"Tecnologia: {clean}"
+        f"{_context_block(context)}"
     )
@@ -0,0 +1,182 @@
+from __future__ import annotations
+
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from enum import Enum
+from typing import Callable, Deque, Dict, List, Optional, Sequence
+
+from bobot.ai.base import BaseLLM
+from bobot.services.metrics import metrics
+
+
+class CircuitState(str, Enum):
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half-open"
+
+
+@dataclass
+class ProviderStats:
+    name: str
+    state: CircuitState = CircuitState.CLOSED
+    latency_ewma: Optional[float] = None
+    error_rate: float = 0.0
+    consecutive_failures: int = 0
+    opened_at: float = 0.0
+    trial_inflight: bool = False
+    healthy: bool = True
+    latencies: Deque[float] = field(default_factory=lambda: deque(maxlen=200), repr=False)
+
+
+class ProviderRouter:
+    """Circuit breaker por provider e ordenação por saúde e latência (EWMA).
+
+    Providers com circuito aberto são pulados até ``cooldown`` segundos; depois
+    disso uma única chamada de teste (half-open) decide se o circuito fecha.
+    """
+
+    def __init__(
+        self,
+        failure_threshold: int = 3,
+        error_rate_threshold: float = 0.5,
+        cooldown: float = 30.0,
+        alpha: float = 0.3,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self._failure_threshold = max(1, failure_threshold)
+        self._error_rate_threshold = error_rate_threshold
+        self._cooldown = cooldown
+        self._alpha = alpha
+        self._clock = clock
+        self._stats: Dict[str, ProviderStats] = {}
+
+    def stats(self, name: str) -> ProviderStats:
+        stats = self._stats.get(name)
+        if stats is None:
+            stats = self._stats[name] = ProviderStats(name=name)
+        return stats
+
+    def snapshot(self) -> Dict[str, ProviderStats]:
+        return dict(self._stats)
+
+    def _refresh(self, stats: ProviderStats) -> None:
+        if (
+            stats.state is CircuitState.OPEN
+            and self._clock() - stats.opened_at >= self._cooldown
+        ):
+            self._transition(stats, CircuitState.HALF_OPEN)
+
+    def _score(self, stats: ProviderStats, prior: float) -> float:
+        latency = prior if stats.latency_ewma is None else stats.latency_ewma
+        return latency * (1.0 + 4.0 * stats.error_rate)
+
+    def order(self, providers: Sequence[BaseLLM]) -> List[BaseLLM]:
+        """Providers utilizáveis, do melhor para o pior.
+
+        Quem ainda não tem latência medida entra com a média dos medidos; no
+        empate vale a ordem configurada, então um provider novo não passa à
+        frente de um conhecido só por não ter histórico.
+        """
+        available = []
+        for position, provider in enumerate(providers):
+            stats = self.stats(provider.name)
+            self._refresh(stats)
+            if stats.state is not CircuitState.OPEN:
+                available.append((position, provider, stats))
+        measured = [
+            stats.latency_ewma for _, _, stats in available if stats.latency_ewma is not None
+        ]
+        prior = sum(measured) / len(measured) if measured else 0.0
+        candidates = [
+            (
+                stats.state is CircuitState.HALF_OPEN,
+                not stats.healthy,
+                self._score(stats, prior),
+                position,
+                provider,
+            )
+            for position, provider, stats in available
+        ]
+        candidates.sort(key=lambda item: item[:4])
+        return [item[4] for item in candidates]
+
+    def allow(self, name: str) -> bool:
+        stats = self.stats(name)
+        self._refresh(stats)
+        if stats.state is CircuitState.CLOSED:
+            return True
+        if stats.state is CircuitState.HALF_OPEN and not stats.trial_inflight:
+            stats.trial_inflight = True
+            return True
+        metrics.incr(f"llm.circuit.rejected.{name}")
+        return False
+
+    def release(self, name: str) -> None:
+        self.stats(name).trial_inflight = False
+
+    def mark_health(self, name: str, ok: bool) -> None:
+        """Resultado da última sonda; providers fora do ar vão para o fim da fila."""
+        self.stats(name).healthy = ok
+
+    def latency_quantile(self, name: str, q: float, min_samples: int = 5) -> Optional[float]:
+        samples = self.stats(name).latencies
+        if len(samples) < min_samples:
+            return None
+        ordered = sorted(samples)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+    def record_success(self, name: str, latency: float) -> None:
+        stats = self.stats(name)
+        stats.latencies.append(latency)
+        stats.latency_ewma = (
+            latency
+            if stats.latency_ewma is None
+            else self._alpha * latency + (1 - self._alpha) * stats.latency_ewma
+        )
+        stats.error_rate = (1 - self._alpha) * stats.error_rate
+        stats.consecutive_failures = 0
+        stats.trial_inflight = False
+        if stats.state is not CircuitState.CLOSED:
+            self._transition(stats, CircuitState.CLOSED)
+
+    def record_failure(self, name: str) -> None:
+        stats = self.stats(name)
+        stats.error_rate = self._alpha + (1 - self._alpha) * stats.error_rate
+        stats.consecutive_failures += 1
+        stats.trial_inflight = False
+        if (
+            stats.state is CircuitState.HALF_OPEN
+            or stats.consecutive_failures >= self._failure_threshold
+            or (
+                stats.consecutive_failures > 1
+                and stats.error_rate >= self._error_rate_threshold
+            )
+        ):
+            stats.opened_at = self._clock()
+            if stats.state is not CircuitState.OPEN:
+                self._transition(stats, CircuitState.OPEN)
+
+    def _transition(self, stats: ProviderStats, state: CircuitState) -> None:
+        stats.state = state
+        metrics.incr(f"llm.circuit.{state.value}.{stats.name}")
+
+
+class HedgeBudget:
+    """Limita quantas requisições de hedge podem ser disparadas por minuto."""
+
+    def __init__(self, per_minute: int, clock: Callable[[], float] = time.monotonic) -> None:
+        self._capacity = float(max(0, per_minute))
+        self._tokens = self._capacity
+        self._rate = self._capacity / 60.0
+        self._clock = clock
+        self._updated = clock()
+
+    def try_acquire(self) -> bool:
+        now = self._clock()
+        self._tokens = min(self._capacity, self._tokens + (now - self._updated) * self._rate)
+        self._updated = now
+        if self._tokens >= 1:
+            self._tokens -= 1
+            return True
+        return False
@@ -1,57 +1,501 @@
 from __future__ import annotations
 
-from dataclasses import dataclass
-from typing import Iterable, List
+import asyncio
+import json
+import time
+from contextlib import aclosing
+from dataclasses import dataclass, field
+from functools import partial
+from typing import (
+    Any,
+    AsyncIterator,
+    Awaitable,
+    Callable,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    TypeVar,
+    Union,
+)
 
 from bobot.ai.base import BaseLLM
-from bobot.domain.exceptions import ExternalServiceError
-from bobot.services.cache import InMemoryCache
+from bobot.ai.health import probe_all
+from bobot.ai.routing import HedgeBudget, ProviderRouter
+from bobot.domain.exceptions import ExternalServiceError, OverloadedError
+from bobot.services.cache import InMemoryCache, SharedCache
+from bobot.services.disk_cache import PersistentCache
+from bobot.services.metrics import metrics
 from bobot.services.rate_limit import RateLimiter
-from bobot.services.queue import AsyncTaskQueue
+from bobot.services.queue import AsyncTaskQueue, Priority, QueueEstimate
+from bobot.services.similarity import SimilarPromptIndex, canonicalize
+from bobot.services.state import StateBackend
 from bobot.utils.logging import get_logger
+from bobot.utils.validation import sanitize_prompt
 
 logger = get_logger(__name__)
 
+_STREAM_END = object()
+
+T = TypeVar("T")
+
+
+def cache_key(prompt: str) -> str:
+    """Chave do cache exato e do single-flight: só caixa e espaços são normalizados.
+
+    Pontuação e stop words contam (``a + b`` ≠ ``a - b``, ``c#`` ≠ ``c``); a
+    tolerância a variações fica por conta do ``SimilarPromptIndex``.
+    """
+    return " ".join(prompt.lower().split())
+
+
+@dataclass
+class _Attempt:
+    """Uma chamada a um provider: a task na fila e quando ela saiu da fila."""
+
+    provider: BaseLLM
+    task: asyncio.Future
+    started: asyncio.Event
+
+
+@dataclass
+class _StreamAttempt:
+    """Chamada em streaming: os pedaços chegam em ``sink``; ``first`` espera o primeiro."""
+
+    call: _Attempt
+    sink: asyncio.Queue
+    first: asyncio.Future
+
+
+@dataclass(frozen=True)
+class _Job:
+    """Como uma geração entra na fila: classe de prioridade e dono (fair queuing)."""
+
+    priority: Priority
+    user_key: str
+    schema: Optional[Dict[str, Any]] = field(default=None, compare=False)
+    use_cache: bool = field(default=True, compare=False)
+    on_queued: Optional[Callable[[QueueEstimate], None]] = field(default=None, compare=False)
+
 
 @dataclass
 class LLMService:
     providers: List[BaseLLM]
-    cache: InMemoryCache
+    cache: Union[InMemoryCache, SharedCache]
     rate_limiter: RateLimiter
     queue: AsyncTaskQueue
     cache_ttl: int = 300
+    persistent_cache: Optional[PersistentCache] = None
+    state_backend: Optional[StateBackend] = None
+    similarity: Optional[SimilarPromptIndex] = None
+    router: ProviderRouter = field(default_factory=ProviderRouter)
+    hedge_budget: Optional[HedgeBudget] = None
+    hedge_quantile: float = 0.95
+    health_timeout: float = 3.0
+    _inflight: Dict[str, asyncio.Future] = field(default_factory=dict, init=False, repr=False)
+    _waiters: Dict[asyncio.Future, int] = field(default_factory=dict, init=False, repr=False)
 
-    async def generate(self, prompt: str, user_key: str) -> str:
-        self.rate_limiter.check(user_key)
-        cached = self.cache.get(prompt)
+    async def _cached(self, key: str) -> Optional[str]:
+        cached = self.cache.get(key)
+        if cached or self.persistent_cache is None:
+            return cached
+        cached = await self.persistent_cache.get(key)
+        if cached:
+            self.cache.set(key, cached, ttl_seconds=self.cache_ttl)
+        return cached
+
+    def _store(self, key: str, result: str) -> None:
+        self.cache.set(key, result, ttl_seconds=self.cache_ttl)
+        if self.persistent_cache is not None:
+            self.persistent_cache.put(key, result)
+
+    def _similarity_scope(self, prompt: str, question: Optional[str]) -> Optional[str]:
+        if self.similarity is None or not question:
+            return None
+        clean = sanitize_prompt(question)
+        if not clean or clean not in prompt:
+            return None
+        return canonicalize(prompt.replace(clean, "", 1))
+
+    async def _lookup(
+        self, key: str, scope: Optional[str], question: Optional[str]
+    ) -> Optional[str]:
+        cached = await self._cached(key)
+        if cached or scope is None:
+            return cached
+        similar = self.similarity.find(scope, question)
+        if similar is None or similar == key:
+            return None
+        cached = await self._cached(similar)
+        if cached:
+            metrics.incr("llm.cache.similar_hits")
+        return cached
+
+    def _remember(self, key: str, scope: Optional[str], question: Optional[str]) -> None:
+        if scope is not None:
+            self.similarity.add(scope, question, key)
+
+    async def aclose(self) -> None:
+        if self.persistent_cache is not None:
+            await self.persistent_cache.aclose()
+        if self.state_backend is not None:
+            self.state_backend.close()
+
+    async def generate(
+        self,
+        prompt: str,
+        user_key: str,
+        question: Optional[str] = None,
+        priority: Priority = Priority.NORMAL,
+        scopes: Optional[Dict[str, str]] = None,
+        schema: Optional[Dict[str, Any]] = None,
+        use_cache: bool = True,
+    ) -> str:
+        """Gera a resposta; com ``schema`` os providers devolvem JSON nesse formato.
+
+        ``use_cache=False`` sempre chama o modelo: não lê nem grava o cache e
+        não se junta a uma geração igual em andamento (útil quando cada
+        chamada deve trazer conteúdo novo, como o estoque do quiz).
+        """
+        self.rate_limiter.check(user_key, **(scopes or {}))
+        key = cache_key(prompt)
+        if schema is not None:
+            key = f"{key}\x00{json.dumps(schema, sort_keys=True)}"
+        if not use_cache:
+            if not self.providers:
+                raise ExternalServiceError("Nenhum provider LLM configurado.")
+            metrics.incr("llm.cache.bypassed")
+            job = _Job(priority, user_key, schema, use_cache=False)
+            return await self._generate_uncached(key, prompt, job)
+        scope = self._similarity_scope(prompt, question)
+        cached = await self._lookup(key, scope, question)
         if cached:
             return cached
 
         if not self.providers:
             raise ExternalServiceError("Nenhum provider LLM configurado.")
 
+        inflight = self._inflight.get(key)
+        if inflight is not None:
+            metrics.incr("llm.coalesced")
+            return await self._join(inflight)
+
+        task = asyncio.ensure_future(
+            self._generate_uncached(key, prompt, _Job(priority, user_key, schema))
+        )
+        self._waiters[task] = 0
+        self._track_inflight(key, task)
+        result = await self._join(task)
+        self._remember(key, scope, question)
+        return result
+
+    async def _join(self, future: asyncio.Future) -> str:
+        """Espera uma geração compartilhada; a última desistência a cancela."""
+        if future not in self._waiters:
+            return await asyncio.shield(future)
+        self._waiters[future] += 1
+        try:
+            return await asyncio.shield(future)
+        finally:
+            if not future.done():
+                self._waiters[future] -= 1
+                if not self._waiters[future]:
+                    metrics.incr("llm.abandoned")
+                    future.cancel()
+
+    def _available_providers(self) -> List[BaseLLM]:
+        available = self.router.order(self.providers)
+        if not available:
+            raise ExternalServiceError("Nenhum provider disponível: circuitos abertos.")
+        return available
+
+    async def _call(
+        self,
+        provider: BaseLLM,
+        func: Callable[[], Awaitable[T]],
+        job: _Job,
+        started: Optional[asyncio.Event] = None,
+    ) -> T:
+        """Executa ``func`` na fila e alimenta o circuit breaker do provider.
+
+        ``started`` é sinalizado quando o job sai da fila, o mesmo instante
+        em que começa a latência registrada no router.
+        """
+
+        async def timed() -> T:
+            if started is not None:
+                started.set()
+            begin = time.monotonic()
+            result = await func()
+            self.router.record_success(provider.name, time.monotonic() - begin)
+            return result
+
+        try:
+            return await self.queue.submit(
+                timed, priority=job.priority, key=job.user_key, on_queued=job.on_queued
+            )
+        except (asyncio.CancelledError, OverloadedError):
+            self.router.release(provider.name)
+            raise
+        except Exception:
+            self.router.record_failure(provider.name)
+            raise
+
+    def _next_allowed(self, candidates: Iterator[BaseLLM]) -> Optional[BaseLLM]:
+        for provider in candidates:
+            if self.router.allow(provider.name):
+                return provider
+        return None
+
+    def _start(self, provider: BaseLLM, func: Callable[[], Awaitable[str]], job: _Job) -> _Attempt:
+        started = asyncio.Event()
+        task = asyncio.ensure_future(self._call(provider, func, job, started))
+        return _Attempt(provider, task, started)
+
+    def _hedging(self, job: _Job) -> bool:
+        # Trabalho de fundo não tem usuário esperando: não vale gastar o orçamento.
+        return self.hedge_budget is not None and job.priority is not Priority.BACKGROUND
+
+    async def _hedge_due(self, attempt: _Attempt, watched: asyncio.Future) -> bool:
+        """True se ``watched`` não terminou até o quantil de latência do provider.
+
+        O prazo conta a partir da saída da fila, como as amostras do quantil;
+        o tempo esperando na fila não dispara hedge.
+        """
+        delay = self.router.latency_quantile(attempt.provider.name, self.hedge_quantile)
+        if delay is None:
+            return False
+        started = asyncio.ensure_future(attempt.started.wait())
+        try:
+            await asyncio.wait({watched, started}, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            started.cancel()
+        if watched.done():
+            return False
+        done, _ = await asyncio.wait({watched}, timeout=delay)
+        return not done
+
+    def _hedge_provider(self, candidates: Iterator[BaseLLM]) -> Optional[BaseLLM]:
+        assert self.hedge_budget is not None
+        if not self.hedge_budget.try_acquire():
+            metrics.incr("llm.hedge.budget_exhausted")
+            return None
+        backup = self._next_allowed(candidates)
+        if backup is not None:
+            metrics.incr("llm.hedge.started")
+        return backup
+
+    async def _generate_uncached(self, key: str, prompt: str, job: _Job) -> str:
+        metrics.incr("llm.generations")
+        candidates = iter(self._available_providers())
+        running: Dict[asyncio.Future, _Attempt] = {}
+        hedge_pending = self._hedging(job)
         last_error: Exception | None = None
-        for provider in self.providers:
-            try:
-                result = await self.queue.submit(lambda: provider.generate(prompt))
-                self.cache.set(prompt, result, ttl_seconds=self.cache_ttl)
-                return result
-            except Exception as exc:
-                logger.warning("Provider %s falhou: %s", provider.name, exc)
-                last_error = exc
+        try:
+            while True:
+                if not running:
+                    provider = self._next_allowed(candidates)
+                    if provider is None:
+                        break
+                    attempt = self._start(
+                        provider, partial(_generate, provider, prompt, job.schema), job
+                    )
+                    running[attempt.task] = attempt
+                if hedge_pending and len(running) == 1:
+                    primary = next(iter(running.values()))
+                    if await self._hedge_due(primary, primary.task):
+                        hedge_pending = False
+                        backup = self._hedge_provider(candidates)
+                        if backup is not None:
+                            attempt = self._start(
+                                backup, partial(_generate, backup, prompt, job.schema), job
+                            )
+                            running[attempt.task] = attempt
+                        continue
+                done, _ = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    provider = running.pop(task).provider
+                    try:
+                        result = task.result()
+                    except OverloadedError:
+                        if running:
+                            continue
+                        raise
+                    except Exception as exc:
+                        logger.warning("Provider %s falhou: %s", provider.name, exc)
+                        last_error = exc
+                        continue
+                    if running:
+                        metrics.incr(f"llm.hedge.won.{provider.name}")
+                    if job.use_cache:
+                        self._store(key, result)
+                    return result
+        finally:
+            for task in running:
+                task.cancel()
 
         raise ExternalServiceError("Todos os providers falharam.") from last_error
 
-    async def health(self) -> dict[str, bool]:
-        results: dict[str, bool] = {}
-        for provider in self.providers:
+    def _track_inflight(self, key: str, future: asyncio.Future) -> None:
+        self._inflight[key] = future
+
+        def _release(done: asyncio.Future) -> None:
+            if self._inflight.get(key) is done:
+                del self._inflight[key]
+            self._waiters.pop(done, None)
+            if not done.cancelled():
+                done.exception()
+
+        future.add_done_callback(_release)
+
+    async def stream(
+        self,
+        prompt: str,
+        user_key: str,
+        question: Optional[str] = None,
+        priority: Priority = Priority.NORMAL,
+        scopes: Optional[Dict[str, str]] = None,
+        on_queued: Optional[Callable[[QueueEstimate], None]] = None,
+    ) -> AsyncIterator[str]:
+        """Gera em partes; ``on_queued`` é chamado quando a geração entra na fila.
+
+        Respostas do cache ou de uma geração igual em andamento não passam
+        pela fila e não chamam ``on_queued``.
+        """
+        self.rate_limiter.check(user_key, **(scopes or {}))
+        key = cache_key(prompt)
+        scope = self._similarity_scope(prompt, question)
+        cached = await self._lookup(key, scope, question)
+        if cached:
+            yield cached
+            return
+
+        if not self.providers:
+            raise ExternalServiceError("Nenhum provider LLM configurado.")
+
+        inflight = self._inflight.get(key)
+        if inflight is not None:
+            metrics.incr("llm.coalesced")
+            yield await asyncio.shield(inflight)
+            return
+
+        leader: asyncio.Future = asyncio.get_running_loop().create_future()
+        self._track_inflight(key, leader)
+        metrics.incr("llm.generations")
+        try:
+            pieces = self._stream_providers(
+                key, prompt, leader, _Job(priority, user_key, on_queued=on_queued)
+            )
+            async with aclosing(pieces):
+                async for piece in pieces:
+                    yield piece
+            self._remember(key, scope, question)
+        finally:
+            if not leader.done():
+                leader.set_exception(ExternalServiceError("Streaming cancelado."))
+
+    def _start_stream(self, provider: BaseLLM, prompt: str, job: _Job) -> _StreamAttempt:
+        sink: asyncio.Queue = asyncio.Queue()
+        call = self._start(provider, partial(_pump, provider, prompt, sink), job)
+        call.task.add_done_callback(lambda _task: sink.put_nowait(_STREAM_END))
+        return _StreamAttempt(call, sink, asyncio.ensure_future(sink.get()))
+
+    async def _stream_providers(
+        self, key: str, prompt: str, leader: asyncio.Future, job: _Job
+    ) -> AsyncIterator[str]:
+        """Transmite do primeiro provider que responder.
+
+        Com hedge, se o principal não mandar nenhum pedaço até o quantil de
+        latência, o próximo provider começa em paralelo; quem mandar o
+        primeiro pedaço segue sozinho e o outro é cancelado.
+        """
+        candidates = iter(self._available_providers())
+        racing: List[_StreamAttempt] = []
+        hedge_pending = self._hedging(job)
+        last_error: Exception | None = None
+        winner: Optional[_StreamAttempt] = None
+        try:
+            while winner is None:
+                if not racing:
+                    provider = self._next_allowed(candidates)
+                    if provider is None:
+                        break
+                    racing.append(self._start_stream(provider, prompt, job))
+                if hedge_pending and len(racing) == 1:
+                    primary = racing[0]
+                    if await self._hedge_due(primary.call, primary.first):
+                        hedge_pending = False
+                        backup = self._hedge_provider(candidates)
+                        if backup is not None:
+                            racing.append(self._start_stream(backup, prompt, job))
+                        continue
+                await asyncio.wait(
+                    [attempt.first for attempt in racing], return_when=asyncio.FIRST_COMPLETED
+                )
+                for attempt in [attempt for attempt in racing if attempt.first.done()]:
+                    exc = None
+                    if attempt.first.result() is _STREAM_END:
+                        exc = attempt.call.task.exception()
+                    if exc is None:
+                        winner = attempt
+                        break
+                    racing.remove(attempt)
+                    if isinstance(exc, OverloadedError):
+                        if racing:
+                            continue
+                        leader.set_exception(exc)
+                        raise exc
+                    logger.warning("Provider %s falhou: %s", attempt.call.provider.name, exc)
+                    last_error = exc
+            if winner is None:
+                error = ExternalServiceError("Todos os providers falharam.")
+                leader.set_exception(error)
+                raise error from last_error
+            if len(racing) > 1:
+                metrics.incr(f"llm.hedge.won.{winner.call.provider.name}")
+            for attempt in racing:
+                if attempt is not winner:
+                    attempt.first.cancel()
+                    attempt.call.task.cancel()
+            racing = [winner]
+
+            piece = winner.first.result()
             try:
-                await provider.health()
-                results[provider.name] = True
+                while piece is not _STREAM_END:
+                    yield piece
+                    piece = await winner.sink.get()
+                result = winner.call.task.result()
             except Exception as exc:
-                logger.warning("Health falhou para %s: %s", provider.name, exc)
-                results[provider.name] = False
-        return results
+                error = ExternalServiceError("Streaming interrompido pelo provider.")
+                leader.set_exception(error)
+                raise error from exc
+            self._store(key, result)
+            leader.set_result(result)
+        finally:
+            for attempt in racing:
+                attempt.first.cancel()
+                attempt.call.task.cancel()
+
+    async def health(self) -> dict[str, bool]:
+        results = await probe_all(self.providers, self.health_timeout)
+        return {name: result.ok for name, result in results.items()}
+
+
+def _generate(
+    provider: BaseLLM, prompt: str, schema: Optional[Dict[str, Any]]
+) -> Awaitable[str]:
+    if schema is None:
+        return provider.generate(prompt)
+    return provider.generate(prompt, schema=schema)
+
+
+async def _pump(provider: BaseLLM, prompt: str, sink: asyncio.Queue) -> str:
+    parts: list[str] = []
+    async for piece in provider.stream(prompt):
+        parts.append(piece)
+        sink.put_nowait(piece)
+    return "".join(parts)
 
 
 def provider_names(providers: Iterable[BaseLLM]) -> list[str]:
@@ -1,22 +1,66 @@
-from typing import Optional
+import asyncio
+import math
+import time
+from typing import List, Optional
 
 import aiohttp
 import discord
 from discord.ext import commands
 
-from bobot.ai.factory import create_llm_service
+from bobot.adapters.discord_dispatch import OutboundDispatcher
+from bobot.adapters.discord_stream import ProgressiveReply, send_long
+from bobot.ai.factory import create_health_prober, create_llm_service
+from bobot.ai.http_client import close_clients
 from bobot.ai.prompts import (
     build_ask_prompt,
     build_code_prompt,
     build_debug_prompt,
     build_docs_prompt,
 )
-from bobot.config import BOT_TOKEN, ID_CANAL
-from bobot.domain.exceptions import ExternalServiceError, RateLimitError
-from bobot.urls import C, CSHARP, URL_CSS, URL_HTML, URL_JAVASCRIPT, URL_MONGO, URL_PYTHON
+from bobot.config import (
+    ALLOWED_CHANNELS,
+    ALLOWED_GUILDS,
+    BOT_TOKEN,
+    COMMAND_GROUPS,
+    COMMAND_REJECT_LOG_EVERY,
+    DOCS_DIRECT_MARGIN,
+    DOCS_DIRECT_SCORE,
+    DOCS_INDEX_PATH,
+    DOCS_MIN_SCORE,
+    DOCS_TOP_K,
+    DISCORD_CHANNEL_MAX_MESSAGES,
+    DISCORD_CHANNEL_WINDOW,
+    ID_CANAL,
+    LLM_ATTACHMENT_THRESHOLD,
+    LLM_STREAM_EDIT_INTERVAL,
+    QUIZ_DB_PATH,
+    QUIZ_POOL_BATCH,
+    QUIZ_POOL_HIGH,
+    QUIZ_POOL_LOW,
+    QUIZ_POOL_PATH,
+    QUIZ_TIMEZONE,
+)
+from bobot.domain.exceptions import ExternalServiceError, OverloadedError, RateLimitError
+from bobot.urls import (
+    C,
+    CSHARP,
+    DOCS_URLS,
+    URL_CSS,
+    URL_HTML,
+    URL_JAVASCRIPT,
+    URL_MONGO,
+    URL_PYTHON,
+)
 from bobot.utils.logging import configure_logging, get_logger
-from bobot.utils.text import chunk_text
-from bobot.services.quiz import QuizService, QuizQuestion
+from bobot.services.docs_index import Hit, Retrieval, open_retriever, split_tech
+from bobot.services.metrics import metrics
+from bobot.services.permissions import Allowlist, CommandAccess
+from bobot.services.queue import Priority, QueueEstimate
+from bobot.services.rate_limit import RateLimit, RateLimiter
+from bobot.services.quiz import QuizQuestion, QuizService, resolve_timezone
+from bobot.services.quiz_pool import QuizPool
+from bobot.storage.in_memory import InMemoryQuizStore
+from bobot.storage.sqlite import SQLiteQuizStore
 
 # Configuração das intenções do bot
 intents = discord.Intents.default()
@@ -28,14 +72,100 @@ intents.message_content = True
 configure_logging()
 logger = get_logger(__name__)
 
-bot = commands.Bot(command_prefix="!", intents=intents)
+
+class BobotContext(commands.Context):
+    """Contexto que manda as mensagens pela fila de saída do canal."""
+
+    async def send(self, content=None, *, merge: bool = False, **kwargs):
+        return await dispatcher.send(
+            str(self.channel.id), super().send, content, merge=merge, **kwargs
+        )
+
+
+class CommandNotAllowedHere(commands.CheckFailure):
+    """Comando usado fora dos canais/servidores liberados para o seu grupo."""
+
+
+class Bobot(commands.Bot):
+    async def setup_hook(self) -> None:
+        # Roda uma vez, antes de conectar; on_ready volta a disparar a cada
+        # reconexão e trocaria o placar vivo pelo que ainda está no disco.
+        users = await quiz_service.restore()
+        logger.info("Quiz restaurado: %s participantes.", users)
+
+    async def get_context(self, origin, /, *, cls=BobotContext):
+        return await super().get_context(origin, cls=cls)
+
+    async def on_command_error(self, context, exception) -> None:
+        # Recusas de canal já foram contadas em CommandAccess; não vão para o log.
+        if isinstance(exception, CommandNotAllowedHere):
+            return
+        await super().on_command_error(context, exception)
+
+    async def close(self) -> None:
+        await quiz_pool.stop()
+        await quiz_service.store.aclose()
+        await health_prober.stop()
+        await llm_service.aclose()
+        await close_clients()
+        if docs_retriever is not None:
+            docs_retriever.close()
+        await dispatcher.drain()
+        await super().close()
+
+
+bot = Bobot(command_prefix="!", intents=intents)
+dispatcher = OutboundDispatcher(
+    RateLimiter(
+        RateLimit(DISCORD_CHANNEL_MAX_MESSAGES, DISCORD_CHANNEL_WINDOW),
+        RateLimit(50, 1, scope="global"),
+    )
+)
 llm_service = create_llm_service()
-quiz_service = QuizService(llm_service=llm_service)
+health_prober = create_health_prober(llm_service)
+quiz_service = QuizService(
+    llm_service=llm_service,
+    tz=resolve_timezone(QUIZ_TIMEZONE),
+    store=SQLiteQuizStore(QUIZ_DB_PATH) if QUIZ_DB_PATH else InMemoryQuizStore(),
+)
+quiz_pool = QuizPool(
+    lambda: quiz_service.fetch_quizzes(QUIZ_POOL_BATCH, user_key="quiz-pool"),
+    low_water=QUIZ_POOL_LOW,
+    high_water=QUIZ_POOL_HIGH,
+    path=QUIZ_POOL_PATH,
+    idle=lambda: llm_service.queue.idle,
+)
+quiz_service.pool = quiz_pool
+docs_retriever = open_retriever(
+    DOCS_INDEX_PATH,
+    k=DOCS_TOP_K,
+    min_score=DOCS_MIN_SCORE,
+    direct_score=DOCS_DIRECT_SCORE,
+    direct_margin=DOCS_DIRECT_MARGIN,
+)
+command_access = CommandAccess(
+    {
+        group: Allowlist(ALLOWED_CHANNELS[group], ALLOWED_GUILDS[group])
+        for group in COMMAND_GROUPS
+    },
+    log_every=COMMAND_REJECT_LOG_EVERY,
+)
+
+
+@bot.check
+def command_allowed_here(ctx) -> bool:
+    group = ctx.command.extras.get("group") if ctx.command is not None else None
+    guild = getattr(ctx, "guild", None)
+    if command_access.allows(group, ctx.channel.id, guild.id if guild is not None else None):
+        return True
+    raise CommandNotAllowedHere()
 
 
 @bot.event
 async def on_ready():
     logger.info("We have logged in as %s", bot.user)
+    health_prober.start()
+    quiz_pool.start()
 
 
 @bot.command(name="comandos")
@@ -101,16 +231,21 @@ async def help_commands(ctx):
         value=(
             "`!quiz` — desafio diário de programação gerado pela IA\n"
             "`!responder <opção>` — responde o quiz\n"
-            "`!ranking` — ranking dos melhores participantes"
+            "`!ranking [dia|semana|geral]` — ranking dos melhores participantes"
         ),
         inline=False,
     )
     await ctx.send(embed=embed)
 
-@bot.command(name="quiz")
+def _guild_key(ctx) -> str:
+    guild = getattr(ctx, "guild", None)
+    return str(guild.id) if guild is not None else ""
+
+
+@bot.command(name="quiz", extras={"group": "quiz"})
 async def quiz_command(ctx):
     user_id = str(ctx.author.id)
-    quiz = await quiz_service.get_daily_quiz(user_id)
+    quiz = await quiz_service.get_daily_quiz(user_id, _guild_key(ctx))
     if not quiz:
         await ctx.send("Você já respondeu o quiz de hoje! Volte amanhã.")
         return
@@ -122,47 +257,60 @@ async def quiz_command(ctx):
     for idx, opcao in enumerate(quiz.opcoes):
         embed.add_field(name=f"Opção {idx+1}", value=opcao, inline=False)
     await ctx.send(embed=embed)
-    ctx.bot.quiz_question = quiz  # Armazena temporariamente
 
-@bot.command(name="responder")
+@bot.command(name="responder", extras={"group": "quiz"})
 async def responder_command(ctx, opcao: int):
     user_id = str(ctx.author.id)
-    quiz = getattr(ctx.bot, "quiz_question", None)
-    if not quiz:
+    guild_id = _guild_key(ctx)
+    session = quiz_service.session(guild_id)
+    if session is None:
         await ctx.send("Nenhum quiz ativo. Use !quiz para receber o desafio.")
         return
-    correto = quiz_service.submit_answer(user_id, quiz, opcao-1)
+    if quiz_service.has_answered(user_id, guild_id):
+        await ctx.send("Você já respondeu o quiz de hoje! Volte amanhã.")
+        return
+    quiz = session.question
+    correto = quiz_service.submit_answer(user_id, quiz, opcao-1, guild_id)
     if correto:
         await ctx.send("✅ Resposta correta! Parabéns!")
     else:
         await ctx.send(f"❌ Resposta incorreta. A opção correta era {quiz.opcoes[quiz.resposta_correta]}.")
-    del ctx.bot.quiz_question
 
-@bot.command(name="ranking")
-async def ranking_command(ctx):
-    ranking = quiz_service.get_ranking()
+_RANKING_PERIODS = {
+    "geral": ("all", "🏆 Ranking Quiz Diário"),
+    "semana": ("weekly", "🏆 Ranking Quiz da Semana"),
+    "dia": ("daily", "🏆 Ranking Quiz de Hoje"),
+}
+
+
+@bot.command(name="ranking", extras={"group": "quiz"})
+async def ranking_command(ctx, periodo: str = "geral"):
+    if periodo not in _RANKING_PERIODS:
+        await ctx.send("Período inválido. Use: dia, semana ou geral.")
+        return
+    period, title = _RANKING_PERIODS[periodo]
+    ranking = quiz_service.get_ranking(period, limit=10)
     if not ranking:
         await ctx.send("Nenhum participante ainda.")
         return
     embed = discord.Embed(
-        title="🏆 Ranking Quiz Diário",
+        title=title,
         color=0x00BFFF,
     )
-    for idx, (user, score) in enumerate(ranking[:10]):
+    for idx, (user, score) in enumerate(ranking):
         embed.add_field(name=f"#{idx+1}", value=f"User: {user} | Pontos: {score}", inline=False)
+    user_id = str(ctx.author.id)
+    position = quiz_service.get_rank(user_id, period)
+    if position is not None:
+        embed.set_footer(
+            text=f"Sua posição: #{position} ({quiz_service.get_score(user_id, period)} pontos)"
+        )
     await ctx.send(embed=embed)
 
 
-@bot.command(name="versão")
+@bot.command(name="versão", extras={"group": "tools"})
 async def version(ctx):
-    if ctx.channel.id == int(ID_CANAL):
-        await ctx.send("Versão: 1.0.5")
-    else:
-        logger.info(
-            "Comando \"versão\" não no canal especificado. Esperado: %s, Obtido: %s",
-            int(ID_CANAL),
-            ctx.channel.id,
-        )
+    await ctx.send("Versão: 1.0.5")
 
 
 @bot.command(name="ola")
@@ -174,118 +322,61 @@ async def ola(ctx):
     )
 
 
-@bot.command(name="python")
+@bot.command(name="python", extras={"group": "docs"})
 async def python_docs(ctx):
-    if ctx.channel.id == int(ID_CANAL):
-        await ctx.send(f"Python: {URL_PYTHON}")
-    else:
-        logger.info(
-            "Command \"python\" not in the specified channel. Expected: %s, Got: %s",
-            int(ID_CANAL),
-            ctx.channel.id,
-        )
+    await ctx.send(f"Python: {URL_PYTHON}")
 
 
-@bot.command(name="javascript", aliases=["js"])
+@bot.command(name="javascript", aliases=["js"], extras={"group": "docs"})
 async def javascript_docs(ctx):
-    if ctx.channel.id == int(ID_CANAL):
-        await ctx.send(f"JavaScript: {URL_JAVASCRIPT}")
-    else:
-        logger.info(
-            "Command \"javascript\" not in the specified channel. Expected: %s, Got: %s",
-            int(ID_CANAL),
-            ctx.channel.id,
-        )
+    await ctx.send(f"JavaScript: {URL_JAVASCRIPT}")
 
 
-@bot.command(name="html")
+@bot.command(name="html", extras={"group": "docs"})
 async def html_docs(ctx):
-    if ctx.channel.id == int(ID_CANAL):
-        await ctx.send(f"HTML: {URL_HTML}")
-    else:
-        logger.info(
-            "Command \"html\" not in the specified channel. Expected: %s, Got: %s",
-            int(ID_CANAL),
-            ctx.channel.id,
-        )
+    await ctx.send(f"HTML: {URL_HTML}")
 
 
-@bot.command(name="css")
+@bot.command(name="css", extras={"group": "docs"})
 async def css_docs(ctx):
-    if ctx.channel.id == int(ID_CANAL):
-        await ctx.send(f"CSS: {URL_CSS}")
-    else:
-        logger.info(
-            "Command \"css\" not in the specified channel. Expected: %s, Got: %s",
-            int(ID_CANAL),
-            ctx.channel.id,
-        )
+    await ctx.send(f"CSS: {URL_CSS}")
 
 
-@bot.command(name="mongodb", aliases=["mongo"])
+@bot.command(name="mongodb", aliases=["mongo"], extras={"group": "docs"})
 async def mongodb_docs(ctx):
-    if ctx.channel.id == int(ID_CANAL):
-        await ctx.send(f"MongoDB: {URL_MONGO}")
-    else:
-        logger.info(
-            "Command \"mongodb\" not in the specified channel. Expected: %s, Got: %s",
-            int(ID_CANAL),
-            ctx.channel.id,
-        )
+    await ctx.send(f"MongoDB: {URL_MONGO}")
 
 
-@bot.command(name="c#", aliases=["csharp"])
+@bot.command(name="c#", aliases=["csharp"], extras={"group": "docs"})
 async def csharp(ctx):
-    if ctx.channel.id == int(ID_CANAL):
-        await ctx.send(f"Documentação de C#: {CSHARP}")
-    else:
-        logger.info(
-            "Comando \"c#\" não no canal especificado. Esperado: %s, Obtido: %s",
-            int(ID_CANAL),
-            ctx.channel.id,
-        )
+    await ctx.send(f"Documentação de C#: {CSHARP}")
 
 
-@bot.command(name="c")
+@bot.command(name="c", extras={"group": "docs"})
 async def c_docs(ctx):
-    if ctx.channel.id == int(ID_CANAL):
-        await ctx.send(f"C: {C}")
-    else:
-        logger.info(
-            "Command \"c\" not in the specified channel. Expected: %s, Got: %s",
-            int(ID_CANAL),
-            ctx.channel.id,
-        )
+    await ctx.send(f"C: {C}")
 
 
-@bot.command(name="snippet")
+@bot.command(name="snippet", extras={"group": "docs"})
 async def snippet(ctx, op: str, query: Optional[str] = None):
-    if ctx.channel.id == int(ID_CANAL):
-        op = op.lower()
-        query = query.lower() if query else ""
-        if query:
-            query = "/" + query
-        if op == "python":
-            op = "python"
-        elif op in ["js", "javascript"]:
-            op = "js"
-        elif op == "react":
-            op = "react"
-        elif op == "css":
-            op = "css"
-        elif op in ["node", "nodejs"]:
-            op = "js/node/p/1/"
-        else:
-            await ctx.send("Linguagem ou framework não suportado.")
-            return
-        await ctx.send(f"Snippet: https://www.30secondsofcode.org/{op}{query}/p/1/")
+    op = op.lower()
+    query = query.lower() if query else ""
+    if query:
+        query = "/" + query
+    if op == "python":
+        op = "python"
+    elif op in ["js", "javascript"]:
+        op = "js"
+    elif op == "react":
+        op = "react"
+    elif op == "css":
+        op = "css"
+    elif op in ["node", "nodejs"]:
+        op = "js/node/p/1/"
     else:
-        await ctx.send("Este comando só pode ser usado no canal específico.")
-        logger.info(
-            "Command \"snippet\" not in the specified channel. Expected: %s, Got: %s",
-            int(ID_CANAL),
-            ctx.channel.id,
-        )
+        await ctx.send("Linguagem ou framework não suportado.")
+        return
+    await ctx.send(f"Snippet: https://www.30secondsofcode.org/{op}{query}/p/1/")
 
 
 @bot.command(name="pesquisa", aliases=["search"])
@@ -300,32 +391,25 @@ async def youtube(ctx, *, query: str):
     await ctx.send(f"Pesquisas: {search_url}")
 
 
-@bot.command(name="calc")
+@bot.command(name="calc", extras={"group": "tools"})
 async def calc(ctx, op: str, a: int, b: int):
-    if ctx.channel.id == int(ID_CANAL):
-        if op == "soma":
-            result = a + b
-            await ctx.send(f"{a} + {b} = {result}")
-        elif op == "sub":
-            result = a - b
-            await ctx.send(f"{a} - {b} = {result}")
-        elif op == "mult":
-            result = a * b
-            await ctx.send(f"{a} * {b} = {result}")
-        elif op == "div":
-            if b != 0:
-                result = a / b
-                await ctx.send(f"{a} / {b} = {result}")
-            else:
-                await ctx.send("Divisão por zero não é permitida.")
+    if op == "soma":
+        result = a + b
+        await ctx.send(f"{a} + {b} = {result}")
+    elif op == "sub":
+        result = a - b
+        await ctx.send(f"{a} - {b} = {result}")
+    elif op == "mult":
+        result = a * b
+        await ctx.send(f"{a} * {b} = {result}")
+    elif op == "div":
+        if b != 0:
+            result = a / b
+            await ctx.send(f"{a} / {b} = {result}")
         else:
-            await ctx.send("Operação inválida. Use \"soma\", \"sub\", \"mult\" ou \"div\".")
+            await ctx.send("Divisão por zero não é permitida.")
     else:
-        logger.info(
-            "Command \"calc\" not in the specified channel. Expected: %s, Got: %s",
-            int(ID_CANAL),
-            ctx.channel.id,
-        )
+        await ctx.send("Operação inválida. Use \"soma\", \"sub\", \"mult\" ou \"div\".")
 
 
 @bot.command(name="run")
@@ -395,57 +479,150 @@ def main():
 
 
 async def _send_paginated_ctx(ctx, content: str) -> None:
-    chunks = chunk_text(content, max_size=1900)
-    if not chunks:
-        chunks = [""]
-    for chunk in chunks:
-        await ctx.send(chunk)
-
+    # Avisos curtos podem sair junto com outros na mesma mensagem; respostas
+    # em streaming não, porque a mensagem delas ainda vai ser editada.
+    options = {"merge": True} if isinstance(ctx, BobotContext) else {}
+    await send_long(ctx, content, attach_after=LLM_ATTACHMENT_THRESHOLD, **options)
+
+
+def _rate_scopes(ctx) -> dict[str, str]:
+    scopes = {"channel": str(ctx.channel.id)}
+    guild = getattr(ctx, "guild", None)
+    if guild is not None:
+        scopes["guild"] = str(guild.id)
+    return scopes
+
+
+def _rate_limited_message(exc: RateLimitError) -> str:
+    message = f"Limite excedido: {exc}"
+    if exc.retry_after is not None:
+        message += f" Tente novamente em {math.ceil(exc.retry_after)}s."
+    return message
+
+
+def _overloaded_message(exc: OverloadedError) -> str:
+    detail = str(exc)
+    if exc.position is not None and exc.estimated_wait is not None:
+        detail += f" Posição {exc.position}, ~{exc.estimated_wait:.0f}s de espera."
+    return f"⏳ Bot sobrecarregado agora. {detail} Tente novamente em instantes."
+
+
+async def _handle_llm(
+    ctx,
+    prompt: str,
+    title: str,
+    question: Optional[str] = None,
+    priority: Priority = Priority.NORMAL,
+) -> None:
+    reply = ProgressiveReply(
+        ctx,
+        header=f"**{title}**\n\n",
+        edit_interval=LLM_STREAM_EDIT_INTERVAL,
+        attach_after=LLM_ATTACHMENT_THRESHOLD,
+    )
+    notices: List[asyncio.Task] = []
+
+    def on_queued(estimate: QueueEstimate) -> None:
+        # Só avisa quando o job entrou de fato na fila (cache, rate limit e
+        # recusa por sobrecarga não chegam aqui), e uma vez só.
+        if estimate.wait >= 1 and not notices:
+            notices.append(
+                asyncio.ensure_future(
+                    ctx.send(f"⏳ Na fila: posição {estimate.position}, ~{estimate.wait:.0f}s.")
+                )
+            )
 
-async def _handle_llm(ctx, prompt: str, title: str) -> None:
     try:
         async with ctx.typing():
-            result = await llm_service.generate(prompt, user_key=str(ctx.author.id))
-            content = f"**{title}**\n\n{result}"
-            await _send_paginated_ctx(ctx, content)
+            async for piece in llm_service.stream(
+                prompt,
+                user_key=str(ctx.author.id),
+                question=question,
+                priority=priority,
+                scopes=_rate_scopes(ctx),
+                on_queued=on_queued,
+            ):
+                await reply.feed(piece)
+            await reply.finish()
     except RateLimitError as exc:
-        await _send_paginated_ctx(ctx, f"Limite excedido: {exc}")
+        await _send_paginated_ctx(ctx, _rate_limited_message(exc))
+    except OverloadedError as exc:
+        await _send_paginated_ctx(ctx, _overloaded_message(exc))
     except ExternalServiceError as exc:
         await _send_paginated_ctx(ctx, f"Falha ao consultar LLM: {exc}")
     except Exception as exc:
         await _send_paginated_ctx(ctx, f"Erro inesperado: {exc}")
+    finally:
+        await asyncio.gather(*notices, return_exceptions=True)
+
+
+async def _retrieve(query: str, tech: Optional[str] = None) -> Retrieval:
+    if docs_retriever is None or not query:
+        return Retrieval()
+    return await docs_retriever.lookup(query, tech)
 
 
-@bot.command(name="pergunta")
+def _direct_docs_answer(hit: Hit) -> str:
+    footer = f"📄 Fonte: `{hit.source}`"
+    url = DOCS_URLS.get(hit.tech)
+    if url:
+        footer += f" | Documentação oficial: {url}"
+    return f"**Docs**\n\n{hit.text}\n\n{footer}"
+
+
+@bot.command(name="pergunta", extras={"group": "llm"})
 async def ask_command(ctx, *, pergunta: str) -> None:
-    prompt = build_ask_prompt(pergunta)
-    await _handle_llm(ctx, prompt, "Pergunta")
+    prompt = build_ask_prompt(pergunta, (await _retrieve(pergunta)).context())
+    await _handle_llm(ctx, prompt, "Pergunta", question=pergunta, priority=Priority.INTERACTIVE)
 
 
-@bot.command(name="codigo")
+@bot.command(name="codigo", extras={"group": "llm"})
 async def code_command(ctx, linguagem: str, *, tema: str) -> None:
     prompt = build_code_prompt(linguagem, tema)
-    await _handle_llm(ctx, prompt, "Código")
+    await _handle_llm(ctx, prompt, "Código", question=tema)
 
 
-@bot.command(name="debug")
+@bot.command(name="debug", extras={"group": "llm"})
 async def debug_command(ctx, *, erro: str) -> None:
     prompt = build_debug_prompt(erro)
-    await _handle_llm(ctx, prompt, "Debug")
+    await _handle_llm(ctx, prompt, "Debug", question=erro)
 
 
-@bot.command(name="docs")
+@bot.command(name="docs", extras={"group": "llm"})
 async def docs_command(ctx, *, tecnologia: str) -> None:
-    prompt = build_docs_prompt(tecnologia)
-    await _handle_llm(ctx, prompt, "Docs")
+    tech, query = split_tech(tecnologia)
+    retrieval = await _retrieve(query, tech)
+    if retrieval.confident:
+        # Resposta direto do índice: sem fila nem tokens do modelo.
+        metrics.incr("docs.direct_answers")
+        await _send_paginated_ctx(ctx, _direct_docs_answer(retrieval.hits[0]))
+        return
+    prompt = build_docs_prompt(tecnologia, retrieval.context())
+    await _handle_llm(ctx, prompt, "Docs", question=tecnologia, priority=Priority.INTERACTIVE)
 
 
-@bot.command(name="status")
+@bot.command(name="status", extras={"group": "llm"})
 async def status_command(ctx) -> None:
-    results = await llm_service.health()
-    if not results:
+    if not llm_service.providers:
         await _send_paginated_ctx(ctx, "Nenhum provider LLM configurado.")
         return
 
-    lines = [f"- {name}: {'OK' if ok else 'OFF'}" for name, ok in results.items()]
+    results = health_prober.snapshot() or await health_prober.refresh()
+    breakers = llm_service.router.snapshot()
+    now = time.time()
+    lines = []
+    for name, probe in results.items():
+        line = f"- {name}: {'OK' if probe.ok else 'OFF'}"
+        if probe.latency is not None:
+            line += f" ({probe.latency * 1000:.0f} ms)"
+        line += f" | checado há {now - probe.checked_at:.0f}s"
+        stats = breakers.get(name)
+        if stats is not None:
+            latency = f"{stats.latency_ewma:.1f}s" if stats.latency_ewma is not None else "-"
+            line += (
+                f" | circuito: {stats.state.value}"
+                f" | latência: {latency}"
+                f" | erros: {stats.error_rate:.0%}"
+            )
+        lines.append(line)
     await _send_paginated_ctx(ctx, "**Status LLM**\n\n" + "\n".join(lines))
@@ -44,3 +44,71 @@ LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "2"))
 LLM_CACHE_TTL = int(os.getenv("LLM_CACHE_TTL", "300"))
 LLM_RATE_LIMIT_MAX = int(os.getenv("LLM_RATE_LIMIT_MAX", "5"))
 LLM_RATE_LIMIT_WINDOW = int(os.getenv("LLM_RATE_LIMIT_WINDOW", "60"))
+
+LLM_HTTP_MAX_CONNECTIONS = int(os.getenv("LLM_HTTP_MAX_CONNECTIONS", "10"))
+LLM_HTTP_MAX_KEEPALIVE = int(os.getenv("LLM_HTTP_MAX_KEEPALIVE", "5"))
+LLM_HTTP_KEEPALIVE_EXPIRY = float(os.getenv("LLM_HTTP_KEEPALIVE_EXPIRY", "30"))
+LLM_STREAM_EDIT_INTERVAL = float(os.getenv("LLM_STREAM_EDIT_INTERVAL", "1.0"))
+LLM_CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "1024"))
+LLM_CACHE_MAX_BYTES = int(os.getenv("LLM_CACHE_MAX_BYTES", str(8 * 1024 * 1024)))
+LLM_DISK_CACHE_PATH = os.getenv("LLM_DISK_CACHE_PATH", "")
+LLM_DISK_CACHE_TTL = int(os.getenv("LLM_DISK_CACHE_TTL", "86400"))
+LLM_SIMILARITY_THRESHOLD = float(os.getenv("LLM_SIMILARITY_THRESHOLD", "0.85"))
+LLM_SIMILARITY_MAX_ENTRIES = int(os.getenv("LLM_SIMILARITY_MAX_ENTRIES", "100000"))
+LLM_BREAKER_FAILURES = int(os.getenv("LLM_BREAKER_FAILURES", "3"))
+LLM_BREAKER_COOLDOWN = float(os.getenv("LLM_BREAKER_COOLDOWN", "30"))
+LLM_HEDGING = os.getenv("LLM_HEDGING", "0") == "1"
+LLM_HEDGE_QUANTILE = float(os.getenv("LLM_HEDGE_QUANTILE", "0.95"))
+LLM_HEDGE_BUDGET_PER_MINUTE = int(os.getenv("LLM_HEDGE_BUDGET_PER_MINUTE", "10"))
+LLM_HEALTH_TIMEOUT = float(os.getenv("LLM_HEALTH_TIMEOUT", "3"))
+LLM_HEALTH_INTERVAL = float(os.getenv("LLM_HEALTH_INTERVAL", "30"))
+LLM_RETRY_BASE_DELAY = float(os.getenv("LLM_RETRY_BASE_DELAY", "0.2"))
+LLM_RETRY_MAX_DELAY = float(os.getenv("LLM_RETRY_MAX_DELAY", "5"))
+LLM_RETRY_BUDGET = float(os.getenv("LLM_RETRY_BUDGET", "10"))
+LLM_RETRY_BUDGET_REFILL = float(os.getenv("LLM_RETRY_BUDGET_REFILL", "0.5"))
+LLM_QUEUE_MAX_DEPTH = int(os.getenv("LLM_QUEUE_MAX_DEPTH", "50"))
+LLM_QUEUE_MAX_WAIT = float(os.getenv("LLM_QUEUE_MAX_WAIT", "120"))
+LLM_JOB_TIMEOUT = float(os.getenv("LLM_JOB_TIMEOUT", "180"))
+LLM_ADAPTIVE_CONCURRENCY = os.getenv("LLM_ADAPTIVE_CONCURRENCY", "0") == "1"
+LLM_CONCURRENCY_MIN = int(os.getenv("LLM_CONCURRENCY_MIN", "1"))
+LLM_CONCURRENCY_MAX = int(os.getenv("LLM_CONCURRENCY_MAX", "8"))
+LLM_RATE_LIMIT_CHANNEL_MAX = int(os.getenv("LLM_RATE_LIMIT_CHANNEL_MAX", "0"))
+LLM_RATE_LIMIT_GUILD_MAX = int(os.getenv("LLM_RATE_LIMIT_GUILD_MAX", "0"))
+LLM_RATE_LIMIT_GLOBAL_MAX = int(os.getenv("LLM_RATE_LIMIT_GLOBAL_MAX", "0"))
+BOT_STATE_BACKEND = os.getenv("BOT_STATE_BACKEND", "memory")
+BOT_STATE_PATH = os.getenv("BOT_STATE_PATH", "bobot_state.db")
+QUIZ_POOL_LOW = int(os.getenv("QUIZ_POOL_LOW", "5"))
+QUIZ_POOL_HIGH = int(os.getenv("QUIZ_POOL_HIGH", "20"))
+QUIZ_POOL_PATH = os.getenv("QUIZ_POOL_PATH", "quiz_pool.json")
+QUIZ_POOL_BATCH = int(os.getenv("QUIZ_POOL_BATCH", "5"))
+QUIZ_TIMEZONE = os.getenv("QUIZ_TIMEZONE", "America/Sao_Paulo")
+QUIZ_DB_PATH = os.getenv("QUIZ_DB_PATH", "bobot_quiz.db")
+LLM_ATTACHMENT_THRESHOLD = int(os.getenv("LLM_ATTACHMENT_THRESHOLD", "8000"))
+DISCORD_CHANNEL_MAX_MESSAGES = int(os.getenv("DISCORD_CHANNEL_MAX_MESSAGES", "5"))
+DISCORD_CHANNEL_WINDOW = int(os.getenv("DISCORD_CHANNEL_WINDOW", "5"))
+
+
+def _id_set(value: str) -> frozenset:
+    return frozenset(int(item) for item in value.split(",") if item.strip())
+
+
+# Grupos de comandos com lista própria de canais e servidores liberados
+# (ALLOWED_CHANNELS_<GRUPO>, ALLOWED_GUILDS_<GRUPO>, ids separados por vírgula).
+# Documentação e ferramentas continuam presas ao ID_CANAL por padrão.
+COMMAND_GROUPS = ("docs", "tools", "llm", "quiz")
+_DEFAULT_CHANNELS = {"docs": ID_CANAL, "tools": ID_CANAL}
+ALLOWED_CHANNELS = {
+    group: _id_set(
+        os.getenv(f"ALLOWED_CHANNELS_{group.upper()}") or _DEFAULT_CHANNELS.get(group, "")
+    )
+    for group in COMMAND_GROUPS
+}
+ALLOWED_GUILDS = {
+    group: _id_set(os.getenv(f"ALLOWED_GUILDS_{group.upper()}", "")) for group in COMMAND_GROUPS
+}
+COMMAND_REJECT_LOG_EVERY = int(os.getenv("COMMAND_REJECT_LOG_EVERY", "100"))
+DOCS_INDEX_PATH = os.getenv("DOCS_INDEX_PATH", "docs_index.bin")
+DOCS_TOP_K = int(os.getenv("DOCS_TOP_K", "3"))
+DOCS_MIN_SCORE = float(os.getenv("DOCS_MIN_SCORE", "2.0"))
+DOCS_DIRECT_SCORE = float(os.getenv("DOCS_DIRECT_SCORE", "12.0"))
+DOCS_DIRECT_MARGIN = float(os.getenv("DOCS_DIRECT_MARGIN", "1.5"))
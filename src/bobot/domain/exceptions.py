@@ -1,3 +1,6 @@
+from typing import Optional
+
+
 class BotError(Exception):
     """Base exception for bot domain errors."""
 
@@ -13,6 +16,27 @@ class PermissionError(BotError):
 class RateLimitError(BotError):
     """Raised when a user or channel exceeds rate limits."""
 
+    def __init__(
+        self, message: str, retry_after: Optional[float] = None, scope: str = ""
+    ) -> None:
+        super().__init__(message)
+        self.retry_after = retry_after
+        self.scope = scope
+
 
 class ExternalServiceError(BotError):
     """Raised when an external service fails."""
+
+
+class OverloadedError(BotError):
+    """Raised when the work queue is full or a job would wait too long."""
+
+    def __init__(
+        self,
+        message: str,
+        position: Optional[int] = None,
+        estimated_wait: Optional[float] = None,
+    ) -> None:
+        super().__init__(message)
+        self.position = position
+        self.estimated_wait = estimated_wait
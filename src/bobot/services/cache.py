@@ -1,28 +1,113 @@
+import time
+from collections import OrderedDict
 from dataclasses import dataclass
-from datetime import datetime, timedelta
-from typing import Dict, Optional
+from typing import Callable, Optional
+
+from bobot.services.state import StateBackend
 
 
 @dataclass
 class CacheEntry:
     value: str
-    expires_at: datetime
+    expires_at: float
+    size: int = 0
+
+
+@dataclass
+class CacheStats:
+    hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+    expirations: int = 0
+
+    @property
+    def hit_ratio(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
 
 
 class InMemoryCache:
-    def __init__(self) -> None:
-        self._data: Dict[str, CacheEntry] = {}
+    """Cache LRU limitado por número de entradas e por bytes, com TTL monotônico."""
+
+    def __init__(
+        self,
+        max_entries: int = 1024,
+        max_bytes: int = 8 * 1024 * 1024,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self._data: "OrderedDict[str, CacheEntry]" = OrderedDict()
+        self._max_entries = max(1, max_entries)
+        self._max_bytes = max(1, max_bytes)
+        self._clock = clock
+        self._bytes = 0
+        self.stats = CacheStats()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    @property
+    def size_bytes(self) -> int:
+        return self._bytes
 
     def get(self, key: str) -> Optional[str]:
         entry = self._data.get(key)
-        if not entry:
+        if entry is None:
+            self.stats.misses += 1
             return None
-        if entry.expires_at < datetime.utcnow():
-            self._data.pop(key, None)
+        if entry.expires_at <= self._clock():
+            self._remove(key)
+            self.stats.expirations += 1
+            self.stats.misses += 1
             return None
+        self._data.move_to_end(key)
+        self.stats.hits += 1
         return entry.value
 
     def set(self, key: str, value: str, ttl_seconds: int = 300) -> None:
+        size = len(key.encode()) + len(value.encode())
+        if key in self._data:
+            self._remove(key)
+        if size > self._max_bytes:
+            return
         self._data[key] = CacheEntry(
-            value=value, expires_at=datetime.utcnow() + timedelta(seconds=ttl_seconds)
+            value=value, expires_at=self._clock() + ttl_seconds, size=size
         )
+        self._bytes += size
+        while len(self._data) > self._max_entries or self._bytes > self._max_bytes:
+            _, evicted = self._data.popitem(last=False)
+            self._bytes -= evicted.size
+            self.stats.evictions += 1
+
+    def _remove(self, key: str) -> None:
+        entry = self._data.pop(key)
+        self._bytes -= entry.size
+
+
+class SharedCache:
+    """Cache com TTL guardado num ``StateBackend`` compartilhado entre processos.
+
+    Mesma interface de ``InMemoryCache``; o tamanho fica por conta do TTL e da
+    limpeza periódica do backend, não de LRU.
+    """
+
+    def __init__(
+        self,
+        backend: StateBackend,
+        namespace: str = "",
+        clock: Callable[[], float] = time.time,
+    ) -> None:
+        self._backend = backend
+        self._prefix = f"{namespace}|" if namespace else ""
+        self._clock = clock
+        self.stats = CacheStats()
+
+    def get(self, key: str) -> Optional[str]:
+        value = self._backend.cache_get(self._prefix + key, self._clock())
+        if value is None:
+            self.stats.misses += 1
+        else:
+            self.stats.hits += 1
+        return value
+
+    def set(self, key: str, value: str, ttl_seconds: int = 300) -> None:
+        self._backend.cache_set(self._prefix + key, value, self._clock() + ttl_seconds)
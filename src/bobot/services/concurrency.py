@@ -0,0 +1,67 @@
+from __future__ import annotations
+
+from typing import Optional
+
+from bobot.services.metrics import metrics
+
+
+class AdaptiveLimit:
+    """Limite de concorrência AIMD, no estilo do concurrency-limits da Netflix.
+
+    Cada resposta sem erro, com a fila usando pelo menos metade do limite,
+    soma ``1/limit`` (cerca de +1 por "rodada"). Erros ou lentidão multiplicam
+    o limite por ``backoff``.
+
+    Lentidão é comparada em gradiente, como no Gradient2: uma média móvel
+    curta (``short_window`` amostras) contra uma longa (``window`` amostras),
+    e não cada amostra contra a mínima. A latência de uma geração depende do
+    tamanho da resposta, então uma resposta longa isolada quase não mexe na
+    média curta; só uma piora sustentada a leva acima de ``tolerance`` vezes
+    a longa.
+    """
+
+    def __init__(
+        self,
+        initial: int = 2,
+        min_limit: int = 1,
+        max_limit: int = 8,
+        backoff: float = 0.9,
+        tolerance: float = 2.0,
+        window: int = 100,
+        short_window: int = 10,
+    ) -> None:
+        self.min_limit = max(1, min_limit)
+        self.max_limit = max(self.min_limit, max_limit)
+        self._limit = float(min(self.max_limit, max(self.min_limit, initial)))
+        self._backoff = backoff
+        self._tolerance = tolerance
+        self._long_alpha = 2 / (max(1, window) + 1)
+        self._short_alpha = 2 / (max(1, short_window) + 1)
+        self._baseline: Optional[float] = None
+        self._recent: Optional[float] = None
+        metrics.set_gauge("queue.concurrency_limit", self.limit)
+
+    @property
+    def limit(self) -> int:
+        return int(self._limit)
+
+    def _track_latency(self, latency: float) -> None:
+        if self._baseline is None or self._recent is None:
+            self._baseline = self._recent = latency
+            return
+        self._recent += self._short_alpha * (latency - self._recent)
+        self._baseline += self._long_alpha * (latency - self._baseline)
+
+    def on_sample(self, latency: float, ok: bool, inflight: int) -> None:
+        if ok:
+            self._track_latency(latency)
+        slow = (
+            self._baseline is not None
+            and self._recent is not None
+            and self._recent > self._tolerance * self._baseline
+        )
+        if not ok or slow:
+            self._limit = max(float(self.min_limit), self._limit * self._backoff)
+        elif inflight * 2 >= self._limit:
+            self._limit = min(float(self.max_limit), self._limit + 1 / self._limit)
+        metrics.set_gauge("queue.concurrency_limit", self.limit)
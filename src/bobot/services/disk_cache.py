@@ -0,0 +1,164 @@
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import sqlite3
+import threading
+import time
+from typing import Callable, Dict, Optional, Tuple
+
+from bobot.utils.logging import get_logger
+
+logger = get_logger(__name__)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS llm_cache (
+    namespace TEXT NOT NULL,
+    key TEXT NOT NULL,
+    value TEXT NOT NULL,
+    expires_at REAL NOT NULL,
+    PRIMARY KEY (namespace, key)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS llm_cache_expires ON llm_cache (expires_at);
+"""
+
+
+class PersistentCache:
+    """Segundo nível de cache em SQLite (WAL) que sobrevive a reinícios.
+
+    As chaves são separadas por ``namespace`` (provider, modelo e versão dos
+    prompts). Escritas ficam num buffer e são gravadas em lote por uma task
+    em segundo plano, fora do event loop.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        namespace: str,
+        ttl_seconds: int = 86400,
+        flush_interval: float = 1.0,
+        batch_size: int = 64,
+        compact_interval: float = 3600.0,
+        clock: Callable[[], float] = time.time,
+    ) -> None:
+        self.namespace = namespace
+        self._ttl = ttl_seconds
+        self._flush_interval = flush_interval
+        self._batch_size = max(1, batch_size)
+        self._compact_interval = compact_interval
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA)
+        self._pending: Dict[str, Tuple[str, float]] = {}
+        self._writing: Dict[str, Tuple[str, float]] = {}
+        self._wake: Optional[asyncio.Event] = None
+        self._flusher: Optional[asyncio.Task] = None
+        self._last_compact = clock()
+        self._closing = False
+
+    @staticmethod
+    def _hash(key: str) -> str:
+        return hashlib.sha256(key.encode()).hexdigest()
+
+    async def get(self, key: str) -> Optional[str]:
+        digest = self._hash(key)
+        pending = self._pending.get(digest) or self._writing.get(digest)
+        if pending is not None:
+            return pending[0]
+        return await asyncio.to_thread(self._read, digest)
+
+    def _read(self, digest: str) -> Optional[str]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value FROM llm_cache WHERE namespace = ? AND key = ? AND expires_at > ?",
+                (self.namespace, digest, self._clock()),
+            ).fetchone()
+        return row[0] if row else None
+
+    def put(self, key: str, value: str, ttl_seconds: Optional[int] = None) -> None:
+        ttl = self._ttl if ttl_seconds is None else ttl_seconds
+        self._pending[self._hash(key)] = (value, self._clock() + ttl)
+        self._ensure_flusher()
+        if len(self._pending) >= self._batch_size and self._wake is not None:
+            self._wake.set()
+
+    def _ensure_flusher(self) -> None:
+        if self._closing or (self._flusher is not None and not self._flusher.done()):
+            return
+        self._wake = asyncio.Event()
+        self._flusher = asyncio.create_task(self._run_flusher())
+
+    async def _run_flusher(self) -> None:
+        assert self._wake is not None
+        while not self._closing:
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=self._flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            try:
+                await self.flush()
+                if self._clock() - self._last_compact >= self._compact_interval:
+                    await asyncio.to_thread(self.compact)
+            except Exception as exc:
+                logger.warning("Falha ao gravar cache persistente: %s", exc)
+
+    async def flush(self) -> None:
+        if not self._pending:
+            return
+        batch, self._pending = self._pending, {}
+        self._writing = batch
+        try:
+            await asyncio.to_thread(self._write, batch)
+        except Exception:
+            # Devolve o lote ao buffer; o que foi gravado depois vale mais.
+            batch.update(self._pending)
+            self._pending = batch
+            raise
+        finally:
+            self._writing = {}
+
+    def _write(self, batch: Dict[str, Tuple[str, float]]) -> None:
+        rows = [(self.namespace, key, value, expires) for key, (value, expires) in batch.items()]
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO llm_cache (namespace, key, value, expires_at) "
+                    "VALUES (?, ?, ?, ?)",
+                    rows,
+                )
+                self._conn.execute("COMMIT")
+            except BaseException:
+                # Um COMMIT que falha deixa a transação aberta e todo BEGIN
+                # seguinte falharia; se o SQLite já desfez tudo, não há o que fazer.
+                if self._conn.in_transaction:
+                    self._conn.execute("ROLLBACK")
+                raise
+
+    def compact(self) -> int:
+        """Remove entradas expiradas e devolve o espaço do WAL ao disco."""
+        with self._lock:
+            removed = self._conn.execute(
+                "DELETE FROM llm_cache WHERE expires_at <= ?", (self._clock(),)
+            ).rowcount
+            self._conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+            if removed:
+                self._conn.execute("VACUUM")
+        self._last_compact = self._clock()
+        return removed
+
+    async def aclose(self) -> None:
+        # Sem cancelar: um lote já entregue à thread ficaria pela metade.
+        self._closing = True
+        if self._flusher is not None:
+            assert self._wake is not None
+            self._wake.set()
+            await self._flusher
+            self._flusher = None
+        await self.flush()
+        with self._lock:
+            self._conn.close()
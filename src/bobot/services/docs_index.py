@@ -0,0 +1,426 @@
+from __future__ import annotations
+
+import asyncio
+import heapq
+import html
+import math
+import mmap
+import os
+import re
+import struct
+import time
+from array import array
+from collections import Counter, defaultdict
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from bobot.services.metrics import metrics
+from bobot.services.similarity import canonicalize
+from bobot.utils.logging import get_logger
+
+logger = get_logger(__name__)
+
+# Arquivo: cabeçalho, tabela de termos ordenada (busca binária direto no
+# mmap), postings (documento, frequência), tabela de passagens, tamanhos das
+# passagens (uint32), tecnologia de cada passagem (1 byte) e um blob com
+# todos os textos em UTF-8. Ao abrir só os tamanhos e as tecnologias vão
+# para a memória, em arrays compactos usados em toda busca.
+_MAGIC = b"BOBDOCS2"
+# magic, passagens, termos, tamanho médio, offsets (termos, postings,
+# passagens, tamanhos, tecnologias, blob), nomes das tecnologias no blob
+_HEADER = struct.Struct("<8sIIdQQQQQQQI")
+_TERM = struct.Struct("<QIQI")  # termo (offset, tamanho), postings (offset, df)
+_POSTING = struct.Struct("<II")  # passagem, frequência do termo
+_DOC = struct.Struct("<QIQI")  # texto (offset, tamanho), meta (offset, tamanho)
+_LENGTH = struct.Struct("<I")
+
+_K1 = 1.2
+_B = 0.75
+
+TECH_ALIASES = {
+    "python": "python",
+    "py": "python",
+    "javascript": "javascript",
+    "js": "javascript",
+    "html": "html",
+    "css": "css",
+    "mongodb": "mongodb",
+    "mongo": "mongodb",
+    "csharp": "csharp",
+    "c#": "csharp",
+    "c": "c",
+}
+
+_DUMP_SUFFIXES = (".md", ".txt", ".rst", ".html", ".htm")
+_HTML_SKIP = re.compile(r"<(script|style)\b.*?</\1>", re.DOTALL | re.IGNORECASE)
+_HTML_TAG = re.compile(r"<[^>]+>")
+_SUBWORD = re.compile(r"[^\w#+]+")
+
+
+def tokenize(text: str) -> List[str]:
+    """Termos para o BM25: a forma canônica e, em ``a.b``/``a_b()``, também as partes."""
+    terms: List[str] = []
+    for token in canonicalize(text).split():
+        terms.append(token)
+        parts = [part for part in _SUBWORD.split(token) if part]
+        if len(parts) > 1:
+            terms.extend(part for part in parts if len(part) > 1)
+    return terms
+
+
+def split_tech(query: str) -> Tuple[Optional[str], str]:
+    """Separa a tecnologia do começo da consulta (``"js map"`` → ``("javascript", "map")``)."""
+    head, _, rest = query.strip().partition(" ")
+    tech = TECH_ALIASES.get(head.lower())
+    if tech is None:
+        return None, query.strip()
+    return tech, rest.strip()
+
+
+@dataclass
+class Passage:
+    tech: str
+    source: str
+    text: str
+
+
+@dataclass
+class Hit:
+    tech: str
+    source: str
+    text: str
+    score: float
+    coverage: float
+
+
+def split_passages(text: str, max_words: int = 120) -> List[str]:
+    """Junta parágrafos em passagens de até ``max_words`` palavras."""
+    passages: List[str] = []
+    current: List[str] = []
+    size = 0
+    for paragraph in re.split(r"\n\s*\n", text):
+        words = paragraph.split()
+        if not words:
+            continue
+        if current and size + len(words) > max_words:
+            passages.append("\n\n".join(current))
+            current, size = [], 0
+        while len(words) > max_words:
+            passages.append(" ".join(words[:max_words]))
+            words = words[max_words:]
+        current.append(" ".join(words))
+        size += len(words)
+    if current:
+        passages.append("\n\n".join(current))
+    return passages
+
+
+def _plain_text(raw: str, suffix: str) -> str:
+    if suffix not in (".html", ".htm"):
+        return raw
+    text = _HTML_TAG.sub(" ", _HTML_SKIP.sub(" ", raw))
+    text = re.sub(r"[ \t]+", " ", html.unescape(text))
+    return re.sub(r"\n\s*\n\s*", "\n\n", text)
+
+
+def iter_dump(root: str, max_words: int = 120) -> Iterator[Passage]:
+    """Passagens de um dump local: ``<root>/<tecnologia>/**/*.{md,txt,rst,html}``."""
+    for entry in sorted(os.listdir(root)):
+        base = os.path.join(root, entry)
+        tech = TECH_ALIASES.get(entry.lower())
+        if tech is None or not os.path.isdir(base):
+            continue
+        for folder, dirs, files in os.walk(base):
+            dirs.sort()
+            for name in sorted(files):
+                suffix = os.path.splitext(name)[1].lower()
+                if suffix not in _DUMP_SUFFIXES:
+                    continue
+                path = os.path.join(folder, name)
+                with open(path, encoding="utf-8", errors="replace") as handle:
+                    text = _plain_text(handle.read(), suffix)
+                source = os.path.relpath(path, root).replace(os.sep, "/")
+                for chunk in split_passages(text, max_words):
+                    yield Passage(tech, source, chunk)
+
+
+def build_index(passages: Iterable[Passage]) -> bytes:
+    """Monta o índice BM25 no formato lido por :class:`DocsIndex`."""
+    blob = bytearray()
+
+    def put(text: str) -> Tuple[int, int]:
+        data = text.encode("utf-8")
+        offset = len(blob)
+        blob.extend(data)
+        return offset, len(data)
+
+    docs: List[bytes] = []
+    lengths = bytearray()
+    tech_ids = bytearray()
+    techs: Dict[str, int] = {}
+    postings: Dict[str, List[Tuple[int, int]]] = defaultdict(list)
+    total_terms = 0
+    for doc_id, passage in enumerate(passages):
+        counts = Counter(tokenize(passage.text))
+        length = sum(counts.values())
+        total_terms += length
+        for term, count in counts.items():
+            postings[term].append((doc_id, count))
+        text_off, text_len = put(passage.text)
+        meta_off, meta_len = put(f"{passage.tech}\t{passage.source}")
+        docs.append(_DOC.pack(text_off, text_len, meta_off, meta_len))
+        lengths += _LENGTH.pack(length)
+        tech_ids.append(techs.setdefault(passage.tech, len(techs)))
+
+    terms = sorted(postings, key=lambda term: term.encode("utf-8"))
+    postings_data = bytearray()
+    term_table = bytearray()
+    for term in terms:
+        term_off, term_len = put(term)
+        entries = postings[term]
+        term_table += _TERM.pack(term_off, term_len, len(postings_data), len(entries))
+        for doc_id, count in entries:
+            postings_data += _POSTING.pack(doc_id, count)
+    # Por último no blob: o fim dos nomes marca o fim do arquivo.
+    names_off, names_len = put("\t".join(techs))
+
+    terms_off = _HEADER.size
+    postings_off = terms_off + len(term_table)
+    docs_off = postings_off + len(postings_data)
+    lengths_off = docs_off + _DOC.size * len(docs)
+    techs_off = lengths_off + len(lengths)
+    blob_off = techs_off + len(tech_ids)
+    header = _HEADER.pack(
+        _MAGIC,
+        len(docs),
+        len(terms),
+        total_terms / len(docs) if docs else 0.0,
+        terms_off,
+        postings_off,
+        docs_off,
+        lengths_off,
+        techs_off,
+        blob_off,
+        names_off,
+        names_len,
+    )
+    return b"".join([header, term_table, postings_data, *docs, lengths, tech_ids, blob])
+
+
+def write_index(path: str, passages: Iterable[Passage]) -> int:
+    """Grava o índice de forma atômica e devolve o tamanho em bytes."""
+    data = build_index(passages)
+    tmp = f"{path}.tmp"
+    with open(tmp, "wb") as handle:
+        handle.write(data)
+    os.replace(tmp, path)
+    return len(data)
+
+
+class DocsIndex:
+    """Índice BM25 de documentação aberto via ``mmap`` (somente leitura).
+
+    Abrir lê o cabeçalho e copia os tamanhos e as tecnologias das passagens
+    (5 bytes por passagem); termos são achados por busca binária na tabela
+    ordenada e só as postings dos termos da consulta e os textos das
+    melhores passagens são tocados. ``search`` é síncrono e custa dezenas de
+    milissegundos num índice grande: rode fora do event loop.
+    """
+
+    def __init__(self, buffer: mmap.mmap, handle=None) -> None:
+        self._buffer = buffer
+        self._handle = handle
+        try:
+            (
+                magic,
+                self._docs,
+                self._terms,
+                self._avgdl,
+                self._terms_off,
+                self._postings_off,
+                self._docs_off,
+                lengths_off,
+                techs_off,
+                self._blob_off,
+                names_off,
+                names_len,
+            ) = _HEADER.unpack_from(buffer, 0)
+        except struct.error:
+            magic = b""
+        if magic != _MAGIC:
+            self.close()
+            raise ValueError("Arquivo não é um índice de documentação do bot.")
+        # Seções fora de ordem ou além do fim do arquivo: índice truncado ou
+        # corrompido. Melhor recusar agora do que falhar no meio de um comando.
+        bounds = [
+            _HEADER.size,
+            self._terms_off,
+            self._terms_off + self._terms * _TERM.size,
+            self._postings_off,
+            self._docs_off,
+            self._docs_off + self._docs * _DOC.size,
+            lengths_off,
+            lengths_off + self._docs * _LENGTH.size,
+            techs_off,
+            techs_off + self._docs,
+            self._blob_off,
+            self._blob_off + names_off + names_len,
+            len(buffer),
+        ]
+        if any(low > high for low, high in zip(bounds, bounds[1:])):
+            self.close()
+            raise ValueError("Índice de documentação truncado ou corrompido.")
+        self._lengths = array("I", struct.unpack_from(f"<{self._docs}I", buffer, lengths_off))
+        self._tech_ids = buffer[techs_off : techs_off + self._docs]
+        names = self._string(names_off, names_len)
+        self._techs = {name: code for code, name in enumerate(names.split("\t"))} if names else {}
+
+    @classmethod
+    def open(cls, path: str) -> "DocsIndex":
+        handle = open(path, "rb")
+        try:
+            buffer = mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError):
+            handle.close()
+            raise
+        return cls(buffer, handle)
+
+    def __len__(self) -> int:
+        return self._docs
+
+    def close(self) -> None:
+        self._buffer.close()
+        if self._handle is not None:
+            self._handle.close()
+
+    def _string(self, offset: int, length: int) -> str:
+        start = self._blob_off + offset
+        return self._buffer[start : start + length].decode("utf-8")
+
+    def _find(self, term: str) -> Optional[Tuple[int, int]]:
+        key = term.encode("utf-8")
+        low, high = 0, self._terms
+        while low < high:
+            middle = (low + high) // 2
+            term_off, term_len, postings, df = _TERM.unpack_from(
+                self._buffer, self._terms_off + middle * _TERM.size
+            )
+            start = self._blob_off + term_off
+            current = self._buffer[start : start + term_len]
+            if current == key:
+                return postings, df
+            if current < key:
+                low = middle + 1
+            else:
+                high = middle
+        return None
+
+    def _doc(self, doc_id: int) -> Tuple[int, int, int, int]:
+        return _DOC.unpack_from(self._buffer, self._docs_off + doc_id * _DOC.size)
+
+    def search(self, query: str, k: int = 3, tech: Optional[str] = None) -> List[Hit]:
+        terms = list(dict.fromkeys(tokenize(query)))
+        if not terms or not self._docs:
+            return []
+        wanted = None if tech is None else self._techs.get(tech)
+        if tech is not None and wanted is None:
+            return []
+        lengths = self._lengths
+        scale = _B / (self._avgdl or 1.0)
+        scores: Dict[int, float] = defaultdict(float)
+        matched: Dict[int, int] = defaultdict(int)
+        for term in terms:
+            found = self._find(term)
+            if found is None:
+                continue
+            postings, df = found
+            idf = math.log(1 + (self._docs - df + 0.5) / (df + 0.5))
+            start = self._postings_off + postings
+            view = self._buffer[start : start + df * _POSTING.size]
+            for doc_id, count in _POSTING.iter_unpack(view):
+                norm = 1 - _B + scale * lengths[doc_id]
+                scores[doc_id] += idf * count * (_K1 + 1) / (count + _K1 * norm)
+                matched[doc_id] += 1
+        candidates: Iterable[int] = scores
+        if wanted is not None:
+            tech_ids = self._tech_ids
+            candidates = [doc_id for doc_id in scores if tech_ids[doc_id] == wanted]
+        hits: List[Hit] = []
+        for doc_id in heapq.nlargest(k, candidates, key=lambda doc: (scores[doc], -doc)):
+            text_off, text_len, meta_off, meta_len = self._doc(doc_id)
+            doc_tech, _, source = self._string(meta_off, meta_len).partition("\t")
+            hits.append(
+                Hit(
+                    doc_tech,
+                    source,
+                    self._string(text_off, text_len),
+                    scores[doc_id],
+                    matched[doc_id] / len(terms),
+                )
+            )
+        return hits
+
+
+@dataclass
+class Retrieval:
+    hits: List[Hit] = field(default_factory=list)
+    confident: bool = False
+
+    def context(self, max_chars: int = 800) -> List[str]:
+        """Passagens prontas para o prompt, cortadas em ``max_chars``."""
+        return [f"({hit.source}) {hit.text[:max_chars]}" for hit in self.hits]
+
+
+class DocsRetriever:
+    """Consulta o índice e decide se a melhor passagem já basta como resposta.
+
+    Passagens abaixo de ``min_score`` são descartadas. A resposta é
+    "confiante" quando a melhor passagem contém todos os termos da consulta,
+    pontua ao menos ``direct_score`` e supera a segunda por ``direct_margin``.
+    """
+
+    def __init__(
+        self,
+        index: DocsIndex,
+        k: int = 3,
+        min_score: float = 2.0,
+        direct_score: float = 12.0,
+        direct_margin: float = 1.5,
+        clock=time.perf_counter,
+    ) -> None:
+        self.index = index
+        self._k = k
+        self._min_score = min_score
+        self._direct_score = direct_score
+        self._direct_margin = direct_margin
+        self._clock = clock
+
+    async def lookup(self, query: str, tech: Optional[str] = None) -> Retrieval:
+        started = self._clock()
+        # A busca percorre postings em Python; numa thread o loop segue livre.
+        found = await asyncio.to_thread(self.index.search, query, self._k, tech)
+        hits = [hit for hit in found if hit.score >= self._min_score]
+        metrics.observe("docs.retrieval_latency", self._clock() - started)
+        metrics.incr("docs.retrieval_hits" if hits else "docs.retrieval_misses")
+        confident = bool(hits) and (
+            hits[0].coverage == 1.0
+            and hits[0].score >= self._direct_score
+            and (len(hits) == 1 or hits[0].score >= self._direct_margin * hits[1].score)
+        )
+        return Retrieval(hits, confident)
+
+    def close(self) -> None:
+        self.index.close()
+
+
+def open_retriever(path: str, **options) -> Optional[DocsRetriever]:
+    """Abre o índice em ``path``; sem arquivo (ou ilegível) o bot segue sem RAG."""
+    if not path or not os.path.exists(path):
+        return None
+    try:
+        index = DocsIndex.open(path)
+    except (OSError, ValueError) as exc:
+        logger.warning("Índice de documentação ilegível em %s: %s", path, exc)
+        return None
+    logger.info("Índice de documentação aberto: %s passagens.", len(index))
+    return DocsRetriever(index, **options)
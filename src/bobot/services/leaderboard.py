@@ -0,0 +1,168 @@
+from __future__ import annotations
+
+import random
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+# (-pontos, usuário): a ordem natural da tupla já é a ordem do ranking.
+Entry = Tuple[int, str]
+
+_MAX_LEVELS = 32
+
+
+class _Node:
+    __slots__ = ("key", "next", "width")
+
+    def __init__(self, key: Optional[Entry], levels: int) -> None:
+        self.key = key
+        self.next: List[Optional[_Node]] = [None] * levels
+        self.width: List[int] = [1] * levels
+
+
+class SkipList:
+    """Skip list indexável: inserir, remover e achar a posição em O(log n).
+
+    Cada ponteiro guarda quantos elementos "pula" (largura), o que permite
+    calcular a posição de uma chave sem percorrer a lista inteira.
+    """
+
+    def __init__(self, rng: Optional[random.Random] = None) -> None:
+        self._rng = rng or random.Random()
+        self._head = _Node(None, _MAX_LEVELS)
+        self._size = 0
+        self._height = 1
+
+    @classmethod
+    def from_sorted(
+        cls, keys: Iterable[Entry], rng: Optional[random.Random] = None
+    ) -> "SkipList":
+        """Monta a lista em O(n) a partir de chaves já ordenadas."""
+        skiplist = cls(rng)
+        last: List[_Node] = [skiplist._head] * _MAX_LEVELS
+        last_rank = [0] * _MAX_LEVELS
+        rank = 0
+        for rank, key in enumerate(keys, 1):
+            levels = skiplist._levels()
+            node = _Node(key, levels)
+            for level in range(levels):
+                last[level].next[level] = node
+                last[level].width[level] = rank - last_rank[level]
+                last[level] = node
+                last_rank[level] = rank
+        for level in range(skiplist._height):
+            last[level].width[level] = rank + 1 - last_rank[level]
+        skiplist._size = rank
+        return skiplist
+
+    def __len__(self) -> int:
+        return self._size
+
+    def __iter__(self) -> Iterator[Entry]:
+        node = self._head.next[0]
+        while node is not None:
+            yield node.key
+            node = node.next[0]
+
+    def _levels(self) -> int:
+        # Nível geométrico (p = 1/2): 1 + zeros à direita de um número aleatório.
+        bits = self._rng.getrandbits(_MAX_LEVELS - 1) | (1 << (_MAX_LEVELS - 1))
+        levels = (bits & -bits).bit_length()
+        if levels > self._height:
+            for level in range(self._height, levels):
+                # Níveis ainda sem uso apontam da cabeça direto para o fim.
+                self._head.width[level] = self._size + 1
+            self._height = levels
+        return levels
+
+    def _path(self, key: Entry) -> Tuple[List[_Node], List[int]]:
+        """Último nó menor que ``key`` em cada nível e os passos dados nele."""
+        chain: List[_Node] = [self._head] * _MAX_LEVELS
+        steps: List[int] = [0] * _MAX_LEVELS
+        node = self._head
+        for level in reversed(range(self._height)):
+            nxt = node.next[level]
+            while nxt is not None and nxt.key < key:
+                steps[level] += node.width[level]
+                node = nxt
+                nxt = node.next[level]
+            chain[level] = node
+        return chain, steps
+
+    def insert(self, key: Entry) -> None:
+        chain, steps_at_level = self._path(key)
+        levels = self._levels()
+        new = _Node(key, levels)
+        steps = 0
+        for level in range(levels):
+            prev = chain[level]
+            new.next[level] = prev.next[level]
+            prev.next[level] = new
+            new.width[level] = prev.width[level] - steps
+            prev.width[level] = steps + 1
+            steps += steps_at_level[level]
+        for level in range(levels, self._height):
+            chain[level].width[level] += 1
+        self._size += 1
+
+    def remove(self, key: Entry) -> None:
+        chain, _ = self._path(key)
+        target = chain[0].next[0]
+        if target is None or target.key != key:
+            raise KeyError(key)
+        for level in range(len(target.next)):
+            prev = chain[level]
+            prev.width[level] += target.width[level] - 1
+            prev.next[level] = target.next[level]
+        for level in range(len(target.next), self._height):
+            chain[level].width[level] -= 1
+        self._size -= 1
+
+    def rank(self, key: Entry) -> int:
+        """Quantos elementos vêm antes de ``key``."""
+        _, steps = self._path(key)
+        return sum(steps)
+
+
+class Leaderboard:
+    """Pontuação por usuário mantida em ordem a cada resposta.
+
+    ``add`` custa O(log n); ``top(k)`` custa O(k) e ``rank`` O(log n), sem
+    ordenar o placar inteiro a cada ``!ranking``. Empates saem em ordem de id.
+    """
+
+    def __init__(
+        self, rng: Optional[random.Random] = None, scores: Optional[Dict[str, int]] = None
+    ) -> None:
+        self._scores: Dict[str, int] = dict(scores or {})
+        self._order = SkipList.from_sorted(
+            sorted((-score, user_id) for user_id, score in self._scores.items()), rng
+        )
+
+    def __len__(self) -> int:
+        return len(self._scores)
+
+    def add(self, user_id: str, points: int) -> int:
+        old = self._scores.get(user_id)
+        if old is not None:
+            self._order.remove((-old, user_id))
+        score = (old or 0) + points
+        self._scores[user_id] = score
+        self._order.insert((-score, user_id))
+        return score
+
+    def score(self, user_id: str) -> int:
+        return self._scores.get(user_id, 0)
+
+    def top(self, k: Optional[int] = None) -> List[Tuple[str, int]]:
+        result: List[Tuple[str, int]] = []
+        for negative, user_id in self._order:
+            if k is not None and len(result) >= k:
+                break
+            result.append((user_id, -negative))
+        return result
+
+    def rank(self, user_id: str) -> Optional[int]:
+        """Posição (1 = primeiro) do usuário, ou ``None`` se ainda não pontuou."""
+        score = self._scores.get(user_id)
+        if score is None:
+            return None
+        return self._order.rank((-score, user_id)) + 1
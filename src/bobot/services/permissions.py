@@ -1,6 +1,11 @@
 from dataclasses import dataclass
+from typing import FrozenSet, Mapping, Optional
 
 from bobot.domain.exceptions import PermissionError
+from bobot.services.metrics import metrics
+from bobot.utils.logging import get_logger
+
+logger = get_logger(__name__)
 
 
 @dataclass
@@ -12,3 +17,52 @@ class PermissionService:
     def ensure_allowed(self, profile: PermissionProfile) -> None:
         if not profile.allow_commands:
             raise PermissionError("Você não tem permissão para este comando.")
+
+
+@dataclass(frozen=True)
+class Allowlist:
+    """Canais e servidores liberados para um grupo de comandos.
+
+    Vazia, libera tudo; senão o comando vale nos canais listados e em
+    qualquer canal dos servidores listados.
+    """
+
+    channels: FrozenSet[int] = frozenset()
+    guilds: FrozenSet[int] = frozenset()
+
+    def allows(self, channel_id: int, guild_id: Optional[int] = None) -> bool:
+        if not self.channels and not self.guilds:
+            return True
+        return channel_id in self.channels or guild_id in self.guilds
+
+
+class CommandAccess:
+    """Decide, num lugar só, onde cada grupo de comandos pode ser usado.
+
+    As listas são montadas uma vez a partir da configuração; cada checagem é
+    só uma busca em ``frozenset``. Comandos sem grupo, ou de grupo sem lista,
+    valem em qualquer canal. Recusas viram métricas (``commands.rejected`` e
+    ``commands.rejected.<grupo>``) e só uma a cada ``log_every`` vai para o log.
+    """
+
+    def __init__(self, groups: Mapping[str, Allowlist], log_every: int = 100) -> None:
+        self._groups = dict(groups)
+        self._log_every = max(1, log_every)
+        self._rejected = 0
+
+    def allows(self, group: Optional[str], channel_id: int, guild_id: Optional[int] = None) -> bool:
+        allowlist = self._groups.get(group) if group else None
+        if allowlist is None or allowlist.allows(channel_id, guild_id):
+            return True
+        metrics.incr("commands.rejected")
+        metrics.incr(f"commands.rejected.{group}")
+        self._rejected += 1
+        if self._rejected % self._log_every == 1 or self._log_every == 1:
+            logger.info(
+                "Comando do grupo %s recusado no canal %s (servidor %s); %s recusas até agora.",
+                group,
+                channel_id,
+                guild_id,
+                self._rejected,
+            )
+        return False
@@ -1,42 +1,270 @@
 from __future__ import annotations
 
 import asyncio
-from typing import Awaitable, Callable, Generic, TypeVar
+import heapq
+import itertools
+import time
+from dataclasses import dataclass, field
+from enum import IntEnum
+from typing import Awaitable, Callable, Dict, Generic, List, Optional, Tuple, TypeVar
+
+from bobot.domain.exceptions import OverloadedError
+from bobot.services.concurrency import AdaptiveLimit
+from bobot.services.metrics import metrics
 
 T = TypeVar("T")
 
 
+class Priority(IntEnum):
+    """Classes de prioridade: a menor sempre é atendida primeiro."""
+
+    INTERACTIVE = 0
+    NORMAL = 1
+    BACKGROUND = 2
+
+
+@dataclass(frozen=True)
+class QueueEstimate:
+    position: int
+    wait: float
+
+
+@dataclass(order=True)
+class _Job:
+    finish: float
+    seq: int
+    func: Callable[[], Awaitable] = field(compare=False)
+    future: asyncio.Future = field(compare=False)
+    priority: Priority = field(compare=False)
+    key: str = field(compare=False)
+    enqueued_at: float = field(compare=False)
+    timeout: Optional[float] = field(compare=False, default=None)
+
+
 class AsyncTaskQueue(Generic[T]):
-    def __init__(self, concurrency: int = 1) -> None:
-        self._queue: asyncio.Queue[tuple[Callable[[], Awaitable[T]], asyncio.Future[T]]] = (
-            asyncio.Queue()
-        )
-        self._started = False
+    """Fila com prioridade estrita entre classes e fair queuing por chave.
+
+    Dentro de cada classe, cada chave (usuário) recebe uma fatia proporcional
+    ao seu peso: a ordem segue o "tempo virtual de término" do WFQ, então quem
+    enfileira muitos jobs não passa na frente de quem acabou de chegar.
+
+    Com ``max_depth`` ou ``max_wait`` a fila recusa trabalho cedo
+    (``OverloadedError``) em vez de crescer sem limite; a espera estimada usa
+    a média móvel do tempo de serviço.
+
+    Se quem chamou ``submit`` for cancelado, o job sai da fila ou, se já estiver
+    rodando, é cancelado também. ``job_timeout`` limita a execução de cada job.
+
+    Com ``limiter`` o número de jobs simultâneos deixa de ser fixo e segue o
+    ``AdaptiveLimit`` entre os seus limites mínimo e máximo.
+    """
+
+    def __init__(
+        self,
+        concurrency: int = 1,
+        max_depth: int = 0,
+        max_wait: float = 0.0,
+        initial_service_time: float = 5.0,
+        job_timeout: float = 0.0,
+        limiter: Optional[AdaptiveLimit] = None,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
         self._concurrency = max(1, concurrency)
+        self._max_depth = max_depth
+        self._max_wait = max_wait
+        self._service_time = initial_service_time
+        self._job_timeout = job_timeout
+        self._limiter = limiter
+        self._slot_freed = asyncio.Event()
+        self._busy = 0
+        self._clock = clock
+        self._heaps: Dict[Priority, List[_Job]] = {priority: [] for priority in Priority}
+        self._virtual_time: Dict[Priority, float] = {priority: 0.0 for priority in Priority}
+        self._flows: Dict[Tuple[Priority, str], List[float]] = {}
+        self._seq = itertools.count()
+        self._ready = asyncio.Semaphore(0)
+        self._started = False
+
+    def __len__(self) -> int:
+        return sum(len(heap) for heap in self._heaps.values())
 
     def _start_workers(self) -> None:
         if self._started:
             return
         self._started = True
-        for _ in range(self._concurrency):
+        workers = self._limiter.max_limit if self._limiter else self._concurrency
+        for _ in range(workers):
             asyncio.create_task(self._worker())
 
+    @property
+    def concurrency(self) -> int:
+        return self._limiter.limit if self._limiter else self._concurrency
+
+    @property
+    def idle(self) -> bool:
+        """Nenhum job rodando nem esperando."""
+        return not self._busy and not len(self)
+
+    def _push(self, job: _Job) -> None:
+        heapq.heappush(self._heaps[job.priority], job)
+        metrics.set_gauge("queue.depth", len(self))
+        self._ready.release()
+
+    def _pop(self) -> Optional[_Job]:
+        for priority in Priority:
+            heap = self._heaps[priority]
+            if heap:
+                job = heapq.heappop(heap)
+                break
+        else:
+            # Permissão de um job cancelado que já saiu da fila.
+            return None
+        self._virtual_time[job.priority] = job.finish
+        self._release_flow(job)
+        metrics.observe(f"queue.wait.{job.priority.name.lower()}", self._clock() - job.enqueued_at)
+        return job
+
+    def _release_flow(self, job: _Job) -> None:
+        flow = self._flows[(job.priority, job.key)]
+        flow[1] -= 1
+        if not flow[1]:
+            del self._flows[(job.priority, job.key)]
+        metrics.set_gauge("queue.depth", len(self))
+
+    def _discard(self, job: _Job) -> None:
+        heap = self._heaps[job.priority]
+        if job in heap:
+            heap.remove(job)
+            heapq.heapify(heap)
+            self._release_flow(job)
+            metrics.incr("queue.cancelled")
+
+    def _finish_tag(self, priority: Priority, key: str, weight: float) -> float:
+        flow = self._flows.get((priority, key))
+        start = max(self._virtual_time[priority], flow[0] if flow else 0.0)
+        return start + 1.0 / max(weight, 1e-6)
+
+    def estimate(
+        self, priority: Priority = Priority.NORMAL, key: str = "", weight: float = 1.0
+    ) -> QueueEstimate:
+        """Posição e espera previstas para um job que fosse enfileirado agora."""
+        finish = self._finish_tag(priority, key, weight)
+        ahead = sum(len(self._heaps[higher]) for higher in Priority if higher < priority)
+        ahead += sum(1 for job in self._heaps[priority] if job.finish <= finish)
+        concurrency = self.concurrency
+        slots = max(0, ahead + self._busy + 1 - concurrency)
+        return QueueEstimate(ahead + 1, slots * self._service_time / concurrency)
+
+    def _expired(self, job: _Job) -> bool:
+        return bool(self._max_wait) and self._clock() - job.enqueued_at > self._max_wait
+
     async def _worker(self) -> None:
         while True:
-            func, fut = await self._queue.get()
-            try:
-                result = await func()
-                if not fut.cancelled():
-                    fut.set_result(result)
-            except Exception as exc:
-                if not fut.cancelled():
-                    fut.set_exception(exc)
-            finally:
-                self._queue.task_done()
-
-    async def submit(self, func: Callable[[], Awaitable[T]]) -> T:
+            await self._ready.acquire()
+            while self._busy >= self.concurrency:
+                self._slot_freed.clear()
+                await self._slot_freed.wait()
+            job = self._pop()
+            if job is None:
+                continue
+            if self._expired(job):
+                metrics.incr("queue.expired")
+                _settle(job.future, error=OverloadedError("Tempo máximo na fila excedido."))
+                continue
+            await self._run(job)
+
+    async def _run(self, job: _Job) -> None:
+        self._busy += 1
+        started = self._clock()
+        task = asyncio.ensure_future(job.func())
+        job.future.add_done_callback(lambda future: task.cancel() if future.cancelled() else None)
+        try:
+            done, _ = await asyncio.wait({task}, timeout=job.timeout)
+            if not done:
+                task.cancel()
+                await asyncio.wait({task})
+                metrics.incr("queue.timeouts")
+                self._sample(self._clock() - started, False)
+                _settle(job.future, error=asyncio.TimeoutError("Tempo limite do job excedido."))
+            elif task.cancelled():
+                metrics.incr("queue.aborted")
+            else:
+                elapsed = self._clock() - started
+                self._service_time = 0.8 * self._service_time + 0.2 * elapsed
+                metrics.observe("queue.service_time", elapsed)
+                error = task.exception()
+                self._sample(elapsed, error is None)
+                if error is None:
+                    _settle(job.future, result=task.result())
+                else:
+                    _settle(job.future, error=error)
+        finally:
+            self._busy -= 1
+            self._slot_freed.set()
+
+    def _sample(self, latency: float, ok: bool) -> None:
+        if self._limiter is not None:
+            self._limiter.on_sample(latency, ok, self._busy)
+
+    def _admit(self, priority: Priority, key: str, weight: float) -> None:
+        if self._max_depth and len(self) >= self._max_depth:
+            estimate = self.estimate(priority, key, weight)
+            metrics.incr("queue.rejected.full")
+            raise OverloadedError("Fila cheia.", estimate.position, estimate.wait)
+        if self._max_wait:
+            estimate = self.estimate(priority, key, weight)
+            if estimate.wait > self._max_wait:
+                metrics.incr("queue.rejected.wait")
+                raise OverloadedError(
+                    "Espera estimada longa demais.", estimate.position, estimate.wait
+                )
+
+    async def submit(
+        self,
+        func: Callable[[], Awaitable[T]],
+        priority: Priority = Priority.NORMAL,
+        key: str = "",
+        weight: float = 1.0,
+        timeout: Optional[float] = None,
+        on_queued: Optional[Callable[[QueueEstimate], None]] = None,
+    ) -> T:
+        """Enfileira ``func`` e espera o resultado.
+
+        ``on_queued`` recebe a posição e a espera previstas logo depois que o
+        job é aceito, antes de rodar; um job recusado não chama nada.
+        """
+        self._admit(priority, key, weight)
+        estimate = self.estimate(priority, key, weight) if on_queued is not None else None
         self._start_workers()
         loop = asyncio.get_running_loop()
         fut: asyncio.Future[T] = loop.create_future()
-        await self._queue.put((func, fut))
+        finish = self._finish_tag(priority, key, weight)
+        flow = self._flows.setdefault((priority, key), [0.0, 0])
+        flow[0] = finish
+        flow[1] += 1
+        job = _Job(
+            flow[0],
+            next(self._seq),
+            func,
+            fut,
+            priority,
+            key,
+            self._clock(),
+            timeout if timeout is not None else (self._job_timeout or None),
+        )
+        self._push(job)
+        fut.add_done_callback(lambda future: self._discard(job) if future.cancelled() else None)
+        if on_queued is not None and estimate is not None:
+            on_queued(estimate)
         return await fut
+
+
+def _settle(
+    future: asyncio.Future, result: object = None, error: Optional[BaseException] = None
+) -> None:
+    if future.done():
+        return
+    if error is not None:
+        future.set_exception(error)
+    else:
+        future.set_result(result)
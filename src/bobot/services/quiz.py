@@ -1,39 +1,232 @@
-from dataclasses import dataclass
-from typing import List, Optional
+import asyncio
 import random
+import time
+from dataclasses import asdict, dataclass, field
+from datetime import date, datetime, timedelta, timezone, tzinfo
+from typing import Callable, Dict, List, Optional, Tuple
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+from bobot.domain.exceptions import RateLimitError
+from bobot.services.leaderboard import Leaderboard
+from bobot.services.metrics import metrics
+from bobot.services.queue import Priority
+from bobot.storage.in_memory import InMemoryQuizStore, QuizAnswerRecord, QuizSessionRecord
+from bobot.utils.json_extract import extract_json
+from bobot.utils.logging import get_logger
+
+logger = get_logger(__name__)
+
 
 @dataclass
 class QuizQuestion:
     pergunta: str
     opcoes: List[str]
-    resposta_correta: int 
+    resposta_correta: int
     dificuldade: str = "normal"
 
-import asyncio
+
+@dataclass
+class QuizSession:
+    """O quiz de um servidor num dia: uma pergunta e as respostas de cada usuário."""
+
+    day: date
+    question: QuizQuestion
+    answers: Dict[str, int] = field(default_factory=dict)
+
+
+PERIODS = ("daily", "weekly", "all")
+
+# Temas sorteados no prompt para variar as perguntas (e as chaves de cache).
+_TOPICS = [
+    "Python", "JavaScript", "HTML", "CSS", "SQL", "Git", "C", "C#",
+    "estruturas de dados", "algoritmos", "orientação a objetos", "redes",
+]
+
+
+# Formato pedido ao modelo (``format`` no Ollama, ``response_format`` nos
+# servidores compatíveis com OpenAI).
+QUESTION_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "pergunta": {"type": "string"},
+        "opcoes": {"type": "array", "items": {"type": "string"}, "minItems": 4, "maxItems": 4},
+        "resposta_correta": {"type": "integer", "minimum": 0, "maximum": 3},
+    },
+    "required": ["pergunta", "opcoes", "resposta_correta"],
+    "additionalProperties": False,
+}
+BATCH_SCHEMA = {
+    "type": "object",
+    "properties": {"perguntas": {"type": "array", "items": QUESTION_SCHEMA, "minItems": 1}},
+    "required": ["perguntas"],
+    "additionalProperties": False,
+}
+
+
+def validate_quiz(data: object) -> QuizQuestion:
+    """Confere um item já decodificado; ValueError se for inválido."""
+    if not isinstance(data, dict):
+        raise ValueError("Quiz não é um objeto JSON.")
+    pergunta = data.get("pergunta")
+    opcoes = data.get("opcoes")
+    resposta = data.get("resposta_correta")
+    if not isinstance(pergunta, str) or not pergunta.strip():
+        raise ValueError("Quiz sem pergunta.")
+    if (
+        not isinstance(opcoes, list)
+        or len(opcoes) < 2
+        or not all(isinstance(opcao, str) and opcao.strip() for opcao in opcoes)
+    ):
+        raise ValueError("Quiz com opções inválidas.")
+    if isinstance(resposta, bool) or not isinstance(resposta, int) or not 0 <= resposta < len(opcoes):
+        raise ValueError("Quiz com resposta fora das opções.")
+    return QuizQuestion(pergunta=pergunta, opcoes=opcoes, resposta_correta=resposta)
+
+
+def parse_quiz(response: str) -> QuizQuestion:
+    """Converte a resposta do modelo em pergunta; ValueError se for inválida."""
+    return validate_quiz(extract_json(response))
+
+
+def parse_quizzes(response: str) -> List[QuizQuestion]:
+    """Todas as perguntas válidas da resposta (lote, lista ou objeto único).
+
+    Itens inválidos são descartados; ValueError só se nenhum servir.
+    """
+    data = extract_json(response)
+    if isinstance(data, dict) and "perguntas" in data:
+        data = data["perguntas"]
+    items = data if isinstance(data, list) else [data]
+    quizzes = []
+    for item in items:
+        try:
+            quizzes.append(validate_quiz(item))
+        except ValueError:
+            metrics.incr("quiz.invalid")
+    if not quizzes:
+        raise ValueError("Nenhuma pergunta válida na resposta.")
+    return quizzes
+
+
+def resolve_timezone(name: str) -> tzinfo:
+    """Fuso do "dia" do quiz; cai para UTC se o nome não existir no sistema."""
+    try:
+        return ZoneInfo(name)
+    except (ZoneInfoNotFoundError, ValueError):
+        logger.warning("Fuso horário %r desconhecido; usando UTC.", name)
+        return timezone.utc
+
 
 class QuizService:
-    def __init__(self, llm_service=None):
+    """Um quiz por servidor e por dia do calendário (no fuso ``tz``).
+
+    A primeira chamada do dia num servidor gera a pergunta (ou tira do
+    estoque); chamadas simultâneas esperam a mesma geração, então o custo no
+    LLM não depende do número de participantes. A sessão do dia anterior é
+    substituída na virada da meia-noite.
+
+    Sessões e respostas vão para o ``store``; ``restore`` recarrega o placar
+    e o quiz do dia depois de um reinício.
+    """
+
+    def __init__(
+        self,
+        llm_service=None,
+        pool=None,
+        tz: tzinfo = timezone.utc,
+        clock: Callable[[], float] = time.time,
+        store=None,
+    ):
         self._llm_service = llm_service
-        self._user_scores = {}
-        self._user_history = {}
-        self._user_quiz = {}
+        self.pool = pool
+        self.store = store if store is not None else InMemoryQuizStore()
+        self._tz = tz
+        self._clock = clock
+        self._boards: Dict[str, Tuple[object, Leaderboard]] = {}
+        self._sessions: Dict[str, QuizSession] = {}
+        self._pending: Dict[Tuple[str, date], asyncio.Future] = {}
 
-    async def generate_quiz(self) -> QuizQuestion:
+    def today(self) -> date:
+        return datetime.fromtimestamp(self._clock(), self._tz).date()
+
+    def _period_key(self, period: str) -> object:
+        if period == "all":
+            return None
+        if period == "daily":
+            return self.today()
+        if period == "weekly":
+            return self.today().isocalendar()[:2]
+        raise ValueError(f"Período de ranking desconhecido: {period}")
+
+    def leaderboard(self, period: str = "all") -> Leaderboard:
+        """Placar do período (``daily``, ``weekly`` ou ``all``); zera na virada."""
+        key = self._period_key(period)
+        current = self._boards.get(period)
+        if current is None or current[0] != key:
+            current = (key, Leaderboard())
+            self._boards[period] = current
+        return current[1]
+
+    async def restore(self) -> int:
+        """Recarrega placares, sessões e respostas da semana; devolve nº de usuários."""
+        today = self.today()
+        week_start = today - timedelta(days=today.weekday())
+        snapshot = await self.store.load(week_start.isoformat())
+        daily_scores: Dict[str, int] = {}
+        weekly_scores: Dict[str, int] = {}
+        for record in snapshot.answers:
+            weekly_scores[record.user_id] = weekly_scores.get(record.user_id, 0) + record.points
+            if record.day == today.isoformat():
+                daily_scores[record.user_id] = daily_scores.get(record.user_id, 0) + record.points
+        self._boards = {
+            "all": (self._period_key("all"), Leaderboard(scores=snapshot.scores)),
+            "weekly": (self._period_key("weekly"), Leaderboard(scores=weekly_scores)),
+            "daily": (self._period_key("daily"), Leaderboard(scores=daily_scores)),
+        }
+        self._sessions = {
+            record.guild_id: QuizSession(today, QuizQuestion(**record.question))
+            for record in snapshot.sessions
+            if record.day == today.isoformat()
+        }
+        for record in snapshot.answers:
+            session = self._sessions.get(record.guild_id)
+            if record.day == today.isoformat() and session is not None:
+                session.answers[record.user_id] = record.answer
+        return len(snapshot.scores)
+
+    async def fetch_quizzes(self, count: int = 1, user_key: str = "quiz") -> List[QuizQuestion]:
+        """Gera ``count`` perguntas numa única chamada ao LLM, com saída em JSON.
+
+        ``user_key`` é o balde de rate limit; o estoque usa um próprio para
+        não esgotar o da geração ao vivo. ValueError se nenhuma pergunta da
+        resposta servir.
+        """
+        count = max(1, count)
+        topics = ", ".join(random.sample(_TOPICS, min(count, len(_TOPICS))))
         prompt = (
-            "Crie uma pergunta de programação para um quiz, com 4 opções e indique qual é a correta. "
-            "Formato JSON: {\"pergunta\":..., \"opcoes\":[...], \"resposta_correta\":<índice>}. "
-            "Pergunta curta, nível fácil ou médio."
+            f"Crie {count} pergunta(s) de programação diferentes para um quiz, cada uma com 4 opções "
+            "e o índice da correta. Responda só com JSON no formato "
+            "{\"perguntas\": [{\"pergunta\":..., \"opcoes\":[...], \"resposta_correta\":<índice>}]}. "
+            f"Temas: {topics}. Perguntas curtas, nível fácil ou médio."
         )
-        response = await self._llm_service.generate(prompt, user_key="quiz")
-        import json
+        # Sem cache: o mesmo prompt (mesmos temas) tem que render perguntas novas.
+        response = await self._llm_service.generate(
+            prompt,
+            user_key=user_key,
+            priority=Priority.BACKGROUND,
+            schema=BATCH_SCHEMA,
+            use_cache=False,
+        )
+        return parse_quizzes(response)[:count]
+
+    async def fetch_quiz(self) -> QuizQuestion:
+        """Gera uma pergunta nova no LLM; ValueError se a resposta não servir."""
+        return (await self.fetch_quizzes(1))[0]
+
+    async def generate_quiz(self) -> QuizQuestion:
         try:
-            data = json.loads(response)
-            return QuizQuestion(
-                pergunta=data["pergunta"],
-                opcoes=data["opcoes"],
-                resposta_correta=data["resposta_correta"],
-            )
-        except Exception:
+            return await self.fetch_quiz()
+        except (ValueError, RateLimitError):
             # fallback simples
             return QuizQuestion(
                 pergunta="O que faz o operador '==' em Python?",
@@ -41,25 +234,70 @@ class QuizService:
                 resposta_correta=0,
             )
 
-    async def get_daily_quiz(self, user_id: str) -> Optional[QuizQuestion]:
-        if user_id in self._user_history:
+    def session(self, guild_id: str = "") -> Optional[QuizSession]:
+        """Sessão de hoje do servidor, se a pergunta já foi gerada."""
+        session = self._sessions.get(guild_id)
+        if session is None or session.day != self.today():
+            return None
+        return session
+
+    async def _open_session(self, guild_id: str) -> QuizSession:
+        session = self.session(guild_id)
+        if session is not None:
+            return session
+        key = (guild_id, self.today())
+        pending = self._pending.get(key)
+        if pending is None:
+            pending = asyncio.ensure_future(self._new_session(*key))
+            self._pending[key] = pending
+
+            def _release(done: asyncio.Future) -> None:
+                self._pending.pop(key, None)
+                if not done.cancelled():
+                    done.exception()
+
+            pending.add_done_callback(_release)
+        return await asyncio.shield(pending)
+
+    async def _new_session(self, guild_id: str, day: date) -> QuizSession:
+        quiz = self.pool.take() if self.pool is not None else None
+        if quiz is None:
+            quiz = await self.generate_quiz()
+        session = QuizSession(day, quiz)
+        self._sessions[guild_id] = session
+        self.store.save_session(QuizSessionRecord(guild_id, day.isoformat(), asdict(quiz)))
+        return session
+
+    async def get_daily_quiz(self, user_id: str, guild_id: str = "") -> Optional[QuizQuestion]:
+        session = await self._open_session(guild_id)
+        if user_id in session.answers:
             return None  # Já respondeu hoje
-        if user_id in self._user_quiz:
-            return self._user_quiz[user_id]
-        quiz = await self.generate_quiz()
-        self._user_quiz[user_id] = quiz
-        return quiz
+        return session.question
+
+    def has_answered(self, user_id: str, guild_id: str = "") -> bool:
+        session = self.session(guild_id)
+        return session is not None and user_id in session.answers
 
-    def submit_answer(self, user_id: str, question: QuizQuestion, answer_idx: int) -> bool:
+    def submit_answer(
+        self, user_id: str, question: QuizQuestion, answer_idx: int, guild_id: str = ""
+    ) -> bool:
         correct = answer_idx == question.resposta_correta
-        self._user_history[user_id] = question
-        self._user_scores[user_id] = self._user_scores.get(user_id, 0) + (1 if correct else 0)
-        if user_id in self._user_quiz:
-            del self._user_quiz[user_id]
+        points = 1 if correct else 0
+        session = self.session(guild_id)
+        if session is not None and session.question is question:
+            session.answers[user_id] = answer_idx
+        for period in PERIODS:
+            self.leaderboard(period).add(user_id, points)
+        self.store.record_answer(
+            QuizAnswerRecord(user_id, guild_id, self.today().isoformat(), answer_idx, points)
+        )
         return correct
 
-    def get_score(self, user_id: str) -> int:
-        return self._user_scores.get(user_id, 0)
+    def get_score(self, user_id: str, period: str = "all") -> int:
+        return self.leaderboard(period).score(user_id)
+
+    def get_ranking(self, period: str = "all", limit: Optional[int] = None) -> List[tuple]:
+        return self.leaderboard(period).top(limit)
 
-    def get_ranking(self) -> List[tuple]:
-        return sorted(self._user_scores.items(), key=lambda x: x[1], reverse=True)
+    def get_rank(self, user_id: str, period: str = "all") -> Optional[int]:
+        return self.leaderboard(period).rank(user_id)
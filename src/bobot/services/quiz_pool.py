@@ -0,0 +1,164 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import os
+from collections import deque
+from dataclasses import asdict
+from typing import Awaitable, Callable, Deque, List, Optional, Set
+
+from bobot.services.metrics import metrics
+from bobot.services.quiz import QuizQuestion, validate_quiz
+from bobot.utils.logging import get_logger
+
+logger = get_logger(__name__)
+
+
+class QuizPool:
+    """Estoque de perguntas prontas para o ``!quiz`` responder na hora.
+
+    ``take`` só tira uma pergunta de um deque. Quando o estoque cai abaixo de
+    ``low_water``, uma task em segundo plano gera lotes de perguntas com
+    ``produce`` até ``high_water``, mas só enquanto ``idle()`` indicar que o modelo está
+    livre. Perguntas repetidas são descartadas. Com ``path`` o estoque é
+    gravado em JSON e recarregado no ``start``, sobrevivendo a reinícios.
+    """
+
+    def __init__(
+        self,
+        produce: Callable[[], Awaitable[List[QuizQuestion]]],
+        low_water: int = 5,
+        high_water: int = 20,
+        path: str = "",
+        idle: Callable[[], bool] = lambda: True,
+        idle_poll: float = 5.0,
+        retry_delay: float = 30.0,
+    ) -> None:
+        self._produce = produce
+        self._low = max(0, low_water)
+        self._high = max(self._low + 1, high_water)
+        self._path = path
+        self._idle = idle
+        self._idle_poll = idle_poll
+        self._retry_delay = retry_delay
+        self._items: Deque[QuizQuestion] = deque()
+        self._seen: Set[str] = set()
+        self._dirty = False
+        self._wake = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def take(self) -> Optional[QuizQuestion]:
+        """Tira uma pergunta pronta, ou ``None`` se o estoque estiver vazio."""
+        if not self._items:
+            metrics.incr("quiz.pool.misses")
+            self._wake.set()
+            return None
+        quiz = self._items.popleft()
+        self._seen.discard(quiz.pergunta)
+        self._dirty = True
+        metrics.incr("quiz.pool.hits")
+        metrics.set_gauge("quiz.pool.size", len(self._items))
+        self._wake.set()
+        return quiz
+
+    def add(self, quiz: QuizQuestion) -> bool:
+        if quiz.pergunta in self._seen or len(self._items) >= self._high:
+            return False
+        self._items.append(quiz)
+        self._seen.add(quiz.pergunta)
+        self._dirty = True
+        metrics.set_gauge("quiz.pool.size", len(self._items))
+        return True
+
+    def load(self) -> int:
+        """Recarrega o estoque gravado; entradas inválidas são ignoradas."""
+        if not self._path or not os.path.exists(self._path):
+            return 0
+        try:
+            with open(self._path, encoding="utf-8") as handle:
+                entries = json.load(handle)
+        except (OSError, ValueError) as exc:
+            logger.warning("Estoque de quiz ilegível em %s: %s", self._path, exc)
+            return 0
+        loaded = 0
+        for entry in entries if isinstance(entries, list) else []:
+            try:
+                quiz = validate_quiz(entry)
+            except ValueError:
+                continue
+            loaded += self.add(quiz)
+        self._dirty = False
+        return loaded
+
+    def _write(self, entries: List[dict]) -> None:
+        tmp = f"{self._path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as handle:
+            json.dump(entries, handle, ensure_ascii=False)
+        os.replace(tmp, self._path)
+
+    async def save(self) -> None:
+        if not self._path or not self._dirty:
+            return
+        self._dirty = False
+        entries = [asdict(quiz) for quiz in self._items]
+        try:
+            await asyncio.to_thread(self._write, entries)
+        except OSError as exc:
+            self._dirty = True
+            logger.warning("Falha ao gravar o estoque de quiz: %s", exc)
+
+    async def fill(self) -> None:
+        """Gera perguntas até ``high_water``, cedendo a vez quando o modelo está ocupado."""
+        while len(self._items) < self._high:
+            if not self._idle():
+                await asyncio.sleep(self._idle_poll)
+                continue
+            try:
+                batch = await self._produce()
+            except Exception as exc:
+                metrics.incr("quiz.pool.failures")
+                logger.warning("Falha ao gerar quiz para o estoque: %s", exc)
+                await asyncio.sleep(self._retry_delay)
+                continue
+            added = duplicates = 0
+            for quiz in batch:
+                if len(self._items) >= self._high:
+                    break
+                if self.add(quiz):
+                    added += 1
+                else:
+                    duplicates += 1
+            if duplicates:
+                metrics.incr("quiz.pool.duplicates", duplicates)
+            if not added:
+                await asyncio.sleep(self._retry_delay)
+                continue
+            metrics.incr("quiz.pool.generated", added)
+            await self.save()
+
+    async def _run(self) -> None:
+        while True:
+            self._wake.clear()
+            if len(self._items) < self._low or not self._items:
+                await self.fill()
+            await self.save()
+            await self._wake.wait()
+
+    def start(self) -> None:
+        if self._task is None or self._task.done():
+            self.load()
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        await self.save()
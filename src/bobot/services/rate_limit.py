@@ -1,28 +1,85 @@
-from collections import defaultdict
+import time
 from dataclasses import dataclass
-from datetime import datetime, timedelta
-from typing import DefaultDict
+from typing import Callable, List, Optional
 
 from bobot.domain.exceptions import RateLimitError
+from bobot.services.state import Bucket, InProcessBackend, StateBackend
 
 
 @dataclass
 class RateLimit:
     max_requests: int
     window_seconds: int
+    scope: str = "user"
+
+
+@dataclass(frozen=True)
+class RateDecision:
+    allowed: bool
+    retry_after: float = 0.0
+    scope: str = ""
 
 
 class RateLimiter:
-    def __init__(self, limit: RateLimit) -> None:
-        self._limit = limit
-        self._requests: DefaultDict[str, list[datetime]] = defaultdict(list)
-
-    def check(self, key: str) -> None:
-        now = datetime.utcnow()
-        window_start = now - timedelta(seconds=self._limit.window_seconds)
-        window = [ts for ts in self._requests[key] if ts >= window_start]
-        window.append(now)
-        self._requests[key] = window
-
-        if len(window) > self._limit.max_requests:
-            raise RateLimitError("Limite de requisições excedido.")
+    """Limites empilhados (usuário, canal, servidor, global) com GCRA.
+
+    Cada chave guarda só o "tempo teórico de chegada" (TAT): verificar custa
+    O(1) e a memória é constante por chave. ``max_requests`` pedidos podem
+    chegar de uma vez; depois disso um novo é liberado a cada
+    ``window_seconds / max_requests``. Chaves ociosas (TAT no passado, balde
+    cheio) são descartadas a cada ``sweep_interval`` segundos sem mudar nada
+    no comportamento. O estado fica no ``backend`` (por padrão, no processo).
+    """
+
+    def __init__(
+        self,
+        *limits: RateLimit,
+        backend: Optional[StateBackend] = None,
+        sweep_interval: float = 60.0,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self._limits = limits
+        self._backend: StateBackend = backend if backend is not None else InProcessBackend()
+        self._clock = clock
+        self._sweep_interval = sweep_interval
+        self._next_sweep = clock() + sweep_interval
+
+    def __len__(self) -> int:
+        return len(self._backend)
+
+    def acquire(self, key: str, **scopes: Optional[str]) -> RateDecision:
+        """Consome um pedido em todos os limites, ou nenhum se algum recusar."""
+        now = self._clock()
+        self._maybe_sweep(now)
+        scopes = {"user": key, "global": "", **scopes}
+        limits: List[RateLimit] = []
+        buckets: List[Bucket] = []
+        for limit in self._limits:
+            scope_key = scopes.get(limit.scope)
+            if scope_key is None:
+                continue
+            limits.append(limit)
+            buckets.append(
+                (
+                    f"{limit.scope}:{scope_key}",
+                    limit.window_seconds / max(1, limit.max_requests),
+                    float(limit.window_seconds),
+                )
+            )
+        index, retry_after = self._backend.rate_acquire(buckets, now)
+        if index < 0:
+            return RateDecision(True)
+        return RateDecision(False, retry_after, limits[index].scope)
+
+    def check(self, key: str, **scopes: Optional[str]) -> None:
+        decision = self.acquire(key, **scopes)
+        if not decision.allowed:
+            raise RateLimitError(
+                "Limite de requisições excedido.", decision.retry_after, decision.scope
+            )
+
+    def _maybe_sweep(self, now: float) -> None:
+        if now < self._next_sweep:
+            return
+        self._next_sweep = now + self._sweep_interval
+        self._backend.sweep(now)
@@ -0,0 +1,140 @@
+from __future__ import annotations
+
+import random
+import string
+import unicodedata
+from collections import Counter, OrderedDict
+from dataclasses import dataclass
+from typing import Dict, FrozenSet, List, Optional, Set, Tuple
+
+# Negações ("não", "not", "sem") ficam de fora de propósito: mudam o sentido.
+STOP_WORDS = frozenset(
+    """
+    a o as os um uma uns umas de do da dos das em no na nos nas por pelo pela
+    para pra com e ou que se me te lhe eu tu ele ela voce voces ao aos
+    como qual quais quando onde porque seria fazer faco faz usar uso
+    the an of to in on for with and or is are be how what which do does
+    can i you it this that
+    """.split()
+)
+
+_PUNCTUATION = string.punctuation + "¿¡«»“”‘’…"
+_MASK64 = (1 << 64) - 1
+
+
+def _strip_accents(text: str) -> str:
+    decomposed = unicodedata.normalize("NFKD", text)
+    return "".join(char for char in decomposed if not unicodedata.combining(char))
+
+
+def canonicalize(text: str) -> str:
+    """Forma canônica: minúsculas, sem acentos, sem pontuação nas bordas e sem stop words.
+
+    Só a pontuação no meio de uma palavra (``a==b``, ``list.append``) é
+    mantida; tokens só de pontuação (``+``, ``==`` soltos) e o ``#`` final de
+    ``c#`` somem. Serve para achar perguntas parecidas, não como chave exata.
+    """
+    words = []
+    for token in _strip_accents(text).lower().split():
+        token = token.strip(_PUNCTUATION)
+        if token and token not in STOP_WORDS:
+            words.append(token)
+    return " ".join(words)
+
+
+@dataclass
+class _Entry:
+    scope: str
+    key: str
+    shingles: FrozenSet[int]
+    buckets: Tuple[Tuple[str, int, int], ...]
+
+
+class SimilarPromptIndex:
+    """Índice MinHash/LSH de perguntas já respondidas, separado por escopo.
+
+    ``find`` devolve a chave de cache da pergunta mais parecida cuja
+    similaridade de Jaccard (n-gramas de caracteres) passa de ``threshold``.
+    As permutações são feitas com XOR sobre o hash de cada n-grama, e só os
+    ``max_candidates`` que mais colidem nas bandas têm o Jaccard calculado.
+    """
+
+    def __init__(
+        self,
+        threshold: float = 0.85,
+        ngram: int = 3,
+        bands: int = 8,
+        rows: int = 6,
+        max_entries: int = 100_000,
+        max_candidates: int = 64,
+        seed: int = 7,
+    ) -> None:
+        self.threshold = threshold
+        self._ngram = ngram
+        self._bands = bands
+        self._rows = rows
+        self._max_entries = max(1, max_entries)
+        self._max_candidates = max_candidates
+        rng = random.Random(seed)
+        self._masks = [rng.getrandbits(64) for _ in range(bands * rows)]
+        self._entries: "OrderedDict[int, _Entry]" = OrderedDict()
+        self._by_key: Dict[Tuple[str, str], int] = {}
+        self._buckets: Dict[Tuple[str, int, int], Set[int]] = {}
+        self._next_id = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _shingles(self, text: str) -> FrozenSet[int]:
+        canonical = f" {canonicalize(text)} "
+        if len(canonical) <= self._ngram:
+            return frozenset({hash(canonical) & _MASK64})
+        return frozenset(
+            hash(canonical[i : i + self._ngram]) & _MASK64
+            for i in range(len(canonical) - self._ngram + 1)
+        )
+
+    def _band_keys(self, scope: str, shingles: FrozenSet[int]) -> Tuple[Tuple[str, int, int], ...]:
+        signature: List[int] = [min(value ^ mask for value in shingles) for mask in self._masks]
+        rows = self._rows
+        return tuple(
+            (scope, band, hash(tuple(signature[band * rows : (band + 1) * rows])))
+            for band in range(self._bands)
+        )
+
+    def add(self, scope: str, question: str, key: str) -> None:
+        if (scope, key) in self._by_key:
+            self._entries.move_to_end(self._by_key[(scope, key)])
+            return
+        shingles = self._shingles(question)
+        entry = _Entry(scope, key, shingles, self._band_keys(scope, shingles))
+        entry_id = self._next_id
+        self._next_id += 1
+        self._entries[entry_id] = entry
+        self._by_key[(scope, key)] = entry_id
+        for bucket in entry.buckets:
+            self._buckets.setdefault(bucket, set()).add(entry_id)
+        while len(self._entries) > self._max_entries:
+            self._discard(*self._entries.popitem(last=False))
+
+    def _discard(self, entry_id: int, entry: _Entry) -> None:
+        del self._by_key[(entry.scope, entry.key)]
+        for bucket in entry.buckets:
+            members = self._buckets[bucket]
+            members.discard(entry_id)
+            if not members:
+                del self._buckets[bucket]
+
+    def find(self, scope: str, question: str) -> Optional[str]:
+        shingles = self._shingles(question)
+        collisions: Counter = Counter()
+        for bucket in self._band_keys(scope, shingles):
+            collisions.update(self._buckets.get(bucket, ()))
+        best_key: Optional[str] = None
+        best_score = self.threshold
+        for entry_id, _ in collisions.most_common(self._max_candidates):
+            entry = self._entries[entry_id]
+            score = len(shingles & entry.shingles) / len(shingles | entry.shingles)
+            if score >= best_score:
+                best_key, best_score = entry.key, score
+        return best_key
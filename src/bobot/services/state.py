@@ -0,0 +1,195 @@
+from __future__ import annotations
+
+import sqlite3
+import threading
+from typing import Dict, Optional, Protocol, Sequence, Tuple, TypeVar
+
+from bobot.services.metrics import metrics
+from bobot.utils.logging import get_logger
+
+logger = get_logger(__name__)
+
+T = TypeVar("T")
+
+# Um balde de rate limit: (nome, intervalo entre pedidos, janela).
+Bucket = Tuple[str, float, float]
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS rate_buckets (
+    bucket TEXT PRIMARY KEY,
+    tat REAL NOT NULL
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS shared_cache (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL,
+    expires_at REAL NOT NULL
+) WITHOUT ROWID;
+"""
+
+
+class StateBackend(Protocol):
+    """Onde ficam o estado do rate limit e do cache compartilhável.
+
+    ``rate_acquire`` é atômico: ou todos os baldes consomem o pedido, ou
+    nenhum. Devolve ``(-1, 0.0)`` quando libera, ou o índice do balde que
+    recusou e em quantos segundos tentar de novo.
+    """
+
+    def rate_acquire(self, buckets: Sequence[Bucket], now: float) -> Tuple[int, float]:
+        ...
+
+    def cache_get(self, key: str, now: float) -> Optional[str]:
+        ...
+
+    def cache_set(self, key: str, value: str, expires_at: float) -> None:
+        ...
+
+    def sweep(self, now: float) -> int:
+        ...
+
+    def close(self) -> None:
+        ...
+
+    def __len__(self) -> int:
+        ...
+
+
+def _gcra(
+    buckets: Sequence[Bucket], tats: Sequence[Optional[float]], now: float
+) -> Tuple[int, float, Dict[str, float]]:
+    updates: Dict[str, float] = {}
+    for index, ((name, interval, window), tat) in enumerate(zip(buckets, tats)):
+        new_tat = max(tat if tat is not None else now, now) + interval
+        if new_tat - now > window:
+            return index, new_tat - now - window, {}
+        updates[name] = new_tat
+    return -1, 0.0, updates
+
+
+class InProcessBackend:
+    """Estado só deste processo (padrão)."""
+
+    def __init__(self) -> None:
+        self._tat: Dict[str, float] = {}
+        self._cache: Dict[str, Tuple[str, float]] = {}
+
+    def __len__(self) -> int:
+        return len(self._tat)
+
+    def rate_acquire(self, buckets: Sequence[Bucket], now: float) -> Tuple[int, float]:
+        index, retry_after, updates = _gcra(
+            buckets, [self._tat.get(name) for name, _, _ in buckets], now
+        )
+        self._tat.update(updates)
+        return index, retry_after
+
+    def cache_get(self, key: str, now: float) -> Optional[str]:
+        entry = self._cache.get(key)
+        if entry is None or entry[1] <= now:
+            return None
+        return entry[0]
+
+    def cache_set(self, key: str, value: str, expires_at: float) -> None:
+        self._cache[key] = (value, expires_at)
+
+    def sweep(self, now: float) -> int:
+        before = len(self._tat) + len(self._cache)
+        self._tat = {name: tat for name, tat in self._tat.items() if tat > now}
+        self._cache = {key: entry for key, entry in self._cache.items() if entry[1] > now}
+        return before - len(self._tat) - len(self._cache)
+
+    def close(self) -> None:
+        return None
+
+
+class SQLiteStateBackend:
+    """Estado compartilhado entre processos do mesmo host via SQLite (WAL).
+
+    O rate limit roda numa transação ``BEGIN IMMEDIATE``, que serializa os
+    processos só durante a leitura e escrita dos poucos baldes envolvidos.
+    Use um relógio de parede (``time.time``) em todos os processos.
+
+    As chamadas rodam no event loop, então a espera por um lock de outro
+    processo é curta (``busy_timeout_ms``); passando disso a operação falha
+    aberta: o pedido é liberado, o cache erra e a gravação é descartada,
+    contando em ``state.fail_open``.
+    """
+
+    def __init__(self, path: str, busy_timeout_ms: int = 20) -> None:
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute(f"PRAGMA busy_timeout={int(busy_timeout_ms)}")
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA)
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM rate_buckets").fetchone()[0]
+
+    def _fail_open(self, operation: str, exc: sqlite3.OperationalError, fallback: T) -> T:
+        metrics.incr("state.fail_open")
+        logger.debug("Estado compartilhado ocupado em %s: %s", operation, exc)
+        return fallback
+
+    def rate_acquire(self, buckets: Sequence[Bucket], now: float) -> Tuple[int, float]:
+        try:
+            with self._lock:
+                self._conn.execute("BEGIN IMMEDIATE")
+                try:
+                    tats = []
+                    for name, _, _ in buckets:
+                        row = self._conn.execute(
+                            "SELECT tat FROM rate_buckets WHERE bucket = ?", (name,)
+                        ).fetchone()
+                        tats.append(row[0] if row else None)
+                    index, retry_after, updates = _gcra(buckets, tats, now)
+                    self._conn.executemany(
+                        "INSERT OR REPLACE INTO rate_buckets (bucket, tat) VALUES (?, ?)",
+                        updates.items(),
+                    )
+                    self._conn.execute("COMMIT")
+                except BaseException:
+                    self._conn.execute("ROLLBACK")
+                    raise
+        except sqlite3.OperationalError as exc:
+            return self._fail_open("rate_acquire", exc, (-1, 0.0))
+        return index, retry_after
+
+    def cache_get(self, key: str, now: float) -> Optional[str]:
+        try:
+            with self._lock:
+                row = self._conn.execute(
+                    "SELECT value FROM shared_cache WHERE key = ? AND expires_at > ?", (key, now)
+                ).fetchone()
+        except sqlite3.OperationalError as exc:
+            return self._fail_open("cache_get", exc, None)
+        return row[0] if row else None
+
+    def cache_set(self, key: str, value: str, expires_at: float) -> None:
+        try:
+            with self._lock:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO shared_cache (key, value, expires_at) VALUES (?, ?, ?)",
+                    (key, value, expires_at),
+                )
+        except sqlite3.OperationalError as exc:
+            self._fail_open("cache_set", exc, None)
+
+    def sweep(self, now: float) -> int:
+        try:
+            with self._lock:
+                removed = self._conn.execute(
+                    "DELETE FROM rate_buckets WHERE tat <= ?", (now,)
+                ).rowcount
+                removed += self._conn.execute(
+                    "DELETE FROM shared_cache WHERE expires_at <= ?", (now,)
+                ).rowcount
+        except sqlite3.OperationalError as exc:
+            # A limpeza fica para a próxima rodada.
+            return self._fail_open("sweep", exc, 0)
+        return removed
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
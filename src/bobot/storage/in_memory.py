@@ -1,5 +1,5 @@
-from dataclasses import dataclass
-from typing import Dict
+from dataclasses import dataclass, field
+from typing import Dict, List
 
 
 @dataclass
@@ -16,3 +16,52 @@ class InMemoryProfileStore:
 
     def set(self, user_id: str, record: ProfileRecord) -> None:
         self._profiles[user_id] = record
+
+
+@dataclass
+class QuizSessionRecord:
+    guild_id: str
+    day: str
+    question: dict
+
+
+@dataclass
+class QuizAnswerRecord:
+    user_id: str
+    guild_id: str
+    day: str
+    answer: int
+    points: int
+
+
+@dataclass
+class QuizSnapshot:
+    """Estado do quiz recarregado na inicialização."""
+
+    scores: Dict[str, int] = field(default_factory=dict)
+    sessions: List[QuizSessionRecord] = field(default_factory=list)
+    answers: List[QuizAnswerRecord] = field(default_factory=list)
+
+
+class InMemoryQuizStore:
+    def __init__(self) -> None:
+        self._scores: Dict[str, int] = {}
+        self._sessions: Dict[str, QuizSessionRecord] = {}
+        self._answers: List[QuizAnswerRecord] = []
+
+    def save_session(self, record: QuizSessionRecord) -> None:
+        self._sessions[record.guild_id] = record
+
+    def record_answer(self, record: QuizAnswerRecord) -> None:
+        self._answers.append(record)
+        self._scores[record.user_id] = self._scores.get(record.user_id, 0) + record.points
+
+    async def load(self, since: str) -> QuizSnapshot:
+        return QuizSnapshot(
+            dict(self._scores),
+            [record for record in self._sessions.values() if record.day >= since],
+            [record for record in self._answers if record.day >= since],
+        )
+
+    async def aclose(self) -> None:
+        return None
@@ -0,0 +1,183 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import sqlite3
+import threading
+from typing import List, Optional
+
+from bobot.storage.in_memory import QuizAnswerRecord, QuizSessionRecord, QuizSnapshot
+from bobot.utils.logging import get_logger
+
+logger = get_logger(__name__)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS quiz_scores (
+    user_id TEXT PRIMARY KEY,
+    score INTEGER NOT NULL
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS quiz_sessions (
+    guild_id TEXT PRIMARY KEY,
+    day TEXT NOT NULL,
+    question TEXT NOT NULL
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS quiz_answers (
+    user_id TEXT NOT NULL,
+    guild_id TEXT NOT NULL,
+    day TEXT NOT NULL,
+    answer INTEGER NOT NULL,
+    points INTEGER NOT NULL,
+    PRIMARY KEY (day, guild_id, user_id)
+) WITHOUT ROWID;
+"""
+
+
+class SQLiteQuizStore:
+    """Placar, sessões e respostas do quiz em SQLite (WAL).
+
+    ``record_answer`` e ``save_session`` só entram num buffer em memória; uma
+    task grava tudo em lote, numa transação, a cada ``flush_interval``
+    segundos ou quando o buffer passa de ``batch_size``. O comando do Discord
+    nunca espera o disco. ``aclose`` grava o que faltar. O arquivo só é
+    aberto no primeiro acesso ao disco.
+    """
+
+    def __init__(self, path: str, flush_interval: float = 1.0, batch_size: int = 256) -> None:
+        self._path = path
+        self._flush_interval = flush_interval
+        self._batch_size = max(1, batch_size)
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+        self._answers: List[QuizAnswerRecord] = []
+        self._sessions: List[QuizSessionRecord] = []
+        self._wake: Optional[asyncio.Event] = None
+        self._flusher: Optional[asyncio.Task] = None
+        self._closing = False
+
+    def __len__(self) -> int:
+        """Registros ainda não gravados."""
+        return len(self._answers) + len(self._sessions)
+
+    def save_session(self, record: QuizSessionRecord) -> None:
+        self._sessions.append(record)
+        self._schedule()
+
+    def record_answer(self, record: QuizAnswerRecord) -> None:
+        self._answers.append(record)
+        self._schedule()
+
+    def _schedule(self) -> None:
+        if self._flusher is None or self._flusher.done():
+            self._wake = asyncio.Event()
+            self._flusher = asyncio.create_task(self._run_flusher())
+        if len(self) >= self._batch_size:
+            self._wake.set()
+
+    async def _run_flusher(self) -> None:
+        assert self._wake is not None
+        while not self._closing:
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=self._flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            try:
+                await self.flush()
+            except Exception as exc:
+                logger.warning("Falha ao gravar o quiz: %s", exc)
+
+    async def flush(self) -> None:
+        if not len(self):
+            return
+        answers, self._answers = self._answers, []
+        sessions, self._sessions = self._sessions, []
+        try:
+            await asyncio.to_thread(self._write, answers, sessions)
+        except Exception:
+            # Devolve o lote ao buffer para a próxima tentativa.
+            self._answers[:0] = answers
+            self._sessions[:0] = sessions
+            raise
+
+    def _connection(self) -> sqlite3.Connection:
+        if self._conn is None:
+            conn = sqlite3.connect(self._path, check_same_thread=False, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(_SCHEMA)
+            self._conn = conn
+        return self._conn
+
+    def _write(self, answers: List[QuizAnswerRecord], sessions: List[QuizSessionRecord]) -> None:
+        with self._lock:
+            conn = self._connection()
+            conn.execute("BEGIN")
+            try:
+                conn.executemany(
+                    "INSERT OR REPLACE INTO quiz_sessions (guild_id, day, question) VALUES (?, ?, ?)",
+                    [
+                        (record.guild_id, record.day, json.dumps(record.question, ensure_ascii=False))
+                        for record in sessions
+                    ],
+                )
+                # Só soma no placar a resposta que entrou de fato: uma repetida
+                # (mesmo usuário, servidor e dia) é ignorada pelo INSERT.
+                inserted = [
+                    record
+                    for record in answers
+                    if conn.execute(
+                        "INSERT OR IGNORE INTO quiz_answers "
+                        "(user_id, guild_id, day, answer, points) VALUES (?, ?, ?, ?, ?)",
+                        (record.user_id, record.guild_id, record.day, record.answer, record.points),
+                    ).rowcount
+                ]
+                conn.executemany(
+                    "INSERT INTO quiz_scores (user_id, score) VALUES (?, ?) "
+                    "ON CONFLICT (user_id) DO UPDATE SET score = score + excluded.score",
+                    [(record.user_id, record.points) for record in inserted],
+                )
+                conn.execute("COMMIT")
+            except BaseException:
+                # Um COMMIT que falha deixa a transação aberta e travaria os
+                # próximos lotes; se o SQLite já desfez tudo, não há o que fazer.
+                if conn.in_transaction:
+                    conn.execute("ROLLBACK")
+                raise
+
+    def _read(self, since: str) -> QuizSnapshot:
+        with self._lock:
+            conn = self._connection()
+            scores = dict(conn.execute("SELECT user_id, score FROM quiz_scores"))
+            sessions = [
+                QuizSessionRecord(guild_id, day, json.loads(question))
+                for guild_id, day, question in conn.execute(
+                    "SELECT guild_id, day, question FROM quiz_sessions WHERE day >= ?", (since,)
+                )
+            ]
+            answers = [
+                QuizAnswerRecord(*row)
+                for row in conn.execute(
+                    "SELECT user_id, guild_id, day, answer, points FROM quiz_answers "
+                    "WHERE day >= ?",
+                    (since,),
+                )
+            ]
+        return QuizSnapshot(scores, sessions, answers)
+
+    async def load(self, since: str) -> QuizSnapshot:
+        """Placar geral, mais sessões e respostas a partir do dia ``since`` (ISO)."""
+        await self.flush()
+        return await asyncio.to_thread(self._read, since)
+
+    async def aclose(self) -> None:
+        # Sem cancelar: um lote já entregue à thread seria gravado duas vezes.
+        self._closing = True
+        if self._flusher is not None:
+            self._wake.set()
+            await self._flusher
+            self._flusher = None
+        await self.flush()
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
@@ -6,3 +6,14 @@ URL_MONGO = "https://pymongo.readthedocs.io/en/stable/"
 CSHARP = "https://docs.microsoft.com/en-us/dotnet/csharp/"
 C = "https://en.wikipedia.org/wiki/C_(programming_language)"
 GOOGLE = "https://www.google.com/search?q={}"
+
+# Documentação oficial por tecnologia do índice local (bobot.services.docs_index).
+DOCS_URLS = {
+    "python": URL_PYTHON,
+    "javascript": URL_JAVASCRIPT,
+    "html": URL_HTML,
+    "css": URL_CSS,
+    "mongodb": URL_MONGO,
+    "csharp": CSHARP,
+    "c": C,
+}
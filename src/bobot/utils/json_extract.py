@@ -0,0 +1,78 @@
+from __future__ import annotations
+
+import json
+import re
+from typing import Any, List, Optional, Tuple
+
+_FENCE = re.compile(r"```[a-zA-Z0-9_-]*\s*\n?(.*?)(?:```|$)", re.DOTALL)
+_CLOSERS = {"{": "}", "[": "]"}
+
+
+def _scan(text: str, start: int) -> Tuple[Optional[int], List[int]]:
+    """Acha o fim do valor que começa em ``start``.
+
+    Devolve o índice logo após o fechamento (ou ``None`` se o texto acabar
+    antes) e onde terminam os itens completos do array de fora, se houver.
+    """
+    stack: List[str] = []
+    item_ends: List[int] = []
+    in_string = False
+    escaped = False
+    for index in range(start, len(text)):
+        char = text[index]
+        if in_string:
+            if escaped:
+                escaped = False
+            elif char == "\\":
+                escaped = True
+            elif char == '"':
+                in_string = False
+            continue
+        if char == '"':
+            in_string = True
+        elif char in _CLOSERS:
+            stack.append(_CLOSERS[char])
+        elif char in "}]":
+            if not stack or stack[-1] != char:
+                return None, item_ends
+            stack.pop()
+            if not stack:
+                return index + 1, item_ends
+            if len(stack) == 1 and text[start] == "[":
+                item_ends.append(index + 1)
+    return None, item_ends
+
+
+def _candidates(text: str) -> List[str]:
+    blocks = [match.group(1) for match in _FENCE.finditer(text)]
+    return blocks + [text] if blocks else [text]
+
+
+def extract_json(text: str) -> Any:
+    """Lê JSON de uma resposta de modelo, tolerando texto em volta.
+
+    Aceita JSON puro, blocos em cercas de código e objetos ou arrays no meio
+    de prosa. Se um array vier cortado no fim, devolve os itens completos.
+    Levanta ``ValueError`` quando não há JSON aproveitável.
+    """
+    for candidate in _candidates(text):
+        stripped = candidate.strip()
+        try:
+            return json.loads(stripped)
+        except ValueError:
+            pass
+        for start, char in enumerate(candidate):
+            if char not in _CLOSERS:
+                continue
+            end, item_ends = _scan(candidate, start)
+            if end is not None:
+                try:
+                    return json.loads(candidate[start:end])
+                except ValueError:
+                    continue
+            if char == "[" and item_ends:
+                try:
+                    return json.loads(candidate[start : item_ends[-1]] + "]")
+                except ValueError:
+                    continue
+    raise ValueError("Nenhum JSON válido na resposta.")
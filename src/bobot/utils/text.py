@@ -1,9 +1,76 @@
 from __future__ import annotations
 
-from typing import List
+from typing import List, Optional, Tuple
+
+_FENCE = "```"
+_CLOSE = "\n" + _FENCE
+
+
+def _boundary(text: str, limit: int) -> Tuple[int, int]:
+    """Onde cortar até ``limit`` e quantos caracteres de separador descartar.
+
+    Prefere parágrafo, depois linha, depois espaço, desde que o pedaço fique
+    com pelo menos metade do limite; senão aceita qualquer linha ou espaço e,
+    em último caso, corta no meio.
+    """
+    for separator in ("\n\n", "\n", " "):
+        cut = text.rfind(separator, 0, limit + 1)
+        if cut >= limit // 2 and cut > 0:
+            return cut, len(separator)
+    for separator in ("\n", " "):
+        cut = text.rfind(separator, 0, limit + 1)
+        if cut > 0:
+            return cut, len(separator)
+    return limit, 0
+
+
+def _open_fence(text: str) -> Optional[str]:
+    """Linha de abertura do bloco de código que ficou aberto no fim de ``text``."""
+    fence: Optional[str] = None
+    for line in text.split("\n"):
+        if line.lstrip().startswith(_FENCE):
+            fence = None if fence is not None else line.strip()
+    return fence
+
+
+def _split(text: str, limit: int) -> Tuple[str, str]:
+    cut, skip = _boundary(text, limit)
+    head = text[:cut].rstrip()
+    if not head:
+        return text[:limit], text[limit:]
+    tail = text[cut + skip :]
+    return head, tail.lstrip("\n") if skip else tail
+
+
+def take_chunk(text: str, max_size: int) -> Tuple[str, str]:
+    """Separa o primeiro pedaço de até ``max_size`` caracteres e o resto.
+
+    Se o corte cair dentro de um bloco de código, o pedaço fecha a cerca e o
+    resto a reabre com a mesma linguagem, para o Discord formatar os dois.
+    """
+    if max_size <= 0 or len(text) <= max_size:
+        return text, ""
+    head, tail = _split(text, max_size)
+    fence = _open_fence(head)
+    if fence is None or len(fence) + len(_CLOSE) >= max_size // 2:
+        return head, tail
+    limit = max_size - len(_CLOSE)
+    head, tail = _split(text, limit)
+    fence = _open_fence(head)
+    if fence is None:
+        return head, tail
+    if head.rstrip().split("\n")[-1].strip() == fence:
+        # O único corte possível é logo após a abertura (linha de código
+        # maior que o limite): corta no meio da linha para sempre avançar.
+        head, tail = text[:limit], text[limit:]
+    return head + _CLOSE, f"{fence}\n{tail}"
 
 
 def chunk_text(text: str, max_size: int = 1900) -> List[str]:
     if max_size <= 0:
         return [text]
-    return [text[i : i + max_size] for i in range(0, len(text), max_size)]
+    chunks: List[str] = []
+    while text:
+        head, text = take_chunk(text, max_size)
+        chunks.append(head)
+    return chunks
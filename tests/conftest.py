@@ -1,4 +1,5 @@
 import os
+import sqlite3
 from dataclasses import dataclass, field
 from typing import List, Optional
 
@@ -20,14 +21,26 @@ class FakeAuthor:
     id: int = 1
 
 
+@dataclass
+class FakeMessage:
+    record: dict
+    edits: int = 0
+
+    async def edit(self, content: Optional[str] = None):
+        self.edits += 1
+        self.record["content"] = content
+
+
 @dataclass
 class FakeCtx:
     channel: FakeChannel
     author: FakeAuthor = field(default_factory=FakeAuthor)
     sent: List[dict] = field(default_factory=list)
 
-    async def send(self, content: Optional[str] = None, embed=None):
-        self.sent.append({"content": content, "embed": embed})
+    async def send(self, content: Optional[str] = None, embed=None, embeds=None, file=None):
+        record = {"content": content, "embed": embed, "embeds": embeds, "file": file}
+        self.sent.append(record)
+        return FakeMessage(record)
 
     class _Typing:
         async def __aenter__(self):
@@ -40,6 +53,41 @@ class FakeCtx:
         return self._Typing()
 
 
+class FakeClock:
+    """Relógio controlado pelo teste: avance com ``clock.now += segundos``."""
+
+    def __init__(self, now: float = 0.0) -> None:
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class CommitFails:
+    """Conexão SQLite cujo ``COMMIT`` falha (disco cheio, lock de outro processo).
+
+    Com ``rolled_back=True`` imita o SQLite desfazendo a transação sozinho.
+    """
+
+    def __init__(self, conn: sqlite3.Connection, rolled_back: bool = False) -> None:
+        self.conn = conn
+        self.rolled_back = rolled_back
+
+    @property
+    def in_transaction(self) -> bool:
+        return self.conn.in_transaction
+
+    def execute(self, sql: str, *args):
+        if sql == "COMMIT":
+            if self.rolled_back:
+                self.conn.execute("ROLLBACK")
+            raise sqlite3.OperationalError("database or disk is full")
+        return self.conn.execute(sql, *args)
+
+    def executemany(self, sql: str, rows):
+        return self.conn.executemany(sql, rows)
+
+
 @pytest.fixture()
 def allowed_ctx():
     return FakeCtx(channel=FakeChannel(id=123))
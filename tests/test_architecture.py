@@ -8,12 +8,19 @@ from bobot.domain.exceptions import (
     BotError,
     ConfigurationError,
     ExternalServiceError,
+    OverloadedError,
     PermissionError,
     RateLimitError,
 )
 from bobot.services.cache import InMemoryCache
 from bobot.services.history import ChannelHistory
-from bobot.services.permissions import PermissionProfile, PermissionService
+from bobot.services.metrics import metrics
+from bobot.services.permissions import (
+    Allowlist,
+    CommandAccess,
+    PermissionProfile,
+    PermissionService,
+)
 from bobot.services.profile import ProfileService, UserProfile
 from bobot.services.rate_limit import RateLimit, RateLimiter
 from bobot.storage.in_memory import InMemoryProfileStore, ProfileRecord
@@ -27,6 +34,9 @@ def test_exceptions_hierarchy():
     assert issubclass(PermissionError, BotError)
     assert issubclass(RateLimitError, BotError)
     assert issubclass(ExternalServiceError, BotError)
+    assert issubclass(OverloadedError, BotError)
+    error = OverloadedError("Fila cheia.", position=3, estimated_wait=12.0)
+    assert (error.position, error.estimated_wait) == (3, 12.0)
 
 
 def test_formatting_and_validation():
@@ -38,16 +48,39 @@ def test_formatting_and_validation():
 
 
 def test_cache_set_get_and_expire(monkeypatch):
-    cache = InMemoryCache()
+    now = {"t": 100.0}
+    cache = InMemoryCache(clock=lambda: now["t"])
     cache.set("key", "value", ttl_seconds=1)
     assert cache.get("key") == "value"
 
-    from datetime import datetime, timedelta
+    now["t"] = 101.0
+    assert cache.get("key") is None
+    assert cache.get("missing") is None
+    assert cache.stats.hits == 1
+    assert cache.stats.misses == 2
+    assert cache.stats.expirations == 1
+    assert cache.stats.hit_ratio == 1 / 3
+    assert len(cache) == 0 and cache.size_bytes == 0
 
-    cache._data["expired"] = cache._data["key"].__class__(
-        value="old", expires_at=datetime.utcnow() - timedelta(seconds=1)
-    )
-    assert cache.get("expired") is None
+
+def test_cache_lru_eviction_by_entries_and_bytes():
+    cache = InMemoryCache(max_entries=2, max_bytes=20)
+    assert cache.stats.hit_ratio == 0.0
+    cache.set("a", "1")
+    cache.set("b", "2")
+    assert cache.get("a") == "1"
+    cache.set("c", "3")
+    assert cache.get("b") is None
+    assert cache.get("a") == "1" and cache.get("c") == "3"
+    assert cache.stats.evictions == 1
+
+    cache.set("a", "x" * 18)
+    assert cache.get("c") is None
+    assert cache.size_bytes == 19
+
+    cache.set("a", "y" * 30)
+    assert cache.get("a") is None
+    assert len(cache) == 0
 
 
 def test_history_add_list():
@@ -71,6 +104,34 @@ def test_permission_service():
         service.ensure_allowed(PermissionProfile(allow_commands=False))
 
 
+def test_command_access_counts_and_samples_rejections(caplog):
+    metrics.reset()
+    access = CommandAccess(
+        {
+            "docs": Allowlist(channels=frozenset({1}), guilds=frozenset({9})),
+            "llm": Allowlist(),
+        },
+        log_every=2,
+    )
+    assert access.allows("docs", 1)
+    assert access.allows("docs", 5, guild_id=9)
+    assert access.allows("llm", 5)
+    assert access.allows(None, 5)
+    assert access.allows("outro", 5)
+    with caplog.at_level("INFO"):
+        assert [access.allows("docs", 5, guild_id=8) for _ in range(3)] == [False] * 3
+    assert metrics.counters["commands.rejected"] == 3
+    assert metrics.counters["commands.rejected.docs"] == 3
+    assert caplog.text.count("recusado") == 2
+
+    every = CommandAccess({"docs": Allowlist(channels=frozenset({1}))}, log_every=1)
+    caplog.clear()
+    with caplog.at_level("INFO"):
+        every.allows("docs", 2)
+        every.allows("docs", 2)
+    assert caplog.text.count("recusado") == 2
+
+
 def test_profile_service():
     service = ProfileService()
     profile = UserProfile(user_id="1")
@@ -1,14 +1,32 @@
+import time
 import types
 
 import pytest
 
 import bobot.bot as bot_module
+from bobot.services.docs_index import Passage, open_retriever, write_index
+from bobot.services.metrics import metrics
+from bobot.services.permissions import Allowlist, CommandAccess
 
 
 @pytest.mark.asyncio
 async def test_on_ready_and_typing_and_main(caplog, monkeypatch):
+    started = []
+    monkeypatch.setattr(bot_module.health_prober, "start", lambda: started.append("prober"))
+    monkeypatch.setattr(bot_module.quiz_pool, "start", lambda: started.append("pool"))
+
+    async def fake_restore():
+        started.append("quiz")
+        return 0
+
+    monkeypatch.setattr(bot_module.quiz_service, "restore", fake_restore)
+    await bot_module.on_ready()
     await bot_module.on_ready()
     assert "We have logged in as" in caplog.text
+    assert started == ["prober", "pool", "prober", "pool"]
+    await bot_module.bot.setup_hook()
+    assert started[-1] == "quiz"
+    assert "Quiz restaurado: 0 participantes." in caplog.text
 
     class DummyTextChannel:
         def __init__(self, channel_id, name):
@@ -48,7 +66,7 @@ async def test_help_ola_pesquisa_youtube(allowed_ctx):
 
 
 @pytest.mark.asyncio
-async def test_docs_commands_allowed_and_blocked(allowed_ctx, blocked_ctx, capsys):
+async def test_docs_commands(allowed_ctx):
     allowed = [
         bot_module.python_docs,
         bot_module.javascript_docs,
@@ -63,22 +81,15 @@ async def test_docs_commands_allowed_and_blocked(allowed_ctx, blocked_ctx, capsy
         await func(allowed_ctx)
         assert allowed_ctx.sent[-1]["content"]
 
-    for func in allowed:
-        await func(blocked_ctx)
-        _ = capsys.readouterr()
-
 
 @pytest.mark.asyncio
-async def test_version_command(allowed_ctx, blocked_ctx, capsys):
+async def test_version_command(allowed_ctx):
     await bot_module.version(allowed_ctx)
     assert "Versão" in allowed_ctx.sent[-1]["content"]
 
-    await bot_module.version(blocked_ctx)
-    _ = capsys.readouterr()
-
 
 @pytest.mark.asyncio
-async def test_snippet_variants(allowed_ctx, blocked_ctx):
+async def test_snippet_variants(allowed_ctx):
     await bot_module.snippet(allowed_ctx, "python")
     assert "30secondsofcode" in allowed_ctx.sent[-1]["content"]
 
@@ -97,12 +108,9 @@ async def test_snippet_variants(allowed_ctx, blocked_ctx):
     await bot_module.snippet(allowed_ctx, "unknown")
     assert "não suportado" in allowed_ctx.sent[-1]["content"]
 
-    await bot_module.snippet(blocked_ctx, "python")
-    assert "canal específico" in blocked_ctx.sent[-1]["content"]
-
 
 @pytest.mark.asyncio
-async def test_calc_variants(allowed_ctx, blocked_ctx, capsys):
+async def test_calc_variants(allowed_ctx):
     await bot_module.calc(allowed_ctx, "soma", 1, 2)
     assert "= 3" in allowed_ctx.sent[-1]["content"]
 
@@ -121,8 +129,44 @@ async def test_calc_variants(allowed_ctx, blocked_ctx, capsys):
     await bot_module.calc(allowed_ctx, "x", 1, 1)
     assert "Operação inválida" in allowed_ctx.sent[-1]["content"]
 
-    await bot_module.calc(blocked_ctx, "soma", 1, 2)
-    _ = capsys.readouterr()
+
+@pytest.mark.asyncio
+async def test_global_check_enforces_group_allowlists(allowed_ctx, blocked_ctx, monkeypatch):
+    metrics.reset()
+    calc = bot_module.bot.get_command("calc")
+    allowed_ctx.command = blocked_ctx.command = calc
+    assert bot_module.command_allowed_here(allowed_ctx)
+    with pytest.raises(bot_module.CommandNotAllowedHere):
+        bot_module.command_allowed_here(blocked_ctx)
+    assert metrics.counters["commands.rejected.tools"] == 1
+
+    blocked_ctx.command = bot_module.bot.get_command("ola")
+    assert bot_module.command_allowed_here(blocked_ctx)
+    blocked_ctx.command = None
+    assert bot_module.command_allowed_here(blocked_ctx)
+
+    monkeypatch.setattr(
+        bot_module,
+        "command_access",
+        CommandAccess({"tools": Allowlist(guilds=frozenset({42}))}),
+    )
+    blocked_ctx.command = calc
+    blocked_ctx.guild = types.SimpleNamespace(id=42)
+    assert bot_module.command_allowed_here(blocked_ctx)
+
+
+@pytest.mark.asyncio
+async def test_rejections_are_not_reported_as_errors(monkeypatch):
+    reported = []
+
+    async def fake_on_command_error(self, context, exception):
+        reported.append(exception)
+
+    monkeypatch.setattr(bot_module.commands.Bot, "on_command_error", fake_on_command_error)
+    await bot_module.bot.on_command_error(None, bot_module.CommandNotAllowedHere())
+    other = bot_module.commands.CommandError("x")
+    await bot_module.bot.on_command_error(None, other)
+    assert reported == [other]
 
 
 class DummyResponse:
@@ -190,10 +234,14 @@ async def test_run_command_paths(allowed_ctx, monkeypatch):
 
 @pytest.mark.asyncio
 async def test_llm_handlers_success(monkeypatch, allowed_ctx):
-    async def fake_generate(prompt: str, user_key: str):
-        return f"Resposta para {user_key}: {prompt}"
+    priorities = []
 
-    monkeypatch.setattr(bot_module.llm_service, "generate", fake_generate)
+    async def fake_stream(prompt: str, user_key: str, question=None, priority=None, scopes=None, **_):
+        priorities.append(priority)
+        yield f"Resposta para {user_key}: "
+        yield prompt
+
+    monkeypatch.setattr(bot_module.llm_service, "stream", fake_stream)
 
     await bot_module.ask_command(allowed_ctx, pergunta="o que é python?")
     assert "Pergunta" in allowed_ctx.sent[-1]["content"]
@@ -206,48 +254,200 @@ async def test_llm_handlers_success(monkeypatch, allowed_ctx):
 
     await bot_module.docs_command(allowed_ctx, tecnologia="fastapi")
     assert "Docs" in allowed_ctx.sent[-1]["content"]
+    Priority = bot_module.Priority
+    assert priorities == [
+        Priority.INTERACTIVE, Priority.NORMAL, Priority.NORMAL, Priority.INTERACTIVE
+    ]
+
+
+@pytest.mark.asyncio
+async def test_docs_and_ask_use_local_index(monkeypatch, allowed_ctx, tmp_path):
+    path = str(tmp_path / "docs.bin")
+    write_index(
+        path,
+        [
+            Passage("python", "python/asyncio.txt", "asyncio.gather executa corrotinas juntas."),
+            Passage("python", "python/listas.txt", "Listas guardam itens em ordem."),
+            Passage("rust", "rust/x.txt", "Borrow checker."),
+        ],
+    )
+    retriever = open_retriever(path, min_score=0.1, direct_score=0.5)
+    monkeypatch.setattr(bot_module, "docs_retriever", retriever)
+    prompts = []
+
+    async def fake_stream(prompt: str, user_key: str, question=None, priority=None, scopes=None, **_):
+        prompts.append(prompt)
+        yield "ok"
+
+    monkeypatch.setattr(bot_module.llm_service, "stream", fake_stream)
+    metrics.reset()
+
+    await bot_module.docs_command(allowed_ctx, tecnologia="python asyncio gather")
+    answer = allowed_ctx.sent[-1]["content"]
+    assert "asyncio.gather executa" in answer
+    assert "python/asyncio.txt" in answer and bot_module.URL_PYTHON in answer
+    assert metrics.counters["docs.direct_answers"] == 1
+    assert prompts == []
+
+    await bot_module.docs_command(allowed_ctx, tecnologia="python")
+    await bot_module.docs_command(allowed_ctx, tecnologia="python asyncio zzz")
+    assert "Trechos" not in prompts[0]
+    assert "[1] (python/asyncio.txt)" in prompts[1]
+
+    await bot_module.ask_command(allowed_ctx, pergunta="como guardar itens em listas?")
+    assert "[1] (python/listas.txt)" in prompts[2]
+
+    await bot_module.docs_command(allowed_ctx, tecnologia="borrow checker")
+    assert "rust/x.txt" in allowed_ctx.sent[-1]["content"]
+    assert "Documentação oficial" not in allowed_ctx.sent[-1]["content"]
+
+    closed = []
+    monkeypatch.setattr(retriever, "close", lambda: closed.append(True))
+    monkeypatch.setattr(bot_module.commands.Bot, "close", _noop_close)
+    monkeypatch.setattr(bot_module, "close_clients", _noop)
+    monkeypatch.setattr(bot_module.llm_service, "aclose", _noop)
+    monkeypatch.setattr(bot_module.health_prober, "stop", _noop)
+    monkeypatch.setattr(bot_module.quiz_pool, "stop", _noop)
+    monkeypatch.setattr(bot_module.quiz_service.store, "aclose", _noop)
+    await bot_module.bot.close()
+    assert closed == [True]
+    retriever.index.close()
+
+
+async def _noop():
+    return None
+
+
+async def _noop_close(self):
+    return None
 
 
 @pytest.mark.asyncio
 async def test_llm_handlers_errors(monkeypatch, allowed_ctx):
-    async def raise_rate(prompt: str, user_key: str):
+    async def raise_rate(prompt: str, user_key: str, question=None, priority=None, scopes=None, **_):
         raise bot_module.RateLimitError("limite")
+        yield
 
-    async def raise_external(prompt: str, user_key: str):
+    async def raise_external(prompt: str, user_key: str, question=None, priority=None, scopes=None, **_):
+        yield "parcial"
         raise bot_module.ExternalServiceError("falha")
 
-    async def raise_unknown(prompt: str, user_key: str):
+    async def raise_unknown(prompt: str, user_key: str, question=None, priority=None, scopes=None, **_):
         raise RuntimeError("boom")
+        yield
 
-    monkeypatch.setattr(bot_module.llm_service, "generate", raise_rate)
+    monkeypatch.setattr(bot_module.llm_service, "stream", raise_rate)
     await bot_module.ask_command(allowed_ctx, pergunta="x")
     assert "Limite excedido" in allowed_ctx.sent[-1]["content"]
 
-    monkeypatch.setattr(bot_module.llm_service, "generate", raise_external)
+    monkeypatch.setattr(bot_module.llm_service, "stream", raise_external)
     await bot_module.ask_command(allowed_ctx, pergunta="x")
+    assert "parcial" in allowed_ctx.sent[-2]["content"]
     assert "Falha ao consultar" in allowed_ctx.sent[-1]["content"]
 
-    monkeypatch.setattr(bot_module.llm_service, "generate", raise_unknown)
+    monkeypatch.setattr(bot_module.llm_service, "stream", raise_unknown)
     await bot_module.ask_command(allowed_ctx, pergunta="x")
     assert "Erro inesperado" in allowed_ctx.sent[-1]["content"]
 
 
+@pytest.mark.asyncio
+async def test_llm_handler_rate_limit_scopes_and_retry_after(monkeypatch, allowed_ctx):
+    seen = []
+
+    async def limited(prompt: str, user_key: str, question=None, priority=None, scopes=None, **_):
+        seen.append(scopes)
+        raise bot_module.RateLimitError("Limite de requisições excedido.", 12.2, "guild")
+        yield
+
+    monkeypatch.setattr(bot_module.llm_service, "stream", limited)
+    allowed_ctx.guild = types.SimpleNamespace(id=77)
+    await bot_module.ask_command(allowed_ctx, pergunta="x")
+    assert seen == [{"channel": "123", "guild": "77"}]
+    assert allowed_ctx.sent[-1]["content"] == (
+        "Limite excedido: Limite de requisições excedido. Tente novamente em 13s."
+    )
+
+
+@pytest.mark.asyncio
+async def test_llm_handler_reports_queue_position_and_overload(monkeypatch, allowed_ctx):
+    from bobot.services.queue import QueueEstimate
+
+    async def fake_stream(prompt: str, user_key: str, on_queued=None, **_):
+        on_queued(QueueEstimate(7, 40.4))
+        on_queued(QueueEstimate(6, 30.0))
+        yield "ok"
+
+    async def cached_stream(prompt: str, user_key: str, **_):
+        yield "do cache"
+
+    async def overloaded(prompt: str, user_key: str, question=None, priority=None, scopes=None, **_):
+        raise bot_module.OverloadedError("Fila cheia.", position=12, estimated_wait=60.0)
+        yield
+
+    async def overloaded_late(prompt: str, user_key: str, question=None, priority=None, scopes=None, **_):
+        raise bot_module.OverloadedError("Tempo máximo na fila excedido.")
+        yield
+
+    monkeypatch.setattr(bot_module.llm_service, "stream", fake_stream)
+    await bot_module.code_command(allowed_ctx, "python", tema="api")
+    notices = [sent["content"] for sent in allowed_ctx.sent if "Na fila" in sent["content"]]
+    assert notices == ["⏳ Na fila: posição 7, ~40s."]
+
+    sent = len(allowed_ctx.sent)
+    monkeypatch.setattr(bot_module.llm_service, "stream", cached_stream)
+    await bot_module.code_command(allowed_ctx, "python", tema="api")
+    assert all("Na fila" not in item["content"] for item in allowed_ctx.sent[sent:])
+
+    monkeypatch.setattr(bot_module.llm_service, "stream", overloaded)
+    await bot_module.code_command(allowed_ctx, "python", tema="api")
+    assert allowed_ctx.sent[-1]["content"] == (
+        "⏳ Bot sobrecarregado agora. Fila cheia. Posição 12, ~60s de espera."
+        " Tente novamente em instantes."
+    )
+
+    monkeypatch.setattr(bot_module.llm_service, "stream", overloaded_late)
+    await bot_module.code_command(allowed_ctx, "python", tema="api")
+    assert "Tempo máximo na fila excedido. Tente" in allowed_ctx.sent[-1]["content"]
+
+
 @pytest.mark.asyncio
 async def test_status_command(monkeypatch, allowed_ctx):
-    async def fake_health():
-        return {"ollama": True, "lmstudio": False}
+    from bobot.ai.health import HealthProber, ProbeResult
+    from bobot.ai.routing import ProviderRouter
+
+    refreshes = []
 
-    monkeypatch.setattr(bot_module.llm_service, "health", fake_health)
+    async def fake_refresh():
+        refreshes.append(True)
+        return {"ollama": ProbeResult(True, 0.05, time.time())}
+
+    prober = HealthProber([])
+    monkeypatch.setattr(prober, "refresh", fake_refresh)
+    monkeypatch.setattr(bot_module, "health_prober", prober)
+    monkeypatch.setattr(bot_module.llm_service, "providers", ["ollama"])
     await bot_module.status_command(allowed_ctx)
     assert "Status LLM" in allowed_ctx.sent[-1]["content"]
+    assert "ollama: OK (50 ms) | checado há 0s" in allowed_ctx.sent[-1]["content"]
+    assert refreshes == [True]
+
+    prober._results = {
+        "ollama": ProbeResult(True, 0.05, time.time() - 12),
+        "lmstudio": ProbeResult(False, None, time.time() - 12, "timeout"),
+    }
+    router = ProviderRouter()
+    router.record_success("ollama", 1.25)
+    router.record_failure("lmstudio")
+    monkeypatch.setattr(bot_module.llm_service, "router", router)
+    await bot_module.status_command(allowed_ctx)
+    content = allowed_ctx.sent[-1]["content"]
+    assert "ollama: OK (50 ms) | checado há 12s | circuito: closed | latência: 1.2s" in content
+    assert "lmstudio: OFF | checado há 12s | circuito: closed | latência: - | erros: 30%" in content
+    assert refreshes == [True]
 
 
 @pytest.mark.asyncio
 async def test_status_command_no_providers(monkeypatch, allowed_ctx):
-    async def fake_health():
-        return {}
-
-    monkeypatch.setattr(bot_module.llm_service, "health", fake_health)
+    monkeypatch.setattr(bot_module.llm_service, "providers", [])
     await bot_module.status_command(allowed_ctx)
     assert "Nenhum provider" in allowed_ctx.sent[-1]["content"]
 
@@ -255,6 +455,66 @@ async def test_status_command_no_providers(monkeypatch, allowed_ctx):
 @pytest.mark.asyncio
 async def test_send_paginated_ctx(allowed_ctx):
     await bot_module._send_paginated_ctx(allowed_ctx, "a" * 4000)
-    assert len(allowed_ctx.sent) >= 2
+    assert len(allowed_ctx.sent) == 1
+    assert allowed_ctx.sent[-1]["embeds"][0].description == "a" * 4000
     await bot_module._send_paginated_ctx(allowed_ctx, "")
     assert allowed_ctx.sent[-1]["content"] == ""
+
+
+@pytest.mark.asyncio
+async def test_bot_context_sends_through_channel_dispatcher(monkeypatch):
+    sent = []
+
+    async def fake_context_send(self, content=None, **kwargs):
+        sent.append((content, kwargs))
+        return "msg"
+
+    async def fake_get_context(self, origin, *, cls):
+        return cls
+
+    monkeypatch.setattr(bot_module.commands.Context, "send", fake_context_send)
+    monkeypatch.setattr(bot_module.commands.Bot, "get_context", fake_get_context)
+    assert await bot_module.bot.get_context(object()) is bot_module.BobotContext
+
+    ctx = bot_module.BobotContext.__new__(bot_module.BobotContext)
+    ctx.message = types.SimpleNamespace(channel=types.SimpleNamespace(id=7))
+    await bot_module._send_paginated_ctx(ctx, "aviso")
+    assert await ctx.send(embed="e") == "msg"
+    assert sent == [("aviso", {}), (None, {"embed": "e"})]
+    assert bot_module.dispatcher.pending("7") == 0
+
+
+@pytest.mark.asyncio
+async def test_bot_close_releases_http_clients(monkeypatch):
+    calls = []
+
+    async def fake_close_clients():
+        calls.append("clients")
+
+    async def fake_service_close():
+        calls.append("service")
+
+    async def fake_prober_stop():
+        calls.append("prober")
+
+    async def fake_pool_stop():
+        calls.append("pool")
+
+    async def fake_store_close():
+        calls.append("store")
+
+    async def fake_drain():
+        calls.append("dispatcher")
+
+    async def fake_super_close(self):
+        calls.append("bot")
+
+    monkeypatch.setattr(bot_module, "close_clients", fake_close_clients)
+    monkeypatch.setattr(bot_module.llm_service, "aclose", fake_service_close)
+    monkeypatch.setattr(bot_module.health_prober, "stop", fake_prober_stop)
+    monkeypatch.setattr(bot_module.quiz_pool, "stop", fake_pool_stop)
+    monkeypatch.setattr(bot_module.quiz_service.store, "aclose", fake_store_close)
+    monkeypatch.setattr(bot_module.dispatcher, "drain", fake_drain)
+    monkeypatch.setattr(bot_module.commands.Bot, "close", fake_super_close)
+    await bot_module.bot.close()
+    assert calls == ["pool", "store", "prober", "service", "clients", "dispatcher", "bot"]
@@ -11,10 +11,24 @@ class DummyCtx:
     async def send(self, content=None, embed=None):
         self.sent.append({"content": content, "embed": embed})
 
+def _active_session(monkeypatch):
+    session = types.SimpleNamespace(
+        question=bot_module.QuizQuestion(
+            pergunta="Pergunta de teste?",
+            opcoes=["A", "B", "C", "D"],
+            resposta_correta=1,
+        )
+    )
+    monkeypatch.setattr(bot_module.quiz_service, "session", lambda guild_id="": session)
+    monkeypatch.setattr(bot_module.quiz_service, "has_answered", lambda user_id, guild_id="": False)
+    return session
+
 @pytest.mark.asyncio
 async def test_quiz_command(monkeypatch):
     ctx = DummyCtx()
-    async def fake_get_daily_quiz(user_id):
+    calls = []
+    async def fake_get_daily_quiz(user_id, guild_id=""):
+        calls.append((user_id, guild_id))
         return bot_module.QuizQuestion(
             pergunta="Pergunta de teste?",
             opcoes=["A", "B", "C", "D"],
@@ -24,11 +38,14 @@ async def test_quiz_command(monkeypatch):
     await bot_module.quiz_command(ctx)
     assert ctx.sent[-1]["embed"] is not None
     assert "Pergunta de teste?" in ctx.sent[-1]["embed"].description
+    ctx.guild = types.SimpleNamespace(id=42)
+    await bot_module.quiz_command(ctx)
+    assert calls == [("user_test", ""), ("user_test", "42")]
 
 @pytest.mark.asyncio
 async def test_quiz_command_already_answered(monkeypatch):
     ctx = DummyCtx()
-    async def fake_get_daily_quiz(user_id):
+    async def fake_get_daily_quiz(user_id, guild_id=""):
         return None
     monkeypatch.setattr(bot_module.quiz_service, "get_daily_quiz", fake_get_daily_quiz)
     await bot_module.quiz_command(ctx)
@@ -37,12 +54,8 @@ async def test_quiz_command_already_answered(monkeypatch):
 @pytest.mark.asyncio
 async def test_responder_command(monkeypatch):
     ctx = DummyCtx()
-    ctx.bot.quiz_question = bot_module.QuizQuestion(
-        pergunta="Pergunta de teste?",
-        opcoes=["A", "B", "C", "D"],
-        resposta_correta=1,
-    )
-    def fake_submit_answer(user_id, question, answer_idx):
+    _active_session(monkeypatch)
+    def fake_submit_answer(user_id, question, answer_idx, guild_id=""):
         return answer_idx == 1
     monkeypatch.setattr(bot_module.quiz_service, "submit_answer", fake_submit_answer)
     await bot_module.responder_command(ctx, 2)
@@ -51,37 +64,61 @@ async def test_responder_command(monkeypatch):
 @pytest.mark.asyncio
 async def test_responder_command_incorreta(monkeypatch):
     ctx = DummyCtx()
-    ctx.bot.quiz_question = bot_module.QuizQuestion(
-        pergunta="Pergunta de teste?",
-        opcoes=["A", "B", "C", "D"],
-        resposta_correta=1,
-    )
-    def fake_submit_answer(user_id, question, answer_idx):
+    _active_session(monkeypatch)
+    def fake_submit_answer(user_id, question, answer_idx, guild_id=""):
         return False
     monkeypatch.setattr(bot_module.quiz_service, "submit_answer", fake_submit_answer)
     await bot_module.responder_command(ctx, 1)
     assert "incorreta" in ctx.sent[-1]["content"]
 
 @pytest.mark.asyncio
-async def test_responder_command_no_quiz():
+async def test_responder_command_no_quiz(monkeypatch):
+    monkeypatch.setattr(bot_module.quiz_service, "session", lambda guild_id="": None)
     ctx = DummyCtx()
     await bot_module.responder_command(ctx, 1)
     assert "Nenhum quiz ativo" in ctx.sent[-1]["content"]
 
+@pytest.mark.asyncio
+async def test_responder_command_already_answered(monkeypatch):
+    _active_session(monkeypatch)
+    monkeypatch.setattr(bot_module.quiz_service, "has_answered", lambda user_id, guild_id="": True)
+    ctx = DummyCtx()
+    await bot_module.responder_command(ctx, 2)
+    assert "já respondeu" in ctx.sent[-1]["content"]
+
 @pytest.mark.asyncio
 async def test_ranking_command(monkeypatch):
     ctx = DummyCtx()
-    def fake_get_ranking():
+    def fake_get_ranking(period="all", limit=None):
         return [("user_test", 5), ("user2", 3)]
     monkeypatch.setattr(bot_module.quiz_service, "get_ranking", fake_get_ranking)
+    monkeypatch.setattr(bot_module.quiz_service, "get_rank", lambda user_id, period="all": 1)
+    monkeypatch.setattr(bot_module.quiz_service, "get_score", lambda user_id, period="all": 5)
     await bot_module.ranking_command(ctx)
     assert ctx.sent[-1]["embed"] is not None
     assert "user_test" in ctx.sent[-1]["embed"].fields[0].value
+    assert ctx.sent[-1]["embed"].footer.text == "Sua posição: #1 (5 pontos)"
+
+@pytest.mark.asyncio
+async def test_ranking_command_periods(monkeypatch):
+    ctx = DummyCtx()
+    periods = []
+    def fake_get_ranking(period="all", limit=None):
+        periods.append((period, limit))
+        return [("user2", 3)]
+    monkeypatch.setattr(bot_module.quiz_service, "get_ranking", fake_get_ranking)
+    monkeypatch.setattr(bot_module.quiz_service, "get_rank", lambda user_id, period="all": None)
+    await bot_module.ranking_command(ctx, "semana")
+    assert periods == [("weekly", 10)]
+    assert ctx.sent[-1]["embed"].title == "🏆 Ranking Quiz da Semana"
+    assert ctx.sent[-1]["embed"].footer.text is None
+    await bot_module.ranking_command(ctx, "mes")
+    assert "Período inválido" in ctx.sent[-1]["content"]
 
 @pytest.mark.asyncio
 async def test_ranking_command_no_participantes(monkeypatch):
     ctx = DummyCtx()
-    def fake_get_ranking():
+    def fake_get_ranking(period="all", limit=None):
         return []
     monkeypatch.setattr(bot_module.quiz_service, "get_ranking", fake_get_ranking)
     await bot_module.ranking_command(ctx)
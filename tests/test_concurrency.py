@@ -0,0 +1,91 @@
+import asyncio
+
+import pytest
+
+from bobot.services.concurrency import AdaptiveLimit
+from bobot.services.metrics import metrics
+from bobot.services.queue import AsyncTaskQueue
+
+
+def test_aimd_grows_when_busy_and_backs_off_on_errors():
+    limit = AdaptiveLimit(initial=2, min_limit=1, max_limit=4)
+    for _ in range(2):
+        limit.on_sample(1.0, ok=True, inflight=2)
+    assert limit.limit == 2
+    limit.on_sample(1.0, ok=True, inflight=2)
+    assert limit.limit == 3
+    assert metrics.gauges["queue.concurrency_limit"] == 3
+
+    limit.on_sample(1.0, ok=True, inflight=0)
+    assert limit.limit == 3
+
+    limit.on_sample(1.0, ok=False, inflight=3)
+    assert limit.limit == 2
+    for _ in range(20):
+        limit.on_sample(9.0, ok=False, inflight=1)
+    assert limit.limit == 1
+
+    for _ in range(50):
+        limit.on_sample(1.0, ok=True, inflight=4)
+    assert limit.limit == 4
+
+
+def test_isolated_long_answers_do_not_collapse_the_limit():
+    limit = AdaptiveLimit(initial=4, max_limit=4)
+    for _ in range(50):
+        limit.on_sample(1.0, ok=True, inflight=4)
+    for _ in range(100):
+        limit.on_sample(1.0, ok=True, inflight=4)
+        limit.on_sample(8.0, ok=True, inflight=4)
+    assert limit.limit == 4
+
+
+def test_sustained_slowdown_backs_off_and_baseline_catches_up():
+    limit = AdaptiveLimit(initial=4, max_limit=4, window=20, short_window=2)
+    for _ in range(20):
+        limit.on_sample(1.0, ok=True, inflight=4)
+    limit.on_sample(5.0, ok=True, inflight=4)
+    limit.on_sample(5.0, ok=True, inflight=4)
+    assert limit.limit == 3
+    for _ in range(200):
+        limit.on_sample(5.0, ok=True, inflight=4)
+    assert limit._baseline == pytest.approx(5.0)
+    assert limit.limit == 4
+
+
+@pytest.mark.asyncio
+async def test_queue_runs_only_as_many_jobs_as_the_limit_allows():
+    limiter = AdaptiveLimit(initial=1, max_limit=3)
+    queue = AsyncTaskQueue(limiter=limiter)
+    gate = asyncio.Event()
+    active = 0
+
+    async def job():
+        nonlocal active
+        active += 1
+        await gate.wait()
+        active -= 1
+
+    jobs = [asyncio.ensure_future(queue.submit(job)) for _ in range(3)]
+    await asyncio.sleep(0.01)
+    assert (active, len(queue)) == (1, 2)
+
+    limiter._limit = 3.0
+    gate.set()
+    await asyncio.gather(*jobs)
+    gate.clear()
+    jobs = [asyncio.ensure_future(queue.submit(job)) for _ in range(3)]
+    await asyncio.sleep(0.01)
+    assert (active, len(queue)) == (queue.concurrency, 0) == (3, 0)
+    gate.set()
+    await asyncio.gather(*jobs)
+
+
+def test_build_concurrency_limit(monkeypatch):
+    from bobot.ai import factory
+
+    assert factory.build_concurrency_limit() is None
+    monkeypatch.setattr(factory, "LLM_ADAPTIVE_CONCURRENCY", True)
+    limit = factory.build_concurrency_limit()
+    assert limit.limit == factory.LLM_MAX_CONCURRENCY
+    assert limit.max_limit == factory.LLM_CONCURRENCY_MAX
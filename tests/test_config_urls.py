@@ -30,6 +30,19 @@ def test_config_reload(monkeypatch):
     assert config.BOT_TOKEN == "reload-token"
     assert config.ID_CANAL == "456"
     assert config.LLM_PROVIDER
+    assert config.ALLOWED_CHANNELS["docs"] == frozenset({456})
+    assert config.ALLOWED_CHANNELS["llm"] == frozenset()
+
+
+def test_allowlists_are_parsed_per_group(monkeypatch):
+    monkeypatch.setenv("ALLOWED_CHANNELS_LLM", "1, 2,,3")
+    monkeypatch.setenv("ALLOWED_GUILDS_QUIZ", "77")
+    import bobot.config as config
+
+    config = importlib.reload(config)
+    assert config.ALLOWED_CHANNELS["llm"] == frozenset({1, 2, 3})
+    assert config.ALLOWED_GUILDS["quiz"] == frozenset({77})
+    assert config.ALLOWED_GUILDS["docs"] == frozenset()
 
 
 def test_load_dotenv_success(monkeypatch):
@@ -0,0 +1,151 @@
+import asyncio
+from types import SimpleNamespace
+
+import discord
+import pytest
+
+from bobot.adapters import discord_dispatch
+from bobot.adapters.discord_dispatch import OutboundDispatcher, _retry_after
+from bobot.services.metrics import metrics
+from bobot.services.rate_limit import RateLimit, RateLimiter
+
+from conftest import FakeClock
+
+_real_sleep = asyncio.sleep
+
+
+class Channel:
+    def __init__(self, clock=None, failures=()):
+        self.sent = []
+        self.clock = clock
+        self.failures = list(failures)
+
+    async def send(self, content=None, **kwargs):
+        await _real_sleep(0)
+        if self.failures:
+            raise self.failures.pop(0)
+        self.sent.append((content, kwargs, self.clock() if self.clock else None))
+        return f"msg{len(self.sent)}"
+
+
+def http_error(status, retry_after=None, headers=None):
+    response = SimpleNamespace(status=status, reason="x", headers=headers or {})
+    exc = discord.HTTPException(response, "falhou")
+    if retry_after is not None:
+        exc.retry_after = retry_after
+    return exc
+
+
+@pytest.fixture
+def fake_sleep(monkeypatch):
+    clock = FakeClock()
+    sleeps = []
+
+    async def sleep(delay):
+        sleeps.append(delay)
+        clock.now += delay
+        await _real_sleep(0)
+
+    monkeypatch.setattr(discord_dispatch.asyncio, "sleep", sleep)
+    return clock, sleeps
+
+
+@pytest.mark.asyncio
+async def test_sends_in_order_and_paces_by_channel_bucket(fake_sleep):
+    clock, sleeps = fake_sleep
+    metrics.reset()
+    limiter = RateLimiter(RateLimit(2, 2), clock=clock)
+    dispatcher = OutboundDispatcher(limiter, clock=clock)
+    channel, other = Channel(clock), Channel(clock)
+
+    results = await asyncio.gather(
+        *(dispatcher.send("1", channel.send, f"m{i}") for i in range(4)),
+        dispatcher.send("2", other.send, "outro"),
+    )
+
+    assert results == ["msg1", "msg2", "msg3", "msg4", "msg1"]
+    assert [content for content, _, _ in channel.sent] == ["m0", "m1", "m2", "m3"]
+    assert [at for _, _, at in channel.sent] == [0.0, 0.0, 1.0, 2.0]
+    assert other.sent[0][2] == 0.0
+    assert sleeps == [1.0, 1.0]
+    assert metrics.counters["discord.throttled"] == 2
+    assert metrics.summary("discord.send_wait").samples[-1] == pytest.approx(2.0)
+    assert len(metrics.summary("discord.send_latency").samples) == 5
+    assert dispatcher.pending("1") == 0
+
+
+@pytest.mark.asyncio
+async def test_merges_adjacent_small_messages_within_limit():
+    metrics.reset()
+    dispatcher = OutboundDispatcher(merge_limit=9)
+    channel = Channel()
+
+    results = await asyncio.gather(
+        dispatcher.send("1", channel.send, "a", merge=True),
+        dispatcher.send("1", channel.send, "bb", merge=True),
+        dispatcher.send("1", channel.send, "ccc", merge=True),
+        dispatcher.send("1", channel.send, "dddd", merge=True),
+        dispatcher.send("1", channel.send, "e"),
+        dispatcher.send("1", channel.send, "f", merge=True),
+        dispatcher.send("1", channel.send, "g", merge=True, embed="x"),
+    )
+
+    assert [content for content, _, _ in channel.sent] == ["a\nbb\nccc", "dddd", "e", "f", "g"]
+    assert channel.sent[-1][1] == {"embed": "x"}
+    assert results == ["msg1", "msg1", "msg1", "msg2", "msg3", "msg4", "msg5"]
+    assert metrics.counters["discord.merged"] == 2
+
+
+@pytest.mark.asyncio
+async def test_retries_429_then_gives_up(fake_sleep):
+    _, sleeps = fake_sleep
+    metrics.reset()
+    dispatcher = OutboundDispatcher(max_retries=2)
+    channel = Channel(failures=[http_error(429, retry_after=1.5), http_error(429)])
+    assert await dispatcher.send("1", channel.send, "oi") == "msg1"
+    assert sleeps == [1.5, 1.0]
+    assert metrics.counters["discord.429"] == 2
+
+    channel.failures = [http_error(429, retry_after=0)] * 3
+    with pytest.raises(discord.HTTPException):
+        await dispatcher.send("1", channel.send, "oi")
+    assert metrics.counters["discord.429"] == 5
+
+
+@pytest.mark.asyncio
+async def test_errors_reach_every_merged_caller():
+    dispatcher = OutboundDispatcher()
+    channel = Channel(failures=[http_error(403), RuntimeError("caiu")])
+
+    with pytest.raises(discord.HTTPException):
+        await dispatcher.send("1", channel.send, "oi")
+    results = await asyncio.gather(
+        dispatcher.send("1", channel.send, "a", merge=True),
+        dispatcher.send("1", channel.send, "b", merge=True),
+        return_exceptions=True,
+    )
+    assert [type(result) for result in results] == [RuntimeError, RuntimeError]
+
+
+@pytest.mark.asyncio
+async def test_cancelled_sends_are_skipped_and_drain_waits():
+    dispatcher = OutboundDispatcher()
+    channel = Channel()
+    first = asyncio.create_task(dispatcher.send("1", channel.send, "a"))
+    doomed = asyncio.create_task(dispatcher.send("1", channel.send, "b"))
+    last = asyncio.create_task(dispatcher.send("1", channel.send, "c"))
+    await _real_sleep(0)
+    assert dispatcher.pending("1") == 3
+    doomed.cancel()
+
+    await dispatcher.drain()
+    await dispatcher.drain()
+    assert [content for content, _, _ in channel.sent] == ["a", "c"]
+    assert first.result() == "msg1" and last.result() == "msg2"
+
+
+def test_retry_after_reads_header_or_defaults():
+    assert _retry_after(http_error(429, retry_after=2.5)) == 2.5
+    assert _retry_after(http_error(429, headers={"Retry-After": "3"})) == 3.0
+    assert _retry_after(http_error(429, headers={"Retry-After": "x"})) == 1.0
+    assert _retry_after(http_error(429, retry_after=-1)) == 0.0
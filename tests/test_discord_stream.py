@@ -0,0 +1,110 @@
+import pytest
+
+from bobot.adapters.discord_stream import ProgressiveReply
+from bobot.services.metrics import metrics
+
+from conftest import FakeClock
+
+
+@pytest.mark.asyncio
+async def test_first_token_is_sent_immediately_and_edits_are_throttled(allowed_ctx):
+    clock = FakeClock()
+    metrics.reset()
+    reply = ProgressiveReply(allowed_ctx, header="**T**\n\n", edit_interval=1.0, clock=clock)
+
+    clock.now = 0.3
+    await reply.feed("a")
+    assert allowed_ctx.sent[-1]["content"] == "**T**\n\na"
+    assert metrics.summary("discord.time_to_first_token").samples[-1] == pytest.approx(0.3)
+
+    clock.now = 0.5
+    await reply.feed("b")
+    assert allowed_ctx.sent[-1]["content"] == "**T**\n\na"
+
+    clock.now = 1.6
+    await reply.feed("c")
+    assert allowed_ctx.sent[-1]["content"] == "**T**\n\nabc"
+
+    await reply.feed("d")
+    await reply.finish()
+    assert allowed_ctx.sent[-1]["content"] == "**T**\n\nabcd"
+    assert len(allowed_ctx.sent) == 1
+    assert reply.messages[0].edits == 2
+
+    await reply.finish()
+    assert reply.messages[0].edits == 2
+
+
+@pytest.mark.asyncio
+async def test_spills_into_new_messages(allowed_ctx):
+    clock = FakeClock()
+    reply = ProgressiveReply(allowed_ctx, max_size=10, edit_interval=5.0, clock=clock)
+
+    await reply.feed("linha1\nlinha2")
+    assert [item["content"] for item in allowed_ctx.sent] == ["linha1", "linha2"]
+
+    await reply.feed("x" * 12)
+    await reply.finish()
+    contents = [item["content"] for item in allowed_ctx.sent]
+    assert contents == ["linha1", "linha2xxxx", "xxxxxxxx"]
+
+
+@pytest.mark.asyncio
+async def test_spill_on_exact_boundary_and_empty_finish(allowed_ctx):
+    reply = ProgressiveReply(allowed_ctx, max_size=4, clock=FakeClock())
+    await reply.feed("abcd\n\n")
+    await reply.finish()
+    assert [item["content"] for item in allowed_ctx.sent] == ["abcd"]
+
+    empty = ProgressiveReply(allowed_ctx, clock=FakeClock())
+    await empty.finish()
+    assert len(allowed_ctx.sent) == 1
+
+
+@pytest.mark.asyncio
+async def test_spill_keeps_code_blocks_formatted(allowed_ctx):
+    reply = ProgressiveReply(allowed_ctx, max_size=30, clock=FakeClock())
+    await reply.feed("```py\nprint(1)\nprint(2)\nprint(3)\nprint(4)\n```")
+    await reply.finish()
+    contents = [item["content"] for item in allowed_ctx.sent]
+    assert contents[0].endswith("\n```")
+    assert contents[1].startswith("```py\n")
+    assert all(content.count("```") == 2 for content in contents)
+
+
+@pytest.mark.asyncio
+async def test_long_answer_goes_to_attachment(allowed_ctx):
+    metrics.reset()
+    reply = ProgressiveReply(allowed_ctx, header="**T**\n\n", max_size=60, attach_after=100, clock=FakeClock())
+    for index in range(20):
+        await reply.feed(f"linha {index}\n")
+    await reply.finish()
+    await reply.finish()
+    assert len(allowed_ctx.sent) == 3
+    assert "anexo" in allowed_ctx.sent[1]["content"]
+    attachment = allowed_ctx.sent[2]["file"]
+    assert attachment.filename == "resposta.md"
+    body = attachment.fp.read().decode("utf-8")
+    assert body.startswith("**T**\n\nlinha 0\n") and body.endswith("linha 19\n")
+    assert metrics.counters["discord.attachments"] == 1
+
+
+def test_pack_embeds_fills_messages():
+    from bobot.adapters.discord_stream import pack_embeds
+
+    assert pack_embeds(["a" * 4096, "b" * 1904, "c" * 10]) == [["a" * 4096, "b" * 1904], ["c" * 10]]
+    assert len(pack_embeds(["x"] * 11)) == 2
+
+
+@pytest.mark.asyncio
+async def test_send_long_uses_fewest_calls(allowed_ctx):
+    from bobot.adapters.discord_stream import send_long
+
+    assert await send_long(allowed_ctx, "curto") == 1
+    assert allowed_ctx.sent[-1]["content"] == "curto"
+    text = "\n\n".join("p" * 900 for _ in range(9))
+    assert await send_long(allowed_ctx, text) == 2
+    assert sum(len(embed.description) for embed in allowed_ctx.sent[-2]["embeds"]) <= 6000
+    assert await send_long(allowed_ctx, text, attach_after=5000) == 1
+    assert allowed_ctx.sent[-1]["file"].filename == "resposta.md"
+    assert len(allowed_ctx.sent[-1]["content"]) <= 2000
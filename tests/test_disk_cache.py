@@ -0,0 +1,203 @@
+import asyncio
+import sqlite3
+import time
+from dataclasses import dataclass
+
+import pytest
+
+from bobot.ai.factory import build_persistent_cache, build_settings, cache_namespace
+from bobot.ai.runtime import LLMService
+from bobot.services.cache import InMemoryCache
+from bobot.services.disk_cache import PersistentCache
+from bobot.services.queue import AsyncTaskQueue
+from bobot.services.rate_limit import RateLimit, RateLimiter
+
+from conftest import CommitFails, FakeClock
+
+
+@pytest.mark.asyncio
+async def test_put_is_buffered_then_flushed_and_survives_reopen(tmp_path):
+    path = str(tmp_path / "cache.db")
+    cache = PersistentCache(path, namespace="ollama:m:v1", flush_interval=60)
+    cache.put("prompt", "resposta")
+    assert await cache.get("prompt") == "resposta"
+    await cache.aclose()
+
+    reopened = PersistentCache(path, namespace="ollama:m:v1")
+    assert await reopened.get("prompt") == "resposta"
+    other_model = PersistentCache(path, namespace="ollama:outro:v1")
+    assert await other_model.get("prompt") is None
+    await reopened.aclose()
+    await other_model.aclose()
+
+
+@pytest.mark.asyncio
+async def test_batch_size_wakes_flusher(tmp_path):
+    cache = PersistentCache(str(tmp_path / "c.db"), namespace="n", batch_size=2, flush_interval=60)
+    cache.put("a", "1")
+    cache.put("b", "2")
+    for _ in range(50):
+        await asyncio.sleep(0.01)
+        if not cache._pending:
+            break
+    assert cache._pending == {}
+    assert cache._read(cache._hash("a")) == "1"
+    await cache.aclose()
+
+
+@pytest.mark.asyncio
+async def test_flusher_interval_logs_errors_and_compacts(tmp_path, caplog):
+    clock = FakeClock(1000.0)
+    cache = PersistentCache(
+        str(tmp_path / "c.db"),
+        namespace="n",
+        flush_interval=0.01,
+        compact_interval=10,
+        clock=clock,
+    )
+    cache.put("old", "x", ttl_seconds=5)
+    await asyncio.sleep(0.05)
+    assert cache._read(cache._hash("old")) == "x"
+
+    clock.now += 20
+    cache.put("new", "y")
+    await asyncio.sleep(0.05)
+    assert cache._read(cache._hash("old")) is None
+    assert cache._last_compact == clock.now
+
+    def broken(_batch):
+        raise RuntimeError("disco cheio")
+
+    cache._write = broken
+    cache.put("z", "z")
+    await asyncio.sleep(0.05)
+    assert "Falha ao gravar cache persistente" in caplog.text
+    del cache._write
+    await cache.aclose()
+
+
+@pytest.mark.asyncio
+async def test_failed_write_rolls_back_and_requeues(tmp_path):
+    cache = PersistentCache(str(tmp_path / "c.db"), namespace="n", flush_interval=60)
+    cache.put("a", "1")
+    cache.put("b", None)
+    with pytest.raises(sqlite3.IntegrityError):
+        await cache.flush()
+    assert not cache._conn.in_transaction
+    assert cache._read(cache._hash("a")) is None
+    assert await cache.get("a") == "1"
+
+    cache.put("b", "2")
+    await cache.flush()
+    assert cache._pending == {}
+    assert cache._read(cache._hash("a")) == "1"
+    assert cache._read(cache._hash("b")) == "2"
+    await cache.aclose()
+
+
+@pytest.mark.asyncio
+async def test_failed_commit_rolls_back_so_later_batches_still_persist(tmp_path):
+    cache = PersistentCache(str(tmp_path / "c.db"), namespace="n", flush_interval=60)
+    real = cache._conn
+    for rolled_back in (False, True):
+        cache._conn = CommitFails(real, rolled_back)
+        cache.put("a", "1")
+        with pytest.raises(sqlite3.OperationalError):
+            await cache.flush()
+        assert not real.in_transaction
+    cache._conn = real
+    await cache.flush()
+    assert cache._read(cache._hash("a")) == "1"
+    await cache.aclose()
+
+
+@pytest.mark.asyncio
+async def test_aclose_lets_an_in_flight_write_finish(tmp_path):
+    path = str(tmp_path / "c.db")
+    cache = PersistentCache(path, namespace="n", batch_size=1, flush_interval=60)
+    writes = []
+    real_write = cache._write
+
+    def slow_write(batch):
+        writes.append(len(batch))
+        time.sleep(0.05)
+        real_write(batch)
+
+    cache._write = slow_write
+    cache.put("a", "1")
+    await asyncio.sleep(0.01)
+    assert cache._writing
+    cache.put("b", "2")
+    await cache.aclose()
+    assert writes == [1, 1]
+    cache.put("c", "3")
+    assert cache._flusher is None
+
+    reopened = PersistentCache(path, namespace="n")
+    assert await reopened.get("a") == "1"
+    assert await reopened.get("b") == "2"
+    await reopened.aclose()
+
+
+@pytest.mark.asyncio
+async def test_compact_removes_expired(tmp_path):
+    clock = FakeClock(1000.0)
+    cache = PersistentCache(str(tmp_path / "c.db"), namespace="n", clock=clock)
+    cache.put("a", "1", ttl_seconds=1)
+    await cache.flush()
+    assert cache.compact() == 0
+    clock.now += 2
+    assert await cache.get("a") is None
+    assert cache.compact() == 1
+    await cache.flush()
+    await cache.aclose()
+
+
+def test_factory_builds_namespaced_cache(tmp_path):
+    settings = build_settings()
+    assert build_persistent_cache(settings) is None
+    settings.disk_cache_path = str(tmp_path / "f.db")
+    cache = build_persistent_cache(settings)
+    assert cache.namespace == cache_namespace(settings)
+    assert settings.model in cache.namespace
+
+
+@pytest.mark.asyncio
+async def test_llm_service_uses_disk_tier(tmp_path):
+    calls = []
+
+    @dataclass
+    class Provider:
+        name: str = "p"
+
+        async def generate(self, prompt: str) -> str:
+            calls.append(prompt)
+            return "gerado"
+
+    def make_service():
+        return LLMService(
+            providers=[Provider()],
+            cache=InMemoryCache(),
+            rate_limiter=RateLimiter(RateLimit(10, 60)),
+            queue=AsyncTaskQueue(concurrency=1),
+            persistent_cache=PersistentCache(str(tmp_path / "s.db"), namespace="n"),
+        )
+
+    service = make_service()
+    assert await service.generate("q", user_key="1") == "gerado"
+    await service.aclose()
+
+    restarted = make_service()
+    assert await restarted.generate("q", user_key="1") == "gerado"
+    assert restarted.cache.get("q") == "gerado"
+    assert await restarted.generate("nova", user_key="1") == "gerado"
+    assert calls == ["q", "nova"]
+    await restarted.aclose()
+
+    without_disk = LLMService(
+        providers=[Provider()],
+        cache=InMemoryCache(),
+        rate_limiter=RateLimiter(RateLimit(10, 60)),
+        queue=AsyncTaskQueue(concurrency=1),
+    )
+    await without_disk.aclose()
@@ -0,0 +1,164 @@
+import pytest
+
+from bobot.ai.prompts import build_ask_prompt, build_docs_prompt
+from bobot.services.docs_index import (
+    DocsIndex,
+    DocsRetriever,
+    Hit,
+    Passage,
+    Retrieval,
+    build_index,
+    iter_dump,
+    open_retriever,
+    split_passages,
+    split_tech,
+    tokenize,
+    write_index,
+)
+from bobot.services.metrics import metrics
+
+PASSAGES = [
+    Passage("python", "python/tutorial.txt", "List comprehension cria listas: [x * 2 for x in dados]."),
+    Passage("python", "python/asyncio.txt", "asyncio.gather() executa corrotinas em paralelo e espera todas."),
+    Passage("javascript", "javascript/array.html", "Array.prototype.map() cria um novo array com o resultado."),
+    Passage("css", "css/flex.md", "Flexbox organiza itens em linha ou coluna com display: flex."),
+    Passage("python", "python/dict.txt", "Dicionários guardam pares chave e valor; dict.get devolve padrão."),
+]
+
+
+@pytest.fixture
+def index_path(tmp_path):
+    path = str(tmp_path / "docs.bin")
+    write_index(path, PASSAGES)
+    return path
+
+
+def test_tokenize_keeps_code_tokens_and_their_parts():
+    assert tokenize("Como usar asyncio.gather()?") == ["asyncio.gather", "asyncio", "gather"]
+    assert tokenize("c# é legal") == ["c", "legal"]
+    assert tokenize("__init__ self") == ["init", "self"]
+    assert tokenize("x.y") == ["x.y"]
+
+
+def test_split_tech_recognises_aliases():
+    assert split_tech(" js  map ") == ("javascript", "map")
+    assert split_tech("C# linq") == ("csharp", "linq")
+    assert split_tech("python") == ("python", "")
+    assert split_tech("como fazer loop") == (None, "como fazer loop")
+
+
+def test_split_passages_merges_paragraphs_and_splits_long_ones():
+    text = "um dois\n\ntres\n\n\n" + " ".join(["w"] * 7) + "\n\nfim"
+    assert split_passages(text, max_words=3) == ["um dois\n\ntres", "w w w", "w w w", "w\n\nfim"]
+    assert split_passages("   ") == []
+
+
+def test_iter_dump_reads_tech_folders(tmp_path):
+    (tmp_path / "py" / "sub").mkdir(parents=True)
+    (tmp_path / "py" / "sub" / "a.md").write_text("Primeiro parágrafo.\n\nSegundo.", encoding="utf-8")
+    (tmp_path / "py" / "ignorado.png").write_bytes(b"\x89PNG")
+    (tmp_path / "js").mkdir()
+    (tmp_path / "js" / "map.html").write_text(
+        "<html><style>p {}</style><script>x()</script><p>Array &amp; map</p>\n\n<p>Fim</p></html>",
+        encoding="utf-8",
+    )
+    (tmp_path / "outros").mkdir()
+    (tmp_path / "outros" / "x.md").write_text("nada", encoding="utf-8")
+    (tmp_path / "css").write_text("arquivo, não pasta", encoding="utf-8")
+
+    passages = list(iter_dump(str(tmp_path)))
+    assert [(p.tech, p.source) for p in passages] == [
+        ("javascript", "js/map.html"),
+        ("python", "py/sub/a.md"),
+    ]
+    assert "Array & map" in passages[0].text
+    assert "x()" not in passages[0].text
+    assert passages[1].text == "Primeiro parágrafo.\n\nSegundo."
+
+
+def test_search_ranks_by_bm25_and_filters_by_tech(index_path):
+    index = DocsIndex.open(index_path)
+    assert len(index) == 5
+
+    hits = index.search("asyncio gather")
+    assert hits[0].source == "python/asyncio.txt"
+    assert hits[0].coverage == 1.0
+    assert hits[0].score > 0
+
+    hits = index.search("cria array", k=5)
+    assert [hit.source for hit in hits] == ["javascript/array.html", "python/tutorial.txt"]
+    assert hits[1].coverage == 0.5
+    assert [hit.source for hit in index.search("cria", k=1)] == ["python/tutorial.txt"]
+    assert [hit.tech for hit in index.search("cria", tech="javascript")] == ["javascript"]
+    assert index.search("cria", tech="mongodb") == []
+
+    assert index.search("inexistente zzz") == []
+    assert index.search("de a o") == []
+    index.close()
+
+
+def test_empty_index_returns_no_hits(tmp_path):
+    path = tmp_path / "vazio.bin"
+    path.write_bytes(build_index([]))
+    index = DocsIndex.open(str(path))
+    assert len(index) == 0
+    assert index.search("python") == []
+    index.close()
+
+
+def test_open_retriever_handles_missing_and_invalid_files(tmp_path, index_path, caplog):
+    assert open_retriever("") is None
+    assert open_retriever(str(tmp_path / "nao_existe.bin")) is None
+
+    valid = build_index(PASSAGES)
+    for name, content in [
+        ("vazio", b""),
+        ("curto", b"BOB"),
+        ("outro", b"X" * 200),
+        ("truncado", valid[: len(valid) - 10]),
+    ]:
+        path = tmp_path / name
+        path.write_bytes(content)
+        assert open_retriever(str(path)) is None
+    assert caplog.text.count("ilegível") == 4
+    assert "truncado ou corrompido" in caplog.text
+
+    retriever = open_retriever(index_path, k=2)
+    assert isinstance(retriever, DocsRetriever)
+    assert len(retriever.index) == 5
+    retriever.close()
+
+
+@pytest.mark.asyncio
+async def test_retriever_decides_when_to_answer_directly(index_path):
+    metrics.reset()
+    index = DocsIndex.open(index_path)
+
+    retrieval = await DocsRetriever(index, min_score=0.1, direct_score=1.0).lookup("asyncio gather", "python")
+    assert retrieval.confident
+    assert retrieval.hits[0].source == "python/asyncio.txt"
+
+    assert not (await DocsRetriever(index, min_score=0.1, direct_score=100).lookup("asyncio")).confident
+    partial = await DocsRetriever(index, min_score=0.1, direct_score=0.1).lookup("asyncio zzz")
+    assert partial.hits and not partial.confident
+    close = await DocsRetriever(index, min_score=0.1, direct_score=0.1, direct_margin=100).lookup("cria")
+    assert len(close.hits) == 2 and not close.confident
+
+    empty = await DocsRetriever(index, min_score=1000).lookup("asyncio")
+    assert empty == Retrieval([], False)
+    assert metrics.counters["docs.retrieval_misses"] == 1
+    assert metrics.counters["docs.retrieval_hits"] == 4
+    assert len(metrics.summary("docs.retrieval_latency").samples) == 5
+    index.close()
+
+
+def test_context_is_trimmed_and_injected_into_prompts():
+    retrieval = Retrieval([Hit("python", "a.txt", "x" * 10, 5.0, 1.0)])
+    context = retrieval.context(max_chars=4)
+    assert context == ["(a.txt) xxxx"]
+
+    ask = build_ask_prompt("o que é x?", context)
+    assert "Trechos da documentação local" in ask
+    assert "[1] (a.txt) xxxx" in ask
+    assert "Trechos" in build_docs_prompt("python x", context)
+    assert "Trechos" not in build_docs_prompt("python x")
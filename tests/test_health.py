@@ -0,0 +1,70 @@
+import asyncio
+import time
+from dataclasses import dataclass
+
+import pytest
+
+from bobot.ai.health import HealthProber, probe, probe_all
+from bobot.ai.routing import ProviderRouter
+
+
+@dataclass
+class Probed:
+    name: str
+    delay: float = 0.0
+    fail: bool = False
+    calls: int = 0
+
+    async def health(self) -> bool:
+        self.calls += 1
+        await asyncio.sleep(self.delay)
+        if self.fail:
+            raise RuntimeError("down")
+        return True
+
+
+@pytest.mark.asyncio
+async def test_probe_reports_latency_errors_and_timeouts():
+    ok = await probe(Probed("a"), timeout=1, clock=lambda: 42.0)
+    assert ok.ok and ok.latency is not None and ok.checked_at == 42.0
+
+    failed = await probe(Probed("b", fail=True), timeout=1)
+    assert not failed.ok and failed.latency is None and failed.error == "down"
+
+    slow = await probe(Probed("c", delay=5), timeout=0.01)
+    assert not slow.ok and slow.error == "timeout"
+
+
+@pytest.mark.asyncio
+async def test_probe_all_runs_concurrently():
+    providers = [Probed("a", delay=0.1), Probed("b", delay=0.1), Probed("c", delay=0.1)]
+    started = time.monotonic()
+    results = await probe_all(providers, timeout=1)
+    assert time.monotonic() - started < 0.25
+    assert list(results) == ["a", "b", "c"]
+    assert all(result.ok for result in results.values())
+
+
+@pytest.mark.asyncio
+async def test_prober_caches_snapshot_and_feeds_router():
+    up, down = Probed("up"), Probed("down", fail=True)
+    router = ProviderRouter()
+    prober = HealthProber([down, up], router=router, interval=0.01, timeout=1)
+    assert prober.snapshot() == {}
+
+    await prober.refresh()
+    assert prober.snapshot()["up"].ok
+    assert not prober.snapshot()["down"].ok
+    assert router.order([down, up]) == [up, down]
+
+    down.fail = False
+    prober.start()
+    prober.start()
+    while not router.stats("down").healthy:
+        await asyncio.sleep(0.01)
+    assert up.calls >= 2
+    await prober.stop()
+    await prober.stop()
+    calls = up.calls
+    await asyncio.sleep(0.03)
+    assert up.calls == calls
@@ -0,0 +1,139 @@
+from email.utils import formatdate
+import time
+
+import httpx
+import pytest
+
+from bobot.ai import http_client
+from bobot.ai.http_client import (
+    RetryBudget,
+    RetryPolicy,
+    configure_retries,
+    get_json,
+    post_json,
+    retry_cause,
+)
+from bobot.domain.exceptions import ExternalServiceError
+from bobot.services.metrics import metrics
+
+
+@pytest.fixture(autouse=True)
+def fast_retries():
+    metrics.reset()
+    configure_retries(RetryPolicy(base_delay=0, max_delay=2))
+    yield
+    configure_retries(RetryPolicy())
+
+
+def _serve(monkeypatch, *responses):
+    calls = []
+
+    def handler(request):
+        calls.append(request)
+        item = responses[min(len(calls), len(responses)) - 1]
+        if isinstance(item, Exception):
+            raise item
+        return item
+
+    client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    monkeypatch.setattr(http_client, "get_client", lambda url: client)
+    return calls
+
+
+def _status_error(status, headers=None):
+    request = httpx.Request("POST", "http://x")
+    response = httpx.Response(status, headers=headers, request=request)
+    return httpx.HTTPStatusError("erro", request=request, response=response)
+
+
+def test_retry_cause_classification():
+    request = httpx.Request("GET", "http://x")
+    assert retry_cause(httpx.ReadTimeout("t", request=request)) == "timeout"
+    assert retry_cause(httpx.ConnectError("c", request=request)) == "connection"
+    assert retry_cause(_status_error(429)) == "429"
+    assert retry_cause(_status_error(503)) == "5xx"
+    assert retry_cause(_status_error(404)) is None
+    assert retry_cause(ValueError("json")) is None
+
+
+@pytest.mark.asyncio
+async def test_retries_server_errors_then_succeeds(monkeypatch):
+    calls = _serve(monkeypatch, httpx.Response(503), httpx.Response(200, json={"ok": True}))
+    assert await post_json("http://x", {}, timeout=1) == {"ok": True}
+    assert len(calls) == 2
+    assert metrics.counters["http.retries.5xx"] == 1
+
+
+@pytest.mark.asyncio
+async def test_does_not_retry_client_errors_or_bad_json(monkeypatch):
+    calls = _serve(monkeypatch, httpx.Response(404))
+    with pytest.raises(ExternalServiceError):
+        await post_json("http://x", {}, timeout=1)
+    assert len(calls) == 1
+
+    calls = _serve(monkeypatch, httpx.Response(200, content=b"{quebrado"))
+    with pytest.raises(ExternalServiceError):
+        await get_json("http://x", timeout=1)
+    assert len(calls) == 1
+    assert not any(name.startswith("http.retries") for name in metrics.counters)
+
+
+@pytest.mark.asyncio
+async def test_timeouts_retry_until_attempts_run_out(monkeypatch):
+    calls = _serve(monkeypatch, httpx.ReadTimeout("lento"))
+    with pytest.raises(ExternalServiceError, match="health"):
+        await get_json("http://x", timeout=1, retries=2)
+    assert len(calls) == 3
+    assert metrics.counters["http.retries.timeout"] == 2
+
+
+@pytest.mark.asyncio
+async def test_retry_after_too_long_gives_up(monkeypatch):
+    calls = _serve(monkeypatch, httpx.Response(429, headers={"Retry-After": "60"}))
+    with pytest.raises(ExternalServiceError):
+        await post_json("http://x", {}, timeout=1)
+    assert len(calls) == 1
+    assert metrics.counters["http.retries.retry_after_too_long"] == 1
+
+    calls = _serve(
+        monkeypatch,
+        httpx.Response(429, headers={"Retry-After": "0"}),
+        httpx.Response(200, json={}),
+    )
+    assert await post_json("http://x", {}, timeout=1) == {}
+    assert metrics.counters["http.retries.429"] == 1
+
+
+def test_retry_after_header_formats():
+    assert http_client._retry_after(_status_error(429, {"Retry-After": "1.5"})) == 1.5
+    future = formatdate(time.time() + 30, usegmt=True)
+    delay = http_client._retry_after(_status_error(503, {"Retry-After": future}))
+    assert 25 < delay <= 30
+    assert http_client._retry_after(_status_error(503, {"Retry-After": "amanha"})) is None
+    assert http_client._retry_after(_status_error(503)) is None
+    assert http_client._retry_after(ValueError()) is None
+
+
+@pytest.mark.asyncio
+async def test_retry_budget_limits_retries_per_origin(monkeypatch):
+    configure_retries(RetryPolicy(base_delay=0, budget_capacity=1, budget_refill_per_second=0))
+    calls = _serve(monkeypatch, httpx.Response(502))
+    with pytest.raises(ExternalServiceError):
+        await post_json("http://x", {}, timeout=1, retries=5)
+    assert len(calls) == 2
+    assert metrics.counters["http.retries.budget_exhausted"] == 1
+
+
+def test_backoff_grows_with_jitter_and_budget_refills():
+    policy = RetryPolicy(base_delay=0.2, max_delay=1.0)
+    assert 0.1 <= policy.backoff(0) <= 0.2
+    assert 0.4 <= policy.backoff(2) <= 0.8
+    assert 0.5 <= policy.backoff(10) <= 1.0
+    assert policy.backoff(0, retry_after=0.7) == 0.7
+
+    now = [0.0]
+    budget = RetryBudget(capacity=1, refill_per_second=0.5, clock=lambda: now[0])
+    assert budget.try_acquire()
+    assert not budget.try_acquire()
+    now[0] = 2.0
+    assert budget.try_acquire()
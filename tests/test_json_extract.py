@@ -0,0 +1,26 @@
+import pytest
+
+from bobot.utils.json_extract import extract_json
+
+
+@pytest.mark.parametrize(
+    "text, expected",
+    [
+        ('{"a": 1}', {"a": 1}),
+        ('Claro! Aqui está:\n```json\n{"a": [1, 2]}\n```\nBoa sorte.', {"a": [1, 2]}),
+        ("```\n[1, 2]\n```", [1, 2]),
+        ('Resposta: {"texto": "chave } dentro \\" da string"} fim', {"texto": 'chave } dentro " da string'}),
+        ('{quebrado} depois {"ok": true}', {"ok": True}),
+        ('[{"a": 1}, {"b": 2}, {"c": ', [{"a": 1}, {"b": 2}]),
+        ('{"perguntas": [{"a": 1}, {"b": [2]}, {"c"', [{"a": 1}, {"b": [2]}]),
+        ("```json\n[{\"a\": 1}, {\"b\"", [{"a": 1}]),
+    ],
+)
+def test_extract_json_tolerates_model_noise(text, expected):
+    assert extract_json(text) == expected
+
+
+@pytest.mark.parametrize("text", ["", "sem json", "{]", '[{"a": 1x}, ', "[{'a': 1}]"])
+def test_extract_json_rejects_garbage(text):
+    with pytest.raises(ValueError):
+        extract_json(text)
@@ -0,0 +1,55 @@
+import random
+
+import pytest
+
+from bobot.services.leaderboard import Leaderboard, SkipList
+
+
+def test_skiplist_matches_sorted_reference():
+    rng = random.Random(7)
+    skiplist = SkipList(random.Random(1))
+    reference = []
+    for step in range(2000):
+        if reference and rng.random() < 0.4:
+            key = reference.pop(rng.randrange(len(reference)))
+            skiplist.remove(key)
+        else:
+            key = (-rng.randrange(50), f"u{step}")
+            skiplist.insert(key)
+            reference.append(key)
+        if step % 97 == 0:
+            reference.sort()
+            assert list(skiplist) == reference
+            for index in range(0, len(reference), 13):
+                assert skiplist.rank(reference[index]) == index
+    reference.sort()
+    assert list(skiplist) == reference
+    assert len(skiplist) == len(reference)
+
+
+def test_skiplist_remove_missing_key():
+    skiplist = SkipList()
+    skiplist.insert((-1, "a"))
+    with pytest.raises(KeyError):
+        skiplist.remove((-2, "a"))
+    with pytest.raises(KeyError):
+        skiplist.remove((0, "z"))
+
+
+def test_leaderboard_top_and_rank():
+    board = Leaderboard(random.Random(3))
+    board.add("ana", 2)
+    board.add("bia", 1)
+    board.add("caio", 0)
+    board.add("bia", 2)
+    assert board.top() == [("bia", 3), ("ana", 2), ("caio", 0)]
+    assert board.top(2) == [("bia", 3), ("ana", 2)]
+    assert board.rank("bia") == 1
+    assert board.rank("caio") == 3
+    assert board.rank("zeca") is None
+    assert board.score("ana") == 2
+    assert board.score("zeca") == 0
+    board.add("caio", 2)
+    # Empate em 2 pontos: ordem pelo id.
+    assert board.top() == [("bia", 3), ("ana", 2), ("caio", 2)]
+    assert len(board) == 3
@@ -17,7 +17,9 @@ from bobot.ai.prompts import (
 from bobot.ai.runtime import LLMService, provider_names
 from bobot.domain.exceptions import ExternalServiceError, RateLimitError
 from bobot.services.cache import InMemoryCache
+from bobot.services.metrics import metrics
 from bobot.services.queue import AsyncTaskQueue
+from bobot.services.quiz import BATCH_SCHEMA, QUESTION_SCHEMA
 from bobot.services.rate_limit import RateLimit, RateLimiter
 
 
@@ -40,12 +42,6 @@ class DummyClient:
         self._status_code = status_code
         self._fail = fail
 
-    async def __aenter__(self):
-        return self
-
-    async def __aexit__(self, exc_type, exc, tb):
-        return False
-
     async def post(self, *_args, **_kwargs):
         if self._fail:
             raise RuntimeError("boom")
@@ -55,7 +51,7 @@ class DummyClient:
 @pytest.mark.asyncio
 async def test_post_json_success(monkeypatch):
     monkeypatch.setattr(
-        "httpx.AsyncClient", lambda timeout: DummyClient({"ok": True})
+        "bobot.ai.http_client.get_client", lambda url: DummyClient({"ok": True})
     )
     result = await post_json("http://x", {"a": 1}, timeout=1)
     assert result["ok"] is True
@@ -64,7 +60,7 @@ async def test_post_json_success(monkeypatch):
 @pytest.mark.asyncio
 async def test_post_json_failure(monkeypatch):
     monkeypatch.setattr(
-        "httpx.AsyncClient", lambda timeout: DummyClient({}, fail=True)
+        "bobot.ai.http_client.get_client", lambda url: DummyClient({}, fail=True)
     )
     with pytest.raises(ExternalServiceError):
         await post_json("http://x", {"a": 1}, timeout=1, retries=1)
@@ -78,16 +74,10 @@ async def test_get_json_success(monkeypatch):
         def __init__(self, payload):
             self._payload = payload
 
-        async def __aenter__(self):
-            return self
-
-        async def __aexit__(self, exc_type, exc, tb):
-            return False
-
         async def get(self, *_args, **_kwargs):
             return DummyResponse(self._payload)
 
-    monkeypatch.setattr("httpx.AsyncClient", lambda timeout: DummyGetClient({"ok": True}))
+    monkeypatch.setattr("bobot.ai.http_client.get_client", lambda url: DummyGetClient({"ok": True}))
     result = await get_json("http://x", timeout=1)
     assert result["ok"] is True
 
@@ -97,20 +87,42 @@ async def test_get_json_failure(monkeypatch):
     from bobot.ai.http_client import get_json
 
     class DummyFailClient:
-        async def __aenter__(self):
-            return self
-
-        async def __aexit__(self, exc_type, exc, tb):
-            return False
-
         async def get(self, *_args, **_kwargs):
             raise RuntimeError("boom")
 
-    monkeypatch.setattr("httpx.AsyncClient", lambda timeout: DummyFailClient())
+    monkeypatch.setattr("bobot.ai.http_client.get_client", lambda url: DummyFailClient())
     with pytest.raises(ExternalServiceError):
         await get_json("http://x", timeout=1, retries=1)
 
 
+@pytest.mark.asyncio
+async def test_client_pool_reuses_client_per_origin():
+    from bobot.ai.http_client import HTTPClientPool, PoolLimits
+
+    pool = HTTPClientPool()
+    pool.configure(PoolLimits(max_connections=4, max_keepalive=2, keepalive_expiry=5))
+    first = pool.get("http://localhost:11434/api/generate")
+    assert pool.get("http://localhost:11434/api/tags") is first
+    other = pool.get("http://localhost:1234/v1/models")
+    assert other is not first
+
+    await pool.aclose()
+    assert first.is_closed and other.is_closed
+    assert pool.get("http://localhost:11434/api/tags") is not first
+    await pool.aclose()
+
+
+@pytest.mark.asyncio
+async def test_module_pool_helpers():
+    from bobot.ai import http_client
+
+    http_client.configure_pool(http_client.PoolLimits())
+    client = http_client.get_client("http://localhost:9/x")
+    assert http_client.get_client("http://localhost:9/y") is client
+    await http_client.close_clients()
+    assert client.is_closed
+
+
 @pytest.mark.asyncio
 async def test_ollama_client(monkeypatch):
     async def fake_post(url, payload, timeout, retries=2):
@@ -180,6 +192,92 @@ async def test_gpt4all_client(monkeypatch):
     assert await client.health() is True
 
 
+@pytest.mark.asyncio
+@pytest.mark.parametrize(
+    "module, client_cls, reply",
+    [
+        ("ollama_client", OllamaClient, {"response": "{}"}),
+        ("lmstudio_client", LMStudioClient, {"choices": [{"message": {"content": "{}"}}]}),
+        ("gpt4all_client", GPT4AllClient, {"choices": [{"message": {"content": "{}"}}]}),
+    ],
+)
+async def test_clients_request_schema_constrained_output(monkeypatch, module, client_cls, reply):
+    payloads = []
+
+    async def fake_post(url, payload, timeout, retries=2):
+        payloads.append(payload)
+        return reply
+
+    monkeypatch.setattr(f"bobot.ai.{module}.post_json", fake_post)
+    schema = {"type": "object"}
+    assert await client_cls("http://x", "model", 1).generate("ping", schema=schema) == "{}"
+    if client_cls is OllamaClient:
+        assert payloads[0]["format"] == schema
+    else:
+        assert payloads[0]["response_format"]["json_schema"]["schema"] == schema
+
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize(
+    "module, client_cls",
+    [("lmstudio_client", LMStudioClient), ("gpt4all_client", GPT4AllClient)],
+)
+async def test_strict_clients_send_closed_quiz_schemas(monkeypatch, module, client_cls):
+    payloads = []
+
+    async def fake_post(url, payload, timeout, retries=2):
+        payloads.append(payload)
+        return {"choices": [{"message": {"content": "{}"}}]}
+
+    monkeypatch.setattr(f"bobot.ai.{module}.post_json", fake_post)
+    await client_cls("http://x", "model", 1).generate("ping", schema=BATCH_SCHEMA)
+    json_schema = payloads[0]["response_format"]["json_schema"]
+    assert json_schema["strict"] is True
+    # strict exige objetos fechados, inclusive o item aninhado
+    assert json_schema["schema"]["additionalProperties"] is False
+    item = json_schema["schema"]["properties"]["perguntas"]["items"]
+    assert item is QUESTION_SCHEMA
+    assert item["additionalProperties"] is False
+
+@pytest.mark.asyncio
+async def test_llm_service_passes_schema_and_keys_cache_by_it():
+    metrics.reset()
+    calls = []
+
+    class SchemaProvider:
+        name = "s"
+
+        async def generate(self, prompt, schema=None):
+            calls.append(schema)
+            return "json" if schema else "texto"
+
+    service = LLMService(
+        providers=[SchemaProvider()],
+        cache=InMemoryCache(),
+        rate_limiter=RateLimiter(RateLimit(10, 60)),
+        queue=AsyncTaskQueue(concurrency=1),
+    )
+    assert await service.generate("p", user_key="1") == "texto"
+    assert await service.generate("p", user_key="1", schema={"type": "object"}) == "json"
+    assert await service.generate("p", user_key="1", schema={"type": "object"}) == "json"
+    assert calls == [None, {"type": "object"}]
+
+    fresh = [
+        await service.generate("p", user_key="1", schema={"type": "object"}, use_cache=False)
+        for _ in range(2)
+    ]
+    assert fresh == ["json", "json"]
+    assert len(calls) == 4
+    assert metrics.counters["llm.cache.bypassed"] == 2
+    await service.generate("nova", user_key="1", use_cache=False)
+    assert service.cache.get("nova") is None
+
+    service.providers = []
+    with pytest.raises(ExternalServiceError):
+        await service.generate("p", user_key="1", use_cache=False)
+
+
 def test_prompt_builders():
     assert "Pergunta" in build_ask_prompt("teste")
     assert "Linguagem" in build_code_prompt("python", "api")
@@ -336,3 +434,233 @@ async def test_task_queue():
 
     result = await queue.submit(work)
     assert result == 42
+
+
+def _mock_client(handler):
+    import httpx
+
+    return httpx.AsyncClient(transport=httpx.MockTransport(handler))
+
+
+def _stream_handler(body: str, status_code: int = 200):
+    import httpx
+
+    def handler(request):
+        return httpx.Response(status_code, content=body.encode())
+
+    return handler
+
+
+@pytest.mark.asyncio
+async def test_ollama_stream_ndjson(monkeypatch):
+    body = (
+        '{"response": "Ol", "done": false}\n'
+        "\n"
+        '{"response": "á", "done": false}\n'
+        '{"response": "", "done": true}\n'
+    )
+    monkeypatch.setattr(
+        "bobot.ai.http_client.get_client", lambda url: _mock_client(_stream_handler(body))
+    )
+    client = OllamaClient("http://x", "model", 1)
+    assert [piece async for piece in client.stream("ping")] == ["Ol", "á"]
+
+    monkeypatch.setattr(
+        "bobot.ai.http_client.get_client",
+        lambda url: _mock_client(_stream_handler('{"done": true}\n')),
+    )
+    with pytest.raises(ExternalServiceError):
+        [piece async for piece in client.stream("ping")]
+
+    monkeypatch.setattr(
+        "bobot.ai.http_client.get_client",
+        lambda url: _mock_client(_stream_handler("not json\n")),
+    )
+    with pytest.raises(ExternalServiceError):
+        [piece async for piece in client.stream("ping")]
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("client_cls", [LMStudioClient, GPT4AllClient])
+async def test_openai_compatible_stream_sse(monkeypatch, client_cls):
+    body = (
+        ": keep-alive\n"
+        'data: {"choices": [{"delta": {"role": "assistant"}}]}\n\n'
+        'data: {"choices": [{"delta": {"content": "Oi"}}]}\n\n'
+        'data: {"choices": []}\n\n'
+        'data: {"choices": [{"delta": {"content": "!"}}]}\n\n'
+        "data: [DONE]\n\n"
+        'data: {"choices": [{"delta": {"content": "ignorado"}}]}\n\n'
+    )
+    monkeypatch.setattr(
+        "bobot.ai.http_client.get_client", lambda url: _mock_client(_stream_handler(body))
+    )
+    client = client_cls("http://x", "model", 1)
+    assert [piece async for piece in client.stream("ping")] == ["Oi", "!"]
+
+    for bad in ("data: [DONE]\n", "data: []\n", "data: {quebrado\n"):
+        monkeypatch.setattr(
+            "bobot.ai.http_client.get_client",
+            lambda url, bad=bad: _mock_client(_stream_handler(bad)),
+        )
+        with pytest.raises(ExternalServiceError):
+            [piece async for piece in client.stream("ping")]
+
+
+@pytest.mark.asyncio
+async def test_stream_lines_http_error(monkeypatch):
+    from bobot.ai.http_client import stream_lines
+
+    monkeypatch.setattr(
+        "bobot.ai.http_client.get_client",
+        lambda url: _mock_client(_stream_handler("erro", status_code=500)),
+    )
+    with pytest.raises(ExternalServiceError):
+        [line async for line in stream_lines("http://x", {}, timeout=1)]
+
+
+@dataclass
+class StreamingProvider:
+    name: str
+    pieces: tuple = ("a", "b")
+    fail_after: int | None = None
+
+    async def stream(self, prompt: str):
+        for index, piece in enumerate(self.pieces):
+            if self.fail_after is not None and index >= self.fail_after:
+                raise RuntimeError("quebrou")
+            yield piece
+        if self.fail_after is not None:
+            raise RuntimeError("quebrou")
+
+
+def _service(providers, limit=10):
+    return LLMService(
+        providers=providers,
+        cache=InMemoryCache(),
+        rate_limiter=RateLimiter(RateLimit(limit, 60)),
+        queue=AsyncTaskQueue(concurrency=1),
+        cache_ttl=5,
+    )
+
+
+@pytest.mark.asyncio
+async def test_llm_service_stream_fallback_and_cache():
+    service = _service([StreamingProvider("a", fail_after=0), StreamingProvider("b")])
+    assert [piece async for piece in service.stream("p", user_key="1")] == ["a", "b"]
+    assert service.cache.get("p") == "ab"
+    assert [piece async for piece in service.stream("p", user_key="1")] == ["ab"]
+
+
+@pytest.mark.asyncio
+async def test_llm_service_stream_failures():
+    service = _service([StreamingProvider("a", fail_after=1), StreamingProvider("b")])
+    received = []
+    with pytest.raises(ExternalServiceError, match="interrompido"):
+        async for piece in service.stream("p", user_key="1"):
+            received.append(piece)
+    assert received == ["a"]
+
+    service = _service([StreamingProvider("a", fail_after=0)])
+    with pytest.raises(ExternalServiceError, match="Todos"):
+        [piece async for piece in service.stream("p", user_key="1")]
+
+    service = _service([])
+    with pytest.raises(ExternalServiceError, match="Nenhum"):
+        [piece async for piece in service.stream("p", user_key="1")]
+
+
+@pytest.mark.asyncio
+async def test_llm_service_stream_consumer_stops_early():
+    service = _service([StreamingProvider("a", pieces=("x", "y", "z"))])
+    stream = service.stream("p", user_key="1")
+    assert await stream.__anext__() == "x"
+    await stream.aclose()
+
+
+@pytest.mark.asyncio
+async def test_llm_service_coalesces_identical_prompts():
+    from bobot.services.metrics import metrics
+
+    calls = []
+    release = asyncio.Event()
+
+    @dataclass
+    class SlowProvider:
+        name: str = "slow"
+
+        async def generate(self, prompt: str) -> str:
+            calls.append(prompt)
+            await release.wait()
+            return f"r:{prompt}"
+
+    metrics.reset()
+    service = _service([SlowProvider()])
+    waiters = [
+        asyncio.ensure_future(service.generate("p", user_key=str(i))) for i in range(3)
+    ]
+    await asyncio.sleep(0)
+    release.set()
+    assert await asyncio.gather(*waiters) == ["r:p"] * 3
+    assert calls == ["p"]
+    assert metrics.counters["llm.coalesced"] == 2
+    assert metrics.counters["llm.generations"] == 1
+    assert not service._inflight
+
+
+@pytest.mark.asyncio
+async def test_coalesced_waiters_share_failures():
+    @dataclass
+    class FailingProvider:
+        name: str = "down"
+
+        async def generate(self, prompt: str) -> str:
+            await asyncio.sleep(0)
+            raise RuntimeError("fail")
+
+    service = _service([FailingProvider()])
+    results = await asyncio.gather(
+        service.generate("p", user_key="1"),
+        service.generate("p", user_key="2"),
+        return_exceptions=True,
+    )
+    assert all(isinstance(item, ExternalServiceError) for item in results)
+
+
+@pytest.mark.asyncio
+async def test_stream_leader_is_shared_with_followers():
+    service = _service([StreamingProvider("a", pieces=("x", "y"))])
+    stream = service.stream("p", user_key="1")
+    assert await stream.__anext__() == "x"
+
+    async def collect():
+        return [piece async for piece in service.stream("p", user_key="3")]
+
+    follower = asyncio.ensure_future(service.generate("p", user_key="2"))
+    streamed_follower = asyncio.ensure_future(collect())
+    assert await stream.__anext__() == "y"
+    with pytest.raises(StopAsyncIteration):
+        await stream.__anext__()
+    assert await follower == "xy"
+    assert await streamed_follower == ["xy"]
+
+
+@pytest.mark.asyncio
+async def test_stream_leader_failures_propagate_to_followers():
+    service = _service([StreamingProvider("a", pieces=("x", "y", "z"))])
+    stream = service.stream("p", user_key="1")
+    await stream.__anext__()
+    follower = asyncio.ensure_future(service.generate("p", user_key="2"))
+    await asyncio.sleep(0)
+    await stream.aclose()
+    with pytest.raises(ExternalServiceError, match="cancelado"):
+        await follower
+
+    service = _service([StreamingProvider("a", fail_after=1)])
+    stream = service.stream("p", user_key="1")
+    await stream.__anext__()
+    follower = asyncio.ensure_future(service.generate("p", user_key="2"))
+    with pytest.raises(ExternalServiceError):
+        await stream.__anext__()
+    with pytest.raises(ExternalServiceError, match="interrompido"):
+        await follower
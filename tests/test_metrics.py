@@ -0,0 +1,27 @@
+from bobot.services.metrics import MetricsRegistry, Summary
+
+
+def test_registry_counters_gauges_and_summaries():
+    registry = MetricsRegistry()
+    registry.incr("a")
+    registry.incr("a", 2)
+    registry.set_gauge("g", 1.5)
+    for value in (1.0, 2.0, 3.0, 4.0):
+        registry.observe("lat", value)
+
+    assert registry.counters["a"] == 3
+    assert registry.gauges["g"] == 1.5
+    summary = registry.summary("lat")
+    assert summary.count == 4
+    assert summary.mean == 2.5
+    assert summary.quantile(0.5) == 3.0
+    assert summary.quantile(1.0) == 4.0
+
+    registry.reset()
+    assert registry.summary("lat").count == 0
+
+
+def test_empty_summary():
+    summary = Summary()
+    assert summary.mean == 0.0
+    assert summary.quantile(0.9) == 0.0
@@ -0,0 +1,274 @@
+import asyncio
+
+import pytest
+
+from bobot.domain.exceptions import OverloadedError
+from bobot.services.metrics import metrics
+from bobot.services.queue import AsyncTaskQueue, Priority, QueueEstimate, _settle
+
+from conftest import FakeClock
+
+
+async def _run_blocked(queue, submissions):
+    """Segura o único worker, enfileira ``submissions`` e devolve a ordem de execução."""
+    gate = asyncio.Event()
+    order = []
+
+    async def blocker():
+        await gate.wait()
+
+    def job(label):
+        async def run():
+            order.append(label)
+            return label
+
+        return run
+
+    first = asyncio.ensure_future(queue.submit(blocker, priority=Priority.INTERACTIVE))
+    await asyncio.sleep(0)
+    tasks = [
+        asyncio.ensure_future(queue.submit(job(label), **kwargs))
+        for label, kwargs in submissions
+    ]
+    await asyncio.sleep(0)
+    assert len(queue) == len(submissions)
+    gate.set()
+    await first
+    assert await asyncio.gather(*tasks) == [label for label, _ in submissions]
+    return order
+
+
+@pytest.mark.asyncio
+async def test_priority_classes_jump_ahead():
+    metrics.reset()
+    order = await _run_blocked(
+        AsyncTaskQueue(concurrency=1),
+        [
+            ("quiz", {"priority": Priority.BACKGROUND}),
+            ("codigo", {"priority": Priority.NORMAL}),
+            ("pergunta", {"priority": Priority.INTERACTIVE}),
+        ],
+    )
+    assert order == ["pergunta", "codigo", "quiz"]
+    assert metrics.summary("queue.wait.background").count == 1
+    assert metrics.gauges["queue.depth"] == 0
+
+
+@pytest.mark.asyncio
+async def test_fair_queuing_interleaves_users_by_weight():
+    spam = [(f"a{i}", {"key": "a"}) for i in range(4)]
+    order = await _run_blocked(AsyncTaskQueue(concurrency=1), spam + [("b0", {"key": "b"})])
+    assert order == ["a0", "b0", "a1", "a2", "a3"]
+
+    weighted = [(f"a{i}", {"key": "a", "weight": 2}) for i in range(4)]
+    weighted += [(f"b{i}", {"key": "b"}) for i in range(2)]
+    order = await _run_blocked(AsyncTaskQueue(concurrency=1), weighted)
+    assert order == ["a0", "a1", "b0", "a2", "a3", "b1"]
+
+
+@pytest.mark.asyncio
+async def test_late_arrival_does_not_inherit_old_credit():
+    queue = AsyncTaskQueue(concurrency=1)
+    await _run_blocked(queue, [(f"a{i}", {"key": "a"}) for i in range(3)])
+    order = await _run_blocked(queue, [("a3", {"key": "a"}), ("b0", {"key": "b"})])
+    assert order == ["a3", "b0"]
+
+
+@pytest.mark.asyncio
+async def test_errors_reach_the_caller():
+    queue = AsyncTaskQueue(concurrency=1)
+
+    async def boom():
+        raise RuntimeError("falhou")
+
+    with pytest.raises(RuntimeError, match="falhou"):
+        await queue.submit(boom)
+
+
+@pytest.mark.asyncio
+async def test_estimate_accounts_for_priority_fairness_and_service_time():
+    clock = FakeClock()
+    queue = AsyncTaskQueue(concurrency=1, initial_service_time=10, clock=clock)
+    assert queue.estimate() == QueueEstimate(position=1, wait=0.0)
+
+    gate = asyncio.Event()
+
+    async def blocker():
+        await gate.wait()
+
+    running = asyncio.ensure_future(queue.submit(blocker))
+    await asyncio.sleep(0)
+    waiting = [
+        asyncio.ensure_future(queue.submit(blocker, key="a")) for _ in range(3)
+    ]
+    await asyncio.sleep(0)
+    assert queue.estimate(key="a") == QueueEstimate(position=4, wait=40.0)
+    assert queue.estimate(key="b") == QueueEstimate(position=2, wait=20.0)
+    assert queue.estimate(Priority.INTERACTIVE) == QueueEstimate(position=1, wait=10.0)
+    assert queue.estimate(Priority.BACKGROUND).position == 4
+
+    clock.now = 5.0
+    gate.set()
+    await asyncio.gather(running, *waiting)
+    assert queue.estimate().wait == 0.0
+    assert metrics.summary("queue.service_time").count >= 4
+
+
+@pytest.mark.asyncio
+async def test_full_queue_and_long_waits_are_refused_early():
+    metrics.reset()
+    gate = asyncio.Event()
+
+    async def blocker():
+        await gate.wait()
+
+    queue = AsyncTaskQueue(concurrency=1, max_depth=1)
+    running = asyncio.ensure_future(queue.submit(blocker))
+    await asyncio.sleep(0)
+    queued = asyncio.ensure_future(queue.submit(blocker))
+    await asyncio.sleep(0)
+    with pytest.raises(OverloadedError) as info:
+        await queue.submit(blocker)
+    assert info.value.position == 2
+    assert metrics.counters["queue.rejected.full"] == 1
+    gate.set()
+    await asyncio.gather(running, queued)
+
+    gate.clear()
+    queue = AsyncTaskQueue(concurrency=1, max_wait=15, initial_service_time=10)
+    running = asyncio.ensure_future(queue.submit(blocker))
+    await asyncio.sleep(0)
+    queued = asyncio.ensure_future(queue.submit(blocker))
+    await asyncio.sleep(0)
+    with pytest.raises(OverloadedError, match="Espera") as info:
+        await queue.submit(blocker)
+    assert info.value.estimated_wait == 20.0
+    assert metrics.counters["queue.rejected.wait"] == 1
+    gate.set()
+    await asyncio.gather(running, queued)
+
+
+@pytest.mark.asyncio
+async def test_on_queued_reports_only_admitted_jobs():
+    gate = asyncio.Event()
+    seen = []
+
+    async def blocker():
+        await gate.wait()
+
+    queue = AsyncTaskQueue(concurrency=1, max_depth=1, initial_service_time=10)
+    running = asyncio.ensure_future(queue.submit(blocker, on_queued=seen.append))
+    await asyncio.sleep(0)
+    queued = asyncio.ensure_future(queue.submit(blocker, on_queued=seen.append))
+    await asyncio.sleep(0)
+    with pytest.raises(OverloadedError):
+        await queue.submit(blocker, on_queued=seen.append)
+    assert seen == [QueueEstimate(1, 0.0), QueueEstimate(1, 10.0)]
+    gate.set()
+    await asyncio.gather(running, queued)
+
+
+@pytest.mark.asyncio
+async def test_jobs_past_their_queue_deadline_are_dropped():
+    metrics.reset()
+    clock = FakeClock()
+    queue = AsyncTaskQueue(concurrency=1, max_wait=30, initial_service_time=1, clock=clock)
+    gate = asyncio.Event()
+    ran = []
+
+    async def blocker():
+        await gate.wait()
+
+    async def late():
+        ran.append(True)
+
+    running = asyncio.ensure_future(queue.submit(blocker))
+    await asyncio.sleep(0)
+    expired = asyncio.ensure_future(queue.submit(late))
+    await asyncio.sleep(0)
+    clock.now = 31
+    gate.set()
+    await running
+    with pytest.raises(OverloadedError, match="Tempo máximo"):
+        await expired
+    assert ran == []
+    assert metrics.counters["queue.expired"] == 1
+
+
+@pytest.mark.asyncio
+async def test_cancelled_waiters_leave_the_queue_or_abort_the_job():
+    metrics.reset()
+    queue = AsyncTaskQueue(concurrency=1)
+    started, gate = asyncio.Event(), asyncio.Event()
+    ran, aborted = [], []
+
+    async def running_job():
+        started.set()
+        try:
+            await gate.wait()
+        except asyncio.CancelledError:
+            aborted.append(True)
+            raise
+
+    async def queued_job():
+        ran.append(True)
+
+    running = asyncio.ensure_future(queue.submit(running_job))
+    await started.wait()
+    queued = asyncio.ensure_future(queue.submit(queued_job))
+    await asyncio.sleep(0)
+    assert len(queue) == 1
+
+    queued.cancel()
+    await asyncio.sleep(0)
+    assert len(queue) == 0
+    assert metrics.counters["queue.cancelled"] == 1
+
+    running.cancel()
+    await asyncio.sleep(0.01)
+    assert aborted == [True]
+    assert metrics.counters["queue.aborted"] == 1
+
+    assert await queue.submit(lambda: asyncio.sleep(0, result="ok")) == "ok"
+    assert ran == []
+
+
+@pytest.mark.asyncio
+async def test_job_timeout_is_enforced_by_the_queue():
+    metrics.reset()
+    queue = AsyncTaskQueue(concurrency=1, job_timeout=0.01)
+
+    async def hangs():
+        await asyncio.sleep(10)
+
+    with pytest.raises(asyncio.TimeoutError, match="Tempo limite"):
+        await queue.submit(hangs)
+    assert await queue.submit(lambda: asyncio.sleep(0.02, result="ok"), timeout=1) == "ok"
+    assert metrics.counters["queue.timeouts"] == 1
+
+
+@pytest.mark.asyncio
+async def test_idle_only_without_running_or_queued_jobs():
+    queue = AsyncTaskQueue(concurrency=1)
+    gate = asyncio.Event()
+    assert queue.idle
+
+    async def blocker():
+        await gate.wait()
+
+    running = asyncio.ensure_future(queue.submit(blocker))
+    await asyncio.sleep(0)
+    await asyncio.sleep(0)
+    assert not queue.idle
+    gate.set()
+    await running
+    assert queue.idle
+
+
+@pytest.mark.asyncio
+async def test_settle_ignores_futures_already_done():
+    future = asyncio.get_running_loop().create_future()
+    future.cancel()
+    _settle(future, result="tarde")
+    _settle(future, error=RuntimeError("tarde"))
+    assert future.cancelled()
@@ -3,7 +3,7 @@ import asyncio
 from bobot.services.quiz import QuizService, QuizQuestion
 
 class DummyLLM:
-    async def generate(self, prompt, user_key=None):
+    async def generate(self, prompt, user_key=None, priority=None, schema=None, use_cache=True):
         return '{"pergunta": "Qual a saída de print(1+1)?", "opcoes": ["1", "2", "3", "4"], "resposta_correta": 1}'
 
 @pytest.mark.asyncio
@@ -37,3 +37,151 @@ async def test_ranking():
     ranking = service.get_ranking()
     assert ranking[0][0] == user_id
     assert ranking[0][1] == 1
+
+
+class CountingLLM:
+    def __init__(self):
+        self.calls = 0
+
+    async def generate(self, prompt, user_key=None, priority=None, schema=None, use_cache=True):
+        self.calls += 1
+        await asyncio.sleep(0)
+        return (
+            '{"pergunta": "Pergunta %d?", "opcoes": ["a", "b", "c", "d"], "resposta_correta": 0}'
+            % self.calls
+        )
+
+
+@pytest.mark.asyncio
+async def test_one_generation_per_guild_per_day():
+    llm = CountingLLM()
+    service = QuizService(llm_service=llm)
+    quizzes = await asyncio.gather(
+        *(service.get_daily_quiz(f"u{n}", "g1") for n in range(5))
+    )
+    assert llm.calls == 1
+    assert all(quiz is quizzes[0] for quiz in quizzes)
+    other = await service.get_daily_quiz("u0", "g2")
+    assert llm.calls == 2
+    assert other is not quizzes[0]
+    assert service.session("g3") is None
+
+
+@pytest.mark.asyncio
+async def test_answers_reset_at_local_midnight():
+    from datetime import datetime
+
+    from bobot.services.quiz import resolve_timezone
+
+    tz = resolve_timezone("America/Sao_Paulo")
+    now = [datetime(2024, 5, 1, 23, 59, tzinfo=tz).timestamp()]
+    llm = CountingLLM()
+    service = QuizService(llm_service=llm, tz=tz, clock=lambda: now[0])
+    quiz = await service.get_daily_quiz("u1", "g")
+    service.submit_answer("u1", quiz, 0, "g")
+    assert service.has_answered("u1", "g")
+    assert await service.get_daily_quiz("u1", "g") is None
+    # 02:30 UTC ainda é dia 1 em São Paulo.
+    now[0] = datetime(2024, 5, 2, 2, 30, tzinfo=resolve_timezone("UTC")).timestamp()
+    assert await service.get_daily_quiz("u1", "g") is None
+    now[0] = datetime(2024, 5, 2, 0, 1, tzinfo=tz).timestamp()
+    assert not service.has_answered("u1", "g")
+    assert service.session("g") is None
+    fresh = await service.get_daily_quiz("u1", "g")
+    assert fresh.pergunta == "Pergunta 2?"
+    assert service.get_score("u1") == 1
+
+
+def test_resolve_timezone_falls_back_to_utc(caplog):
+    from datetime import timezone
+
+    from bobot.services.quiz import resolve_timezone
+
+    assert resolve_timezone("Nao/Existe") is timezone.utc
+    assert "usando UTC" in caplog.text
+
+
+@pytest.mark.asyncio
+async def test_failed_generation_is_not_cached():
+    class FlakyLLM:
+        calls = 0
+
+        async def generate(self, prompt, user_key=None, priority=None, schema=None, use_cache=True):
+            FlakyLLM.calls += 1
+            if FlakyLLM.calls == 1:
+                raise RuntimeError("offline")
+            return '{"pergunta": "P?", "opcoes": ["a", "b"], "resposta_correta": 0}'
+
+    service = QuizService(llm_service=FlakyLLM())
+    with pytest.raises(RuntimeError):
+        await service.get_daily_quiz("u1")
+    assert (await service.get_daily_quiz("u1")).pergunta == "P?"
+
+
+@pytest.mark.asyncio
+async def test_period_leaderboards_roll_over():
+    from datetime import datetime, timezone
+
+    now = [datetime(2024, 5, 1, 12, tzinfo=timezone.utc).timestamp()]  # quarta-feira
+    service = QuizService(llm_service=DummyLLM(), clock=lambda: now[0])
+    quiz = QuizQuestion("P?", ["a", "b"], 1)
+    service.submit_answer("ana", quiz, 1)
+    service.submit_answer("bia", quiz, 0)
+    assert service.get_ranking("daily") == [("ana", 1), ("bia", 0)]
+    now[0] = datetime(2024, 5, 2, 12, tzinfo=timezone.utc).timestamp()
+    service.submit_answer("bia", quiz, 1)
+    assert service.get_ranking("daily") == [("bia", 1)]
+    assert service.get_ranking("weekly") == [("ana", 1), ("bia", 1)]
+    assert service.get_rank("bia", "weekly") == 2
+    now[0] = datetime(2024, 5, 6, 12, tzinfo=timezone.utc).timestamp()  # segunda
+    assert service.get_ranking("weekly") == []
+    assert service.get_ranking(limit=1) == [("ana", 1)]
+    assert service.get_score("bia") == 1
+    with pytest.raises(ValueError):
+        service.get_ranking("mensal")
+
+
+class BatchLLM:
+    def __init__(self, response):
+        self.response = response
+        self.requests = []
+
+    async def generate(self, prompt, user_key=None, priority=None, schema=None, use_cache=True):
+        self.requests.append((prompt, user_key, schema, use_cache))
+        return self.response
+
+
+@pytest.mark.asyncio
+async def test_fetch_quizzes_batches_and_drops_invalid_items():
+    from bobot.services.metrics import metrics
+    from bobot.services.quiz import BATCH_SCHEMA
+
+    metrics.reset()
+    llm = BatchLLM(
+        "Aqui estão:\n```json\n"
+        '{"perguntas": ['
+        '{"pergunta": "A?", "opcoes": ["1", "2", "3", "4"], "resposta_correta": 0},'
+        '{"pergunta": "B?", "opcoes": ["1", "2", "3", "4"], "resposta_correta": 9},'
+        '{"pergunta": "C?", "opcoes": ["1", "2", "3", "4"], "resposta_correta": 3}'
+        "]}\n```"
+    )
+    service = QuizService(llm_service=llm)
+    quizzes = await service.fetch_quizzes(3)
+    assert [quiz.pergunta for quiz in quizzes] == ["A?", "C?"]
+    assert metrics.counters["quiz.invalid"] == 1
+    prompt, user_key, schema, use_cache = llm.requests[0]
+    assert "3 pergunta(s)" in prompt
+    assert user_key == "quiz"
+    assert schema is BATCH_SCHEMA
+    assert use_cache is False
+    assert len(await service.fetch_quizzes(1, user_key="quiz-pool")) == 1
+    assert llm.requests[1][1] == "quiz-pool"
+
+
+@pytest.mark.asyncio
+async def test_generate_quiz_reads_fenced_list_and_rejects_empty():
+    llm = BatchLLM('```\n[{"pergunta": "L?", "opcoes": ["a", "b"], "resposta_correta": 1}]\n```')
+    service = QuizService(llm_service=llm)
+    assert (await service.generate_quiz()).pergunta == "L?"
+    llm.response = '{"perguntas": []}'
+    assert (await service.generate_quiz()).pergunta == "O que faz o operador '==' em Python?"
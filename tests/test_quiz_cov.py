@@ -1,9 +1,10 @@
 import pytest
 import asyncio
+from bobot.domain.exceptions import RateLimitError
 from bobot.services.quiz import QuizService, QuizQuestion
 
 class DummyLLM:
-    async def generate(self, prompt, user_key=None):
+    async def generate(self, prompt, user_key=None, priority=None, schema=None, use_cache=True):
         if 'JSON' in prompt:
             return '{"pergunta": "Qual a saída de print(1+1)?", "opcoes": ["1", "2", "3", "4"], "resposta_correta": 1}'
         return 'erro'
@@ -11,7 +12,7 @@ class DummyLLM:
 @pytest.mark.asyncio
 async def test_generate_quiz_fallback():
     class FailingLLM:
-        async def generate(self, prompt, user_key=None):
+        async def generate(self, prompt, user_key=None, priority=None, schema=None, use_cache=True):
             return 'erro'
     service = QuizService(llm_service=FailingLLM())
     quiz = await service.generate_quiz()
@@ -19,18 +20,28 @@ async def test_generate_quiz_fallback():
     assert quiz.opcoes[0] == "Compara valores"
     assert quiz.resposta_correta == 0
 
+
+@pytest.mark.asyncio
+async def test_generate_quiz_fallback_when_rate_limited():
+    class LimitedLLM:
+        async def generate(self, prompt, user_key=None, priority=None, schema=None, use_cache=True):
+            raise RateLimitError("Limite atingido.")
+    service = QuizService(llm_service=LimitedLLM())
+    quiz = await service.generate_quiz()
+    assert quiz.pergunta == "O que faz o operador '==' em Python?"
+
 @pytest.mark.asyncio
 async def test_get_daily_quiz_return_existing():
     service = QuizService(llm_service=DummyLLM())
-    user_id = "userX"
-    quiz = QuizQuestion(pergunta="Q?", opcoes=["A", "B", "C", "D"], resposta_correta=2)
-    service._user_quiz[user_id] = quiz
-    result = await service.get_daily_quiz(user_id)
-    assert result == quiz
+    quiz = await service.get_daily_quiz("userX")
+    assert await service.get_daily_quiz("userZ") is quiz
+    assert service.session().question is quiz
 
 @pytest.mark.asyncio
 async def test_get_score():
     service = QuizService(llm_service=DummyLLM())
     user_id = "userY"
-    service._user_scores[user_id] = 7
-    assert service.get_score(user_id) == 7
+    quiz = QuizQuestion(pergunta="Q?", opcoes=["A", "B"], resposta_correta=0)
+    for answer in (0, 1, 0):
+        service.submit_answer(user_id, quiz, answer)
+    assert service.get_score(user_id) == 2
@@ -0,0 +1,177 @@
+import asyncio
+import json
+
+import pytest
+
+from bobot.services.metrics import metrics
+from bobot.services.quiz import QuizQuestion, QuizService, parse_quiz
+from bobot.services.quiz_pool import QuizPool
+
+
+def _quiz(n):
+    return QuizQuestion(pergunta=f"Pergunta {n}?", opcoes=["a", "b", "c", "d"], resposta_correta=n % 4)
+
+
+class Producer:
+    def __init__(self, items=None):
+        self.items = list(items if items is not None else [])
+        self.calls = 0
+
+    async def __call__(self):
+        self.calls += 1
+        item = self.items.pop(0) if self.items else _quiz(100 + self.calls)
+        if isinstance(item, Exception):
+            raise item
+        return item if isinstance(item, list) else [item]
+
+
+@pytest.fixture(autouse=True)
+def _reset_metrics():
+    metrics.reset()
+    yield
+    metrics.reset()
+
+
+@pytest.mark.parametrize(
+    "raw",
+    [
+        "não é json",
+        "[1, 2]",
+        '{"pergunta": " ", "opcoes": ["a", "b"], "resposta_correta": 0}',
+        '{"pergunta": "P?", "opcoes": ["a"], "resposta_correta": 0}',
+        '{"pergunta": "P?", "opcoes": ["a", ""], "resposta_correta": 0}',
+        '{"pergunta": "P?", "opcoes": ["a", "b"], "resposta_correta": 2}',
+        '{"pergunta": "P?", "opcoes": ["a", "b"], "resposta_correta": true}',
+    ],
+)
+def test_parse_quiz_rejects_invalid(raw):
+    with pytest.raises(ValueError):
+        parse_quiz(raw)
+
+
+def test_parse_quiz_accepts_valid():
+    quiz = parse_quiz('{"pergunta": "P?", "opcoes": ["a", "b"], "resposta_correta": 1}')
+    assert quiz == QuizQuestion("P?", ["a", "b"], 1)
+
+
+def test_take_serves_in_order_and_counts_misses():
+    pool = QuizPool(Producer(), low_water=1, high_water=3)
+    assert pool.add(_quiz(1))
+    assert not pool.add(_quiz(1))
+    assert pool.take() == _quiz(1)
+    assert pool.take() is None
+    assert metrics.counters["quiz.pool.hits"] == 1
+    assert metrics.counters["quiz.pool.misses"] == 1
+    assert len(pool) == 0
+
+
+@pytest.mark.asyncio
+async def test_fill_until_high_water_skipping_failures_and_duplicates():
+    producer = Producer([RuntimeError("offline"), _quiz(1), _quiz(1), _quiz(2)])
+    pool = QuizPool(producer, low_water=1, high_water=2, retry_delay=0)
+    await pool.fill()
+    assert [pool.take(), pool.take()] == [_quiz(1), _quiz(2)]
+    assert producer.calls == 4
+    assert metrics.counters["quiz.pool.failures"] == 1
+    assert metrics.counters["quiz.pool.duplicates"] == 1
+    assert metrics.counters["quiz.pool.generated"] == 2
+
+
+@pytest.mark.asyncio
+async def test_fill_takes_batches_up_to_high_water():
+    producer = Producer([[_quiz(1), _quiz(2)], [_quiz(2), _quiz(3), _quiz(4)]])
+    pool = QuizPool(producer, low_water=1, high_water=3, retry_delay=0)
+    await pool.fill()
+    assert producer.calls == 2
+    assert [pool.take() for _ in range(3)] == [_quiz(1), _quiz(2), _quiz(3)]
+    assert metrics.counters["quiz.pool.generated"] == 3
+    assert metrics.counters["quiz.pool.duplicates"] == 1
+
+
+@pytest.mark.asyncio
+async def test_fill_waits_for_idle_model():
+    checks = iter([False, False, True])
+    producer = Producer()
+    pool = QuizPool(producer, low_water=0, high_water=1, idle=lambda: next(checks), idle_poll=0)
+    await pool.fill()
+    assert producer.calls == 1
+
+
+@pytest.mark.asyncio
+async def test_background_refill_below_low_water(tmp_path):
+    path = tmp_path / "pool.json"
+    pool = QuizPool(Producer(), low_water=2, high_water=3, path=str(path))
+    pool.start()
+    for _ in range(20):
+        await asyncio.sleep(0.01)
+        if len(pool) == 3:
+            break
+    assert len(pool) == 3
+    pool.take()
+    await asyncio.sleep(0.02)
+    assert len(pool) == 2
+    pool.take()
+    for _ in range(20):
+        await asyncio.sleep(0.01)
+        if len(pool) == 3:
+            break
+    assert len(pool) == 3
+    await pool.stop()
+    await pool.stop()
+    saved = json.loads(path.read_text(encoding="utf-8"))
+    assert [entry["pergunta"] for entry in saved] == [quiz.pergunta for quiz in pool._items]
+
+
+@pytest.mark.asyncio
+async def test_persisted_pool_survives_restart(tmp_path):
+    path = tmp_path / "pool.json"
+    entries = [
+        {"pergunta": "Salva?", "opcoes": ["a", "b"], "resposta_correta": 0, "dificuldade": "normal"},
+        {"pergunta": "", "opcoes": ["a", "b"], "resposta_correta": 0},
+    ]
+    path.write_text(json.dumps(entries), encoding="utf-8")
+    producer = Producer()
+    pool = QuizPool(producer, low_water=1, high_water=2, path=str(path))
+    assert pool.load() == 1
+    assert pool.take().pergunta == "Salva?"
+    assert producer.calls == 0
+
+
+def test_load_ignores_missing_or_broken_file(tmp_path, caplog):
+    assert QuizPool(Producer()).load() == 0
+    assert QuizPool(Producer(), path=str(tmp_path / "nada.json")).load() == 0
+    broken = tmp_path / "broken.json"
+    broken.write_text("{", encoding="utf-8")
+    assert QuizPool(Producer(), path=str(broken)).load() == 0
+    assert "ilegível" in caplog.text
+    other = tmp_path / "other.json"
+    other.write_text('{"pergunta": "x"}', encoding="utf-8")
+    assert QuizPool(Producer(), path=str(other)).load() == 0
+
+
+@pytest.mark.asyncio
+async def test_save_failure_keeps_pool_dirty(tmp_path, caplog):
+    pool = QuizPool(Producer(), path=str(tmp_path / "missing" / "pool.json"))
+    pool.add(_quiz(1))
+    await pool.save()
+    assert "Falha ao gravar" in caplog.text
+    assert pool._dirty
+
+
+@pytest.mark.asyncio
+async def test_daily_quiz_served_from_pool_then_live():
+    class LLM:
+        calls = 0
+
+        async def generate(self, prompt, user_key=None, priority=None, schema=None, use_cache=True):
+            LLM.calls += 1
+            return '{"pergunta": "Ao vivo?", "opcoes": ["a", "b"], "resposta_correta": 0}'
+
+    service = QuizService(llm_service=LLM())
+    service.pool = QuizPool(service.fetch_quizzes, low_water=0, high_water=1)
+    service.pool.add(_quiz(1))
+    assert await service.get_daily_quiz("u1") == _quiz(1)
+    assert LLM.calls == 0
+    assert await service.get_daily_quiz("u2") == _quiz(1)
+    assert (await service.get_daily_quiz("u1", "outro")).pergunta == "Ao vivo?"
+    assert LLM.calls == 1
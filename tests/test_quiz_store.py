@@ -0,0 +1,149 @@
+import asyncio
+import sqlite3
+from datetime import datetime, timezone
+
+import pytest
+
+from bobot.services.quiz import QuizQuestion, QuizService
+from bobot.storage.in_memory import InMemoryQuizStore, QuizAnswerRecord, QuizSessionRecord
+from bobot.storage.sqlite import SQLiteQuizStore
+
+from conftest import CommitFails
+
+
+class DummyLLM:
+    async def generate(self, prompt, user_key=None, priority=None, schema=None, use_cache=True):
+        return '{"pergunta": "Persistida?", "opcoes": ["a", "b"], "resposta_correta": 1}'
+
+
+def _clock(day, hour=12):
+    return lambda: datetime(2024, 5, day, hour, tzinfo=timezone.utc).timestamp()
+
+
+@pytest.mark.asyncio
+async def test_sqlite_store_is_write_behind(tmp_path):
+    path = tmp_path / "quiz.db"
+    store = SQLiteQuizStore(str(path), flush_interval=60, batch_size=3)
+    store.record_answer(QuizAnswerRecord("u1", "g", "2024-05-01", 1, 1))
+    store.save_session(QuizSessionRecord("g", "2024-05-01", {"pergunta": "P?"}))
+    assert len(store) == 2
+    assert not path.exists()
+    store.record_answer(QuizAnswerRecord("u1", "g", "2024-05-02", 0, 0))
+    for _ in range(50):
+        await asyncio.sleep(0.01)
+        if not len(store):
+            break
+    assert len(store) == 0
+    store.record_answer(QuizAnswerRecord("u2", "g", "2024-05-02", 1, 1))
+    await store.aclose()
+    await store.aclose()
+
+    reopened = SQLiteQuizStore(str(path))
+    snapshot = await reopened.load("2024-05-02")
+    assert snapshot.scores == {"u1": 1, "u2": 1}
+    assert snapshot.sessions == []
+    assert [(a.user_id, a.day) for a in snapshot.answers] == [
+        ("u1", "2024-05-02"),
+        ("u2", "2024-05-02"),
+    ]
+    snapshot = await reopened.load("2024-05-01")
+    assert snapshot.sessions == [QuizSessionRecord("g", "2024-05-01", {"pergunta": "P?"})]
+    await reopened.aclose()
+
+
+@pytest.mark.asyncio
+async def test_sqlite_store_keeps_batch_when_write_fails(tmp_path, caplog):
+    store = SQLiteQuizStore(str(tmp_path / "missing" / "quiz.db"), flush_interval=0.01)
+    store.record_answer(QuizAnswerRecord("u1", "g", "2024-05-01", 1, 1))
+    await asyncio.sleep(0.05)
+    assert "Falha ao gravar o quiz" in caplog.text
+    assert len(store) == 1
+    store._path = str(tmp_path / "quiz.db")
+    await store.aclose()
+    assert len(store) == 0
+
+
+@pytest.mark.asyncio
+async def test_sqlite_write_rolls_back_on_error(tmp_path):
+    store = SQLiteQuizStore(str(tmp_path / "quiz.db"))
+    bad = QuizSessionRecord("g", "2024-05-01", {"pergunta": object()})
+    store.save_session(bad)
+    store.record_answer(QuizAnswerRecord("u1", "g", "2024-05-01", 1, 1))
+    with pytest.raises(TypeError):
+        await store.flush()
+    assert len(store) == 2
+    store._sessions.remove(bad)
+    await store.flush()
+    assert (await store.load("2024-05-01")).scores == {"u1": 1}
+    await store.aclose()
+
+
+@pytest.mark.asyncio
+async def test_sqlite_failed_commit_does_not_block_later_flushes(tmp_path):
+    store = SQLiteQuizStore(str(tmp_path / "quiz.db"))
+    real = store._connection()
+    for rolled_back in (False, True):
+        store._conn = CommitFails(real, rolled_back)
+        store.record_answer(QuizAnswerRecord("u1", "g", "2024-05-01", 1, 1))
+        with pytest.raises(sqlite3.OperationalError):
+            await store.flush()
+        assert not real.in_transaction
+    store._conn = real
+    await store.flush()
+    assert (await store.load("2024-05-01")).scores == {"u1": 1}
+    await store.aclose()
+
+
+@pytest.mark.asyncio
+async def test_sqlite_duplicate_answers_do_not_add_points(tmp_path):
+    store = SQLiteQuizStore(str(tmp_path / "quiz.db"))
+    store.record_answer(QuizAnswerRecord("u1", "g", "2024-05-01", 1, 1))
+    await store.flush()
+    store.record_answer(QuizAnswerRecord("u1", "g", "2024-05-01", 1, 1))
+    store.record_answer(QuizAnswerRecord("u1", "g", "2024-05-02", 1, 1))
+    store.record_answer(QuizAnswerRecord("u1", "g", "2024-05-02", 0, 0))
+    await store.flush()
+    snapshot = await store.load("2024-05-01")
+    assert snapshot.scores == {"u1": 2}
+    assert len(snapshot.answers) == 2
+    await store.aclose()
+
+
+@pytest.mark.asyncio
+async def test_restore_rebuilds_boards_and_todays_session(tmp_path):
+    path = str(tmp_path / "quiz.db")
+    # Quarta-feira: responde a um quiz antigo (segunda) e ao de hoje.
+    service = QuizService(DummyLLM(), clock=_clock(6), store=SQLiteQuizStore(path))
+    old = await service.get_daily_quiz("ana", "g")
+    service.submit_answer("ana", old, 1, "g")
+    service._clock = _clock(8)
+    today = await service.get_daily_quiz("ana", "g")
+    service.submit_answer("ana", today, 1, "g")
+    service.submit_answer("bia", today, 0, "g")
+    service._clock = _clock(1)
+    service.submit_answer("caio", old, 1, "g")  # semana anterior
+    await service.store.aclose()
+
+    restored = QuizService(DummyLLM(), clock=_clock(8), store=SQLiteQuizStore(path))
+    assert await restored.restore() == 3
+    assert restored.get_ranking() == [("ana", 2), ("caio", 1), ("bia", 0)]
+    assert restored.get_ranking("weekly") == [("ana", 2), ("bia", 0)]
+    assert restored.get_ranking("daily") == [("ana", 1), ("bia", 0)]
+    assert restored.has_answered("ana", "g")
+    assert not restored.has_answered("caio", "g")
+    assert await restored.get_daily_quiz("bia", "g") is None
+    assert (await restored.get_daily_quiz("caio", "g")).pergunta == "Persistida?"
+    await restored.store.aclose()
+
+
+@pytest.mark.asyncio
+async def test_in_memory_store_round_trip():
+    store = InMemoryQuizStore()
+    service = QuizService(DummyLLM(), clock=_clock(8), store=store)
+    quiz = await service.get_daily_quiz("ana", "g")
+    service.submit_answer("ana", quiz, 1, "g")
+    restored = QuizService(DummyLLM(), clock=_clock(8), store=store)
+    assert await restored.restore() == 1
+    assert restored.get_score("ana", "daily") == 1
+    assert restored.has_answered("ana", "g")
+    await store.aclose()
@@ -0,0 +1,67 @@
+import pytest
+
+from bobot.ai import factory
+from bobot.domain.exceptions import RateLimitError
+from bobot.services.rate_limit import RateDecision, RateLimit, RateLimiter
+
+from conftest import FakeClock
+
+
+def test_gcra_allows_burst_then_spaces_requests():
+    clock = FakeClock()
+    limiter = RateLimiter(RateLimit(max_requests=3, window_seconds=30), clock=clock)
+    for _ in range(3):
+        assert limiter.acquire("u").allowed
+    denied = limiter.acquire("u")
+    assert denied == RateDecision(False, 10.0, "user")
+
+    clock.now = 10
+    assert limiter.acquire("u").allowed
+    assert not limiter.acquire("u").allowed
+    assert limiter.acquire("outro").allowed
+
+
+def test_stacked_limits_consume_all_or_nothing():
+    clock = FakeClock()
+    limiter = RateLimiter(
+        RateLimit(2, 60),
+        RateLimit(3, 60, scope="channel"),
+        RateLimit(10, 60, scope="global"),
+        clock=clock,
+    )
+    assert limiter.acquire("a", channel="c1").allowed
+    assert limiter.acquire("a", channel="c1").allowed
+    assert limiter.acquire("b", channel="c1").allowed
+
+    decision = limiter.acquire("c", channel="c1")
+    assert not decision.allowed and decision.scope == "channel"
+    assert limiter.acquire("c", channel="c2").allowed
+    assert limiter.acquire("c").allowed
+
+    with pytest.raises(RateLimitError) as info:
+        limiter.check("a", channel="c2")
+    assert info.value.scope == "user"
+    assert info.value.retry_after == pytest.approx(30.0)
+    assert limiter._backend._tat["channel:c2"] == pytest.approx(20.0)
+
+
+def test_idle_keys_are_swept():
+    clock = FakeClock()
+    limiter = RateLimiter(RateLimit(5, 50), sweep_interval=60, clock=clock)
+    for key in ("a", "b", "c"):
+        limiter.check(key)
+    assert len(limiter) == 3
+
+    clock.now = 59
+    limiter.check("d")
+    assert len(limiter) == 4
+    clock.now = 61
+    limiter.check("d")
+    assert len(limiter) == 1
+
+
+def test_build_rate_limits(monkeypatch):
+    assert [limit.scope for limit in factory.build_rate_limits()] == ["user"]
+    monkeypatch.setattr(factory, "LLM_RATE_LIMIT_GUILD_MAX", 20)
+    monkeypatch.setattr(factory, "LLM_RATE_LIMIT_GLOBAL_MAX", 100)
+    assert [limit.scope for limit in factory.build_rate_limits()] == ["user", "guild", "global"]
@@ -0,0 +1,404 @@
+import asyncio
+from dataclasses import dataclass
+
+import pytest
+
+from bobot.ai import factory
+from bobot.ai.routing import CircuitState, HedgeBudget, ProviderRouter
+from bobot.ai.runtime import LLMService, _Job
+from bobot.domain.exceptions import ExternalServiceError, OverloadedError
+from bobot.services.cache import InMemoryCache
+from bobot.services.metrics import metrics
+from bobot.services.queue import AsyncTaskQueue, Priority
+from bobot.services.rate_limit import RateLimit, RateLimiter
+
+from conftest import FakeClock
+
+
+@dataclass
+class Named:
+    name: str
+
+
+def test_breaker_opens_half_opens_and_closes():
+    clock = FakeClock()
+    router = ProviderRouter(failure_threshold=2, cooldown=10, clock=clock)
+    router.record_failure("a")
+    assert router.stats("a").state is CircuitState.CLOSED
+    router.record_failure("a")
+    assert router.stats("a").state is CircuitState.OPEN
+    assert not router.allow("a")
+    assert router.order([Named("a"), Named("b")]) == [Named("b")]
+
+    clock.now = 10
+    assert router.order([Named("a"), Named("b")]) == [Named("b"), Named("a")]
+    assert router.stats("a").state is CircuitState.HALF_OPEN
+    assert router.allow("a")
+    assert not router.allow("a")
+    router.release("a")
+    assert router.allow("a")
+    router.record_failure("a")
+    assert router.stats("a").state is CircuitState.OPEN
+    assert router.stats("a").opened_at == 10
+
+    clock.now = 25
+    assert router.allow("a")
+    router.record_success("a", 2.0)
+    assert router.stats("a").state is CircuitState.CLOSED
+    assert router.stats("a").latency_ewma == 2.0
+
+
+def test_error_rate_opens_circuit_and_latency_orders_providers():
+    router = ProviderRouter(failure_threshold=10, error_rate_threshold=0.5)
+    router.record_failure("a")
+    router.record_failure("a")
+    assert router.stats("a").state is CircuitState.OPEN
+
+    router.record_success("slow", 5.0)
+    router.record_success("slow", 5.0)
+    router.record_success("fast", 1.0)
+    assert router.order([Named("slow"), Named("fast")]) == [Named("fast"), Named("slow")]
+    assert router.stats("slow").latency_ewma == pytest.approx(5.0)
+    assert set(router.snapshot()) == {"a", "slow", "fast"}
+
+
+def test_unmeasured_provider_scores_at_the_mean_latency():
+    router = ProviderRouter()
+    fresh, slow, fast = Named("fresh"), Named("slow"), Named("fast")
+    assert router.order([slow, fresh]) == [slow, fresh]
+
+    router.record_success("slow", 5.0)
+    assert router.order([slow, fresh]) == [slow, fresh]
+    assert router.order([fresh, slow]) == [fresh, slow]
+
+    router.record_success("fast", 1.0)
+    assert router.order([slow, fresh, fast]) == [fast, fresh, slow]
+    router.record_failure("fresh")
+    assert router.order([fresh, fast, slow]) == [fast, slow, fresh]
+
+
+def _service(providers, router):
+    return LLMService(
+        providers=providers,
+        cache=InMemoryCache(),
+        rate_limiter=RateLimiter(RateLimit(100, 60)),
+        queue=AsyncTaskQueue(concurrency=2),
+        router=router,
+    )
+
+
+@dataclass
+class Provider:
+    name: str
+    fail: bool = False
+    calls: int = 0
+
+    async def generate(self, prompt: str) -> str:
+        self.calls += 1
+        if self.fail:
+            raise RuntimeError("down")
+        return self.name
+
+    async def stream(self, prompt: str):
+        self.calls += 1
+        if self.fail:
+            raise RuntimeError("down")
+        yield self.name
+
+
+@pytest.mark.asyncio
+async def test_service_skips_open_circuit_immediately():
+    primary, fallback = Provider("primary", fail=True), Provider("fallback")
+    service = _service([primary, fallback], ProviderRouter(failure_threshold=1, cooldown=60))
+
+    assert await service.generate("p1", "u") == "fallback"
+    assert service.router.stats("primary").state is CircuitState.OPEN
+    assert await service.generate("p2", "u") == "fallback"
+    assert [piece async for piece in service.stream("p3", "u")] == ["fallback"]
+    assert primary.calls == 1
+
+
+@pytest.mark.asyncio
+async def test_service_all_circuits_open_or_busy():
+    router = ProviderRouter(failure_threshold=1, cooldown=0)
+    service = _service([Provider("a", fail=True)], router)
+    with pytest.raises(ExternalServiceError):
+        await service.generate("p1", "u")
+
+    router.stats("a").state = CircuitState.OPEN
+    router.stats("a").opened_at = float("inf")
+    with pytest.raises(ExternalServiceError, match="circuitos abertos"):
+        await service.generate("p2", "u")
+
+    router.stats("a").state = CircuitState.HALF_OPEN
+    router.stats("a").trial_inflight = True
+    with pytest.raises(ExternalServiceError, match="Todos"):
+        await service.generate("p3", "u")
+    with pytest.raises(ExternalServiceError, match="Todos"):
+        [piece async for piece in service.stream("p4", "u")]
+
+
+@pytest.mark.asyncio
+async def test_cancelled_call_releases_half_open_trial():
+    started = asyncio.Event()
+
+    @dataclass
+    class Hanging:
+        name: str = "h"
+
+        async def generate(self, prompt: str) -> str:
+            started.set()
+            await asyncio.sleep(10)
+            return "never"
+
+    router = ProviderRouter()
+    router.stats("h").state = CircuitState.HALF_OPEN
+    service = _service([Hanging()], router)
+    task = asyncio.ensure_future(service._generate_uncached("k", "p", _Job(Priority.NORMAL, "u")))
+    await started.wait()
+    assert router.stats("h").trial_inflight
+    task.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await task
+    assert not router.stats("h").trial_inflight
+
+
+def test_latency_quantile_needs_samples_and_hedge_budget_refills():
+    router = ProviderRouter()
+    for latency in (0.1, 0.2, 0.3, 0.4):
+        router.record_success("a", latency)
+    assert router.latency_quantile("a", 0.95) is None
+    router.record_success("a", 0.5)
+    assert router.latency_quantile("a", 0.95) == 0.5
+    assert router.latency_quantile("a", 0.5) == 0.3
+
+    clock = FakeClock()
+    budget = HedgeBudget(per_minute=2, clock=clock)
+    assert budget.try_acquire() and budget.try_acquire()
+    assert not budget.try_acquire()
+    clock.now = 30
+    assert budget.try_acquire()
+    assert not budget.try_acquire()
+
+
+@dataclass
+class Slow:
+    name: str
+    delay: float
+    fail: bool = False
+
+    async def generate(self, prompt: str) -> str:
+        await asyncio.sleep(self.delay)
+        if self.fail:
+            raise RuntimeError("down")
+        return self.name
+
+
+def _hedged(providers, per_minute=10):
+    router = ProviderRouter()
+    for _ in range(5):
+        router.record_success(providers[0].name, 0.01)
+    for provider in providers[1:]:
+        router.record_success(provider.name, 1.0)
+    service = _service(providers, router)
+    service.hedge_budget = HedgeBudget(per_minute=per_minute)
+    return service
+
+
+@pytest.mark.asyncio
+async def test_hedge_fires_after_quantile_and_first_answer_wins():
+    metrics.reset()
+    slow, backup = Slow("slow", 5), Slow("backup", 0)
+    service = _hedged([slow, backup])
+
+    result = await asyncio.wait_for(service.generate("p", "u"), timeout=1)
+    assert result == "backup"
+    assert not service.router.stats("slow").trial_inflight
+    assert metrics.counters["llm.hedge.started"] == 1
+    assert metrics.counters["llm.hedge.won.backup"] == 1
+
+
+@pytest.mark.asyncio
+async def test_hedge_budget_exhausted_waits_for_primary():
+    metrics.reset()
+    primary, backup = Slow("primary", 0.05), Slow("backup", 0)
+    service = _hedged([primary, backup], per_minute=0)
+
+    assert await service.generate("p", "u") == "primary"
+    assert metrics.counters["llm.hedge.budget_exhausted"] == 1
+    assert "llm.hedge.started" not in metrics.counters
+
+
+@pytest.mark.asyncio
+async def test_hedge_without_backup_or_after_failures():
+    metrics.reset()
+    lone = Slow("lone", 0.05)
+    assert await _hedged([lone]).generate("p", "u") == "lone"
+    assert "llm.hedge.started" not in metrics.counters
+
+    primary, backup = Slow("primary", 0.05, fail=True), Slow("backup", 0.2, fail=True)
+    with pytest.raises(ExternalServiceError, match="Todos"):
+        await _hedged([primary, backup]).generate("p", "u")
+    assert metrics.counters["llm.hedge.started"] == 1
+
+    unmeasured = _service([Slow("new", 0), Slow("backup", 0)], ProviderRouter())
+    unmeasured.hedge_budget = HedgeBudget(per_minute=10)
+    assert await unmeasured.generate("p", "u") == "new"
+    assert metrics.counters["llm.hedge.started"] == 1
+
+
+@dataclass
+class SlowStream:
+    name: str
+    delay: float
+    fail: bool = False
+    overloaded: bool = False
+
+    async def stream(self, prompt: str):
+        await asyncio.sleep(self.delay)
+        if self.overloaded:
+            raise OverloadedError("Fila cheia.")
+        if self.fail:
+            raise RuntimeError("down")
+        yield self.name
+        yield "!"
+
+
+async def _collect(service, prompt="p", priority=Priority.NORMAL):
+    return [piece async for piece in service.stream(prompt, "u", priority=priority)]
+
+
+@pytest.mark.asyncio
+async def test_stream_hedges_before_the_first_piece():
+    metrics.reset()
+    service = _hedged([SlowStream("slow", 5), SlowStream("backup", 0)])
+    assert await asyncio.wait_for(_collect(service), timeout=1) == ["backup", "!"]
+    assert metrics.counters["llm.hedge.started"] == 1
+    assert metrics.counters["llm.hedge.won.backup"] == 1
+    assert service.cache.get("p") == "backup!"
+    assert not service.router.stats("slow").trial_inflight
+
+    metrics.reset()
+    service = _hedged([SlowStream("fast", 0), SlowStream("backup", 0)])
+    assert await _collect(service) == ["fast", "!"]
+    assert "llm.hedge.started" not in metrics.counters
+
+
+@pytest.mark.asyncio
+async def test_stream_hedge_survives_a_failed_racer():
+    metrics.reset()
+    service = _hedged([SlowStream("primary", 0.1, fail=True), SlowStream("backup", 0.3)])
+    assert await asyncio.wait_for(_collect(service), timeout=1) == ["backup", "!"]
+    assert metrics.counters["llm.hedge.started"] == 1
+
+    service = _hedged([SlowStream("primary", 0.2), SlowStream("backup", 0, overloaded=True)])
+    assert await asyncio.wait_for(_collect(service, "q"), timeout=1) == ["primary", "!"]
+
+    service = _hedged([SlowStream("primary", 0.1, fail=True), SlowStream("backup", 0.2, fail=True)])
+    with pytest.raises(ExternalServiceError, match="Todos"):
+        await _collect(service, "r")
+
+
+@pytest.mark.asyncio
+async def test_background_jobs_are_never_hedged():
+    metrics.reset()
+    service = _hedged([Slow("primary", 0.05), Slow("backup", 0)])
+    assert await service.generate("p", "u", priority=Priority.BACKGROUND) == "primary"
+    service = _hedged([SlowStream("primary", 0.05), SlowStream("backup", 0)])
+    assert await _collect(service, priority=Priority.BACKGROUND) == ["primary", "!"]
+    assert "llm.hedge.started" not in metrics.counters
+
+
+@pytest.mark.asyncio
+async def test_hedge_clock_starts_when_the_job_leaves_the_queue():
+    metrics.reset()
+    service = _hedged([Slow("primary", 0), Slow("backup", 0)])
+    service.queue = AsyncTaskQueue(concurrency=1)
+    gate = asyncio.Event()
+
+    async def blocker():
+        await gate.wait()
+
+    busy = asyncio.ensure_future(service.queue.submit(blocker))
+    pending = asyncio.ensure_future(service.generate("p", "u"))
+    await asyncio.sleep(0.1)
+    assert "llm.hedge.started" not in metrics.counters
+    gate.set()
+    assert await pending == "primary"
+    await busy
+    assert "llm.hedge.started" not in metrics.counters
+
+
+def test_build_hedge_budget(monkeypatch):
+    assert factory.build_hedge_budget() is None
+    monkeypatch.setattr(factory, "LLM_HEDGING", True)
+    assert isinstance(factory.build_hedge_budget(), HedgeBudget)
+
+
+@pytest.mark.asyncio
+async def test_stream_reports_queue_admission_but_not_cache_hits():
+    service = _service([Provider("a")], ProviderRouter())
+    seen = []
+    assert [piece async for piece in service.stream("p", "u", on_queued=seen.append)] == ["a"]
+    assert [estimate.position for estimate in seen] == [1]
+    assert [piece async for piece in service.stream("p", "u", on_queued=seen.append)] == ["a"]
+    assert len(seen) == 1
+
+
+class SheddingQueue(AsyncTaskQueue):
+    """Aceita ``accept`` jobs e recusa o resto como uma fila cheia."""
+
+    def __init__(self, accept=0):
+        super().__init__(concurrency=2)
+        self.accept = accept
+
+    async def submit(self, func, priority=Priority.NORMAL, key="", weight=1.0, **options):
+        if self.accept <= 0:
+            raise OverloadedError("Fila cheia.", 9, 45.0)
+        self.accept -= 1
+        return await super().submit(func, priority, key, weight, **options)
+
+
+@pytest.mark.asyncio
+async def test_overload_is_not_a_provider_failure():
+    providers = [Provider("a"), Provider("b")]
+    service = _service(providers, ProviderRouter(failure_threshold=1))
+    service.queue = SheddingQueue()
+
+    with pytest.raises(OverloadedError):
+        await service.generate("p1", "u")
+    with pytest.raises(OverloadedError):
+        [piece async for piece in service.stream("p2", "u")]
+    assert service.router.stats("a").consecutive_failures == 0
+    assert service.router.stats("a").state is CircuitState.CLOSED
+    assert providers[1].calls == 0
+
+
+@pytest.mark.asyncio
+async def test_overloaded_hedge_keeps_waiting_for_primary():
+    primary, backup = Slow("primary", 0.05), Slow("backup", 0)
+    service = _hedged([primary, backup])
+    service.queue = SheddingQueue(accept=1)
+    assert await service.generate("p", "u") == "primary"
+
+
+@pytest.mark.asyncio
+async def test_abandoned_generation_is_cancelled_only_when_every_waiter_leaves():
+    metrics.reset()
+    slow = Slow("slow", 10)
+    service = _service([slow], ProviderRouter())
+
+    first = asyncio.ensure_future(service.generate("p", "u1"))
+    second = asyncio.ensure_future(service.generate("p", "u2"))
+    await asyncio.sleep(0.01)
+    first.cancel()
+    await asyncio.sleep(0.01)
+    assert "llm.abandoned" not in metrics.counters
+    assert service._inflight
+
+    second.cancel()
+    await asyncio.sleep(0.01)
+    assert metrics.counters["llm.abandoned"] == 1
+    assert metrics.counters["queue.aborted"] == 1
+    assert not service._inflight
+    assert not service.router.stats("slow").trial_inflight
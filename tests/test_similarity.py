@@ -0,0 +1,141 @@
+from dataclasses import dataclass
+
+import pytest
+
+from bobot.ai.factory import build_similarity_index
+from bobot.ai.prompts import build_ask_prompt, build_code_prompt, build_debug_prompt
+from bobot.ai.runtime import LLMService, cache_key
+from bobot.services.cache import InMemoryCache
+from bobot.services.metrics import metrics
+from bobot.services.queue import AsyncTaskQueue
+from bobot.services.rate_limit import RateLimit, RateLimiter
+from bobot.services.similarity import SimilarPromptIndex, canonicalize
+
+
+def test_canonicalize_accents_case_punctuation_and_stop_words():
+    assert canonicalize("Como usar list comprehension?") == "list comprehension"
+    assert canonicalize("  como   USAR list-comprehension ") == "list-comprehension"
+    assert canonicalize("Função não retorna a==b!") == "funcao nao retorna a==b"
+    assert canonicalize("?? ...") == ""
+
+
+def test_index_finds_near_duplicates_within_scope():
+    index = SimilarPromptIndex(threshold=0.8)
+    index.add("ask", "Como usar list comprehension em Python?", "k1")
+    index.add("ask", "Como usar list comprehension em Python?", "k1")
+    assert len(index) == 1
+
+    assert index.find("ask", "como usar list comprehensions em python") == "k1"
+    assert index.find("debug", "como usar list comprehension em python") is None
+    assert index.find("ask", "como configurar um servidor nginx") is None
+
+
+def test_index_evicts_oldest_entries():
+    index = SimilarPromptIndex(threshold=0.9, max_entries=2)
+    index.add("s", "primeira pergunta sobre decorators", "k1")
+    index.add("s", "segunda pergunta sobre generators", "k2")
+    index.add("s", "primeira pergunta sobre decorators", "k1")
+    index.add("s", "terceira pergunta sobre asyncio", "k3")
+    assert len(index) == 2
+    assert index.find("s", "segunda pergunta sobre generators") is None
+    assert index.find("s", "primeira pergunta sobre decorators") == "k1"
+    assert index.find("s", "x") is None
+
+
+def test_factory_similarity_index(monkeypatch):
+    import bobot.ai.factory as factory
+
+    assert isinstance(build_similarity_index(), SimilarPromptIndex)
+    monkeypatch.setattr(factory, "LLM_SIMILARITY_THRESHOLD", 0)
+    assert factory.build_similarity_index() is None
+
+
+@dataclass
+class CountingProvider:
+    name: str = "p"
+    calls: int = 0
+
+    async def generate(self, prompt: str) -> str:
+        self.calls += 1
+        return f"resposta {self.calls}"
+
+    async def stream(self, prompt: str):
+        self.calls += 1
+        yield f"resposta {self.calls}"
+
+
+def _service(provider, similarity=None):
+    return LLMService(
+        providers=[provider],
+        cache=InMemoryCache(),
+        rate_limiter=RateLimiter(RateLimit(100, 60)),
+        queue=AsyncTaskQueue(concurrency=1),
+        similarity=similarity,
+    )
+
+
+@pytest.mark.asyncio
+async def test_normalized_prompts_share_cache_entry():
+    provider = CountingProvider()
+    service = _service(provider)
+    first = await service.generate(build_ask_prompt("Como usar list comprehension?"), "1")
+    second = await service.generate(build_ask_prompt("como  USAR list comprehension?"), "1")
+    assert first == second and provider.calls == 1
+
+
+@pytest.mark.asyncio
+async def test_exact_cache_key_keeps_punctuation_and_stop_words():
+    provider = CountingProvider()
+    service = _service(provider)
+    pairs = [
+        (build_debug_prompt("a + b falha"), build_debug_prompt("a - b falha")),
+        (build_debug_prompt("x == y"), build_debug_prompt("x != y")),
+        (build_code_prompt("c#", "lista"), build_code_prompt("c", "lista")),
+    ]
+    for first, second in pairs:
+        assert cache_key(first) != cache_key(second)
+        assert await service.generate(first, "1") != await service.generate(second, "1")
+    assert provider.calls == 6
+
+
+@pytest.mark.asyncio
+async def test_near_duplicate_questions_hit_cache():
+    metrics.reset()
+    provider = CountingProvider()
+    service = _service(provider, SimilarPromptIndex(threshold=0.8))
+
+    question = "Como usar list comprehension em Python?"
+    await service.generate(build_ask_prompt(question), "1", question=question)
+    similar = "como usar list comprehensions em python"
+    assert await service.generate(build_ask_prompt(similar), "2", question=similar) == "resposta 1"
+    assert metrics.counters["llm.cache.similar_hits"] == 1
+
+    other = "como usar list comprehensions em python"
+    pieces = [
+        piece
+        async for piece in service.stream(build_debug_prompt(other), "3", question=other)
+    ]
+    assert pieces == ["resposta 2"]
+
+    again = [
+        piece
+        async for piece in service.stream(build_debug_prompt(other + "!"), "3", question=other)
+    ]
+    assert again == ["resposta 2"]
+    assert provider.calls == 2
+
+
+@pytest.mark.asyncio
+async def test_similarity_skips_unusable_questions():
+    provider = CountingProvider()
+    index = SimilarPromptIndex(threshold=0.8)
+    service = _service(provider, index)
+
+    await service.generate("prompt fixo", "1", question="não está no prompt")
+    await service.generate("prompt fixo dois", "1", question="")
+    assert len(index) == 0
+
+    index.add(canonicalize("Pergunta:"), "python", "chave-expirada")
+    question = "python"
+    await service.generate(build_ask_prompt(question), "1", question=question)
+    assert provider.calls == 3
@@ -0,0 +1,140 @@
+import asyncio
+import multiprocessing
+import sqlite3
+import time
+
+import pytest
+
+from bobot.ai import factory
+from bobot.services.cache import SharedCache
+from bobot.services.metrics import metrics
+from bobot.services.rate_limit import RateLimit, RateLimiter
+from bobot.services.state import InProcessBackend, SQLiteStateBackend
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def backend(request, tmp_path):
+    if request.param == "memory":
+        yield InProcessBackend()
+        return
+    sqlite = SQLiteStateBackend(str(tmp_path / "state.db"))
+    yield sqlite
+    sqlite.close()
+
+
+def test_rate_acquire_is_all_or_nothing(backend):
+    buckets = [("user:a", 10.0, 20.0), ("global:", 5.0, 10.0)]
+    assert backend.rate_acquire(buckets, now=0) == (-1, 0.0)
+    assert backend.rate_acquire(buckets, now=0) == (-1, 0.0)
+    assert backend.rate_acquire(buckets, now=0) == (0, 10.0)
+    assert backend.rate_acquire([("user:b", 10.0, 20.0), ("global:", 5.0, 10.0)], now=0) == (
+        1,
+        5.0,
+    )
+    assert backend.rate_acquire([("user:b", 10.0, 20.0)], now=0) == (-1, 0.0)
+    assert len(backend) == 3
+
+
+def test_cache_and_sweep(backend):
+    backend.cache_set("k", "v", expires_at=10)
+    assert backend.cache_get("k", now=5) == "v"
+    assert backend.cache_get("k", now=10) is None
+    assert backend.cache_get("nada", now=0) is None
+
+    backend.rate_acquire([("user:a", 1.0, 5.0)], now=0)
+    backend.rate_acquire([("user:b", 1.0, 5.0)], now=20)
+    assert backend.sweep(now=15) == 2
+    assert len(backend) == 1
+
+
+def test_shared_cache_namespaces_and_stats(backend):
+    first = SharedCache(backend, namespace="ollama:m1", clock=lambda: 0.0)
+    second = SharedCache(backend, namespace="ollama:m2", clock=lambda: 0.0)
+    first.set("prompt", "resposta", ttl_seconds=60)
+    assert first.get("prompt") == "resposta"
+    assert second.get("prompt") is None
+    assert (first.stats.hits, second.stats.misses) == (1, 1)
+
+
+def test_rate_limiter_uses_backend(backend):
+    limiter = RateLimiter(RateLimit(1, 60), backend=backend, clock=lambda: 100.0)
+    assert limiter.acquire("u").allowed
+    assert not limiter.acquire("u").allowed
+    assert len(limiter) == 1
+
+
+def test_sqlite_rolls_back_failed_transaction(tmp_path):
+    backend = SQLiteStateBackend(str(tmp_path / "state.db"))
+    with pytest.raises(Exception):
+        backend.rate_acquire([(object(), 1.0, 5.0)], now=0)
+    assert backend.rate_acquire([("user:a", 1.0, 5.0)], now=0) == (-1, 0.0)
+    backend.close()
+
+
+def test_sqlite_fails_open_quickly_when_another_process_holds_the_lock(tmp_path):
+    path = str(tmp_path / "state.db")
+    backend = SQLiteStateBackend(path)
+    backend.cache_set("k", "v", expires_at=100)
+    metrics.reset()
+    holder = sqlite3.connect(path, isolation_level=None)
+    holder.execute("BEGIN EXCLUSIVE")
+    started = time.perf_counter()
+    assert backend.rate_acquire([("user:a", 1.0, 5.0)], now=0) == (-1, 0.0)
+    backend.cache_set("k", "novo", expires_at=100)
+    assert backend.cache_get("k", now=0) == "v"  # leitores não esperam no WAL
+    assert time.perf_counter() - started < 1.0
+    assert backend.sweep(now=1000) == 0
+    limiter = RateLimiter(RateLimit(5, 60), backend=backend, clock=lambda: 0.0)
+    limiter._next_sweep = 0.0
+    assert limiter.acquire("user:b").allowed
+    assert metrics.counters["state.fail_open"] == 5
+    holder.execute("ROLLBACK")
+    holder.close()
+    assert backend.rate_acquire([("user:a", 1.0, 5.0)], now=0) == (-1, 0.0)
+
+    class LockedConnection:
+        def execute(self, *args):
+            raise sqlite3.OperationalError("database is locked")
+
+    real, backend._conn = backend._conn, LockedConnection()
+    assert backend.cache_get("k", now=0) is None
+    assert metrics.counters["state.fail_open"] == 6
+    backend._conn = real
+    backend.close()
+
+
+def _hammer(path: str, attempts: int, results) -> None:
+    limiter = RateLimiter(
+        RateLimit(60, 3600),
+        backend=SQLiteStateBackend(path, busy_timeout_ms=5000),
+        clock=lambda: 1000.0,
+    )
+    results.put(sum(limiter.acquire("spam").allowed for _ in range(attempts)))
+
+
+def test_sqlite_limit_holds_across_processes(tmp_path):
+    path = str(tmp_path / "state.db")
+    SQLiteStateBackend(path).close()
+    context = multiprocessing.get_context("fork")
+    results = context.Queue()
+    workers = [context.Process(target=_hammer, args=(path, 40, results)) for _ in range(4)]
+    for worker in workers:
+        worker.start()
+    total = sum(results.get(timeout=30) for _ in workers)
+    for worker in workers:
+        worker.join(timeout=30)
+    assert total == 60
+
+
+def test_build_state_backend(monkeypatch, tmp_path):
+    assert factory.build_state_backend() is None
+    monkeypatch.setattr(factory, "BOT_STATE_BACKEND", "sqlite")
+    monkeypatch.setattr(factory, "BOT_STATE_PATH", str(tmp_path / "state.db"))
+    service = factory.create_llm_service()
+    assert isinstance(service.cache, SharedCache)
+    service.rate_limiter.check("u")
+    assert len(service.rate_limiter) == 1
+    asyncio.run(service.aclose())
+    with pytest.raises(sqlite3.ProgrammingError):
+        len(service.state_backend)
+    InProcessBackend().close()
@@ -0,0 +1,69 @@
+import random
+
+from bobot.utils.text import chunk_text, take_chunk
+
+
+def test_prefers_paragraphs_then_lines():
+    text = "primeiro parágrafo\n\nsegunda linha\nterceira linha"
+    assert chunk_text(text, max_size=32) == ["primeiro parágrafo", "segunda linha\nterceira linha"]
+    assert chunk_text("uma frase longa demais", max_size=12) == ["uma frase", "longa demais"]
+    assert chunk_text("", max_size=10) == []
+
+
+def test_code_fence_is_closed_and_reopened():
+    code = "\n".join(f"linha_{index} = {index}" for index in range(12))
+    text = f"Veja:\n\n```python\n{code}\n```\nFim."
+    chunks = chunk_text(text, max_size=80)
+    assert len(chunks) > 2
+    for chunk in chunks:
+        assert len(chunk) <= 80
+        assert chunk.count("```") % 2 == 0
+    assert all(chunk.startswith("```python\n") for chunk in chunks[1:-1])
+    rebuilt = "\n".join(chunk.replace("```python\n", "").replace("\n```", "") for chunk in chunks)
+    for index in range(12):
+        assert f"linha_{index} = {index}" in rebuilt
+
+
+def test_indentation_survives_line_cuts():
+    text = "```\ndef f():\n    return 1\n    return 2\n```"
+    head, tail = take_chunk(text, 30)
+    assert head == "```\ndef f():\n    return 1\n```"
+    assert tail == "```\n    return 2\n```"
+
+
+def test_whitespace_only_prefix_and_tiny_limits():
+    assert take_chunk("      abcdef", 4) == ("    ", "  abcdef")
+    assert chunk_text("```py\nabcdefgh", max_size=6) == ["```py", "abcdef", "gh"]
+
+
+def test_early_separators_and_fence_moved_out_of_chunk():
+    assert take_chunk("ab cdefghijkl", 10) == ("ab", "cdefghijkl")
+    text = "a" * 20 + "\n```\n" + "b" * 25
+    assert take_chunk(text, 24) == ("a" * 20, "```\n" + "b" * 25)
+
+
+def test_code_line_longer_than_limit_always_advances():
+    chunks = chunk_text("```python\n" + "x" * 5000 + "\n```", 1900)
+    assert len(chunks) == 3
+    assert "".join(chunk.replace("```python\n", "").replace("\n```", "") for chunk in chunks) == "x" * 5000
+    head, tail = take_chunk("```py\n" + "x" * 30 + "\n```", 22)
+    assert head == "```py\n" + "x" * 12 + "\n```"
+    assert tail == "```py\n" + "x" * 18 + "\n```"
+    assert chunk_text("texto\n```py\n" + "y" * 40 + "\n```", 22)[0].startswith("texto\n```py\ny")
+
+
+def test_chunking_terminates_and_respects_limit_fuzz():
+    rng = random.Random(7)
+    pieces = ["```py\n", "```\n", "\n", "\n\n", " ", "palavra", "x" * 60, "`"]
+    for _ in range(300):
+        text = "".join(rng.choice(pieces) for _ in range(rng.randint(1, 40)))
+        size = rng.randint(12, 90)
+        chunks = []
+        rest = text
+        for _ in range(len(text) + 2):
+            if not rest:
+                break
+            head, rest = take_chunk(rest, size)
+            chunks.append(head)
+        assert not rest, (text, size)
+        assert all(len(chunk) <= size for chunk in chunks), (text, size)